@@ -79,7 +79,10 @@ export class SpeechControlWebConstruct extends Construct {
       new iam.PolicyStatement({
         effect: iam.Effect.ALLOW,
         actions: ["iot:Publish"],
-        resources: ["arn:aws:iot:*:*:topic/robot_*/topic"],
+        resources: [
+          "arn:aws:iot:*:*:topic/robot_*/topic",
+          "arn:aws:iot:*:*:topic/fleet/*",
+        ],
       })
     );
 
@@ -56,7 +56,18 @@ export class TextControlWebConstruct extends Construct {
       new iam.PolicyStatement({
         effect: iam.Effect.ALLOW,
         actions: ["iot:Publish"],
-        resources: ["arn:aws:iot:*:*:topic/robot_*/topic"],
+        resources: [
+          "arn:aws:iot:*:*:topic/robot_*/topic",
+          "arn:aws:iot:*:*:topic/fleet/*",
+        ],
+      })
+    );
+    // Group membership is retained on robot_*/groups for the robots to pick up
+    flaskLambda.addToRolePolicy(
+      new iam.PolicyStatement({
+        effect: iam.Effect.ALLOW,
+        actions: ["iot:Publish", "iot:RetainPublish"],
+        resources: ["arn:aws:iot:*:*:topic/robot_*/groups"],
       })
     );
     flaskLambda.addToRolePolicy(
@@ -0,0 +1,118 @@
+"""
+Bounded hand-off from the MQTT client's I/O thread to a worker thread.
+
+awscrt calls on_publish_received on its event-loop thread, the same thread
+that sends keep-alives. Inbox.put only appends the raw topic and payload to
+a bounded deque, so the callback returns in constant time. Parsing,
+validation and queueing the action happen in handler on the worker thread:
+
+    inbox = Inbox(handler, maxlen=256)
+    inbox.start()
+    inbox.put(topic, payload)          # from the awscrt callback
+    ...
+    inbox.stop()
+    inbox.metrics()
+
+When the worker falls behind and the inbox is full, the oldest message is
+dropped. The newest command is the one worth acting on. Drops are counted
+and logged at most once per second.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_LOG_INTERVAL = 1.0
+
+
+class Inbox:
+    """Bounded deque of (receive time, topic, payload) drained by one worker thread."""
+
+    def __init__(self, handler, maxlen=256, name="mqtt-inbox"):
+        self.handler = handler
+        self.maxlen = maxlen
+        self.name = name
+        self._items = deque(maxlen=maxlen)
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.high_water = 0
+        self.max_lag = 0.0
+        self._lag_total = 0.0
+        self._last_overflow_log = 0.0
+
+    def put(self, topic, payload):
+        """Queue a message; safe to call from the awscrt thread, never blocks."""
+        items = self._items
+        if len(items) == self.maxlen:
+            # deque drops the oldest entry on append
+            self.dropped += 1
+        items.append((time.perf_counter(), topic, payload))
+        self.received += 1
+        self._wake.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        items = self._items
+        while not self._stopping.is_set():
+            try:
+                received_at, topic, payload = items.popleft()
+            except IndexError:
+                self._wake.wait(0.5)
+                self._wake.clear()
+                continue
+            depth = len(items) + 1
+            if depth > self.high_water:
+                self.high_water = depth
+            lag = time.perf_counter() - received_at
+            self._lag_total += lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+            try:
+                self.handler(topic, payload)
+            except Exception as e:
+                self.failed += 1
+                logger.error("Error handling message from '%s': %s", topic, e)
+            self.processed += 1
+            if self.dropped and received_at - self._last_overflow_log > OVERFLOW_LOG_INTERVAL:
+                self._last_overflow_log = received_at
+                logger.warning("Inbox full: %d messages dropped so far", self.dropped)
+
+    def drain(self, timeout=5.0):
+        """Wait until every queued message has been handled; True if it emptied in time."""
+        deadline = time.monotonic() + timeout
+        while self.processed + self.dropped < self.received:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+
+    def metrics(self):
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "depth": len(self._items),
+            "high_water": self.high_water,
+            "capacity": self.maxlen,
+            "lag_ms_avg": 1000.0 * self._lag_total / self.processed if self.processed else 0.0,
+            "lag_ms_max": 1000.0 * self.max_lag,
+        }
@@ -0,0 +1,650 @@
+"""
+Benchmarks for the shared MQTT client core.
+
+    python mqtt_bench.py connect [--runs 5] [--timeout 10] [--broker HOST:PORT]
+                                 [--handshake 1.0] [--rtt 0.3]
+
+    python mqtt_bench.py flood [--rate 10000] [--seconds 3]
+
+    python mqtt_bench.py redeliver [--messages 1000] [--fraction 0.3] [--replay 100]
+
+    python mqtt_bench.py reconnect [--drops 4] [--interval 3] [--period 0.05]
+
+    python mqtt_bench.py fanout [--robots 9 100 1000] [--rounds 5] [--groups 4]
+
+connect measures the time from start to CONNACK for each connection
+strategy. By default it runs against an in-process mqtt_test_broker; pass
+--broker to use another plain-TCP broker instead, e.g. mosquitto. An
+"unreachable" transport stands in for a firewalled mTLS port. It points at
+a listener that accepts connections and never answers, which is how a
+blocked 8883 looks behind some proxies. Two "slow" transports stand in
+for mTLS and websocket over venue Wi-Fi. Both reach the broker through a
+proxy that holds each connection for a TLS-like handshake, --handshake
+seconds give or take half. Nothing is forwarded if the client gives up
+during that time. After the handshake, every packet is delayed by half
+of --rtt each way. With the in-process broker, the bench counts the runs
+in which the losing attempt still sent CONNECT. On AWS IoT the same
+client ID would then drop the winner with DUPLICATE_CLIENT_ID.
+
+flood publishes --rate messages per second at a subscribed client through
+the in-process broker. It compares handling them on the awscrt thread, as
+the clients used to (INFO log, json.loads, queue lock), with the inbox
+hand-off. It reports how long each callback held the I/O thread and the
+round-trip time of SUBSCRIBE/SUBACK probes sent during the flood. Those
+probes wait on the same thread as keep-alives.
+
+redeliver sends uniquely identified actions at QoS 1. The broker
+redelivers a fraction of them with the DUP flag, then replays the last
+--replay messages the way a queue is replayed after a reconnect. It
+checks that each action is queued exactly once with the seen-ID cache,
+and counts the repeats without it.
+
+reconnect publishes a command every --period seconds while the broker
+cuts the robot's connection --drops times. It compares the old client,
+which never resubscribed after a clean-session reconnect, with a
+clean-session resubscribe and with the persistent session and fast
+jittered backoff. It reports the time from each drop until the robot was
+subscribed again, and how many commands reached the executor.
+
+fanout connects --robots simulated robots to the in-process broker. Each
+subscribes like a robot client: to robot_<i>/topic, fleet/all and its
+group, one of --groups. It then sends a command to every robot, once as
+one publish per robot topic (what the web app used to do for "all") and
+once as a single publish to fleet/all, and to one group as a single
+publish. It reports the publishes the sender made and the time until
+every target robot had the command. The simulated robots and the sender
+are plain asyncio MQTT clients, so 1000 robots fit in one process. The
+sender pipelines its publishes on one connection. Against AWS IoT each
+publish is a separate HTTPS request, so the per-robot case is slower
+there than it is here.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import queue
+import random
+import socket
+import statistics
+import threading
+import time
+from uuid import uuid4
+
+from awscrt import mqtt5
+
+import mqtt_core
+from mqtt_core import PubSubClient
+from mqtt_test_broker import (
+    CONNACK, PUBACK, PUBLISH, SUBACK, TestBroker, decode_string, encode_string, packet
+)
+
+
+class _NullExecutor:
+    def add_action_to_queue(self, action_name):
+        pass
+
+    def stop(self):
+        pass
+
+
+class _QueueingExecutor:
+    """Does what ActionExecutor.add_action_to_queue does, without ROS."""
+
+    actions = {"bow": {}, "wave": {}, "go_forward": {}}
+
+    def __init__(self):
+        self.action_queue = queue.Queue()
+        self.queue_lock = threading.Lock()
+
+    def add_action_to_queue(self, action_name):
+        action_id = str(uuid4())
+        if action_name not in self.actions:
+            return
+        with self.queue_lock:
+            self.action_queue.put({"id": action_id, "name": action_name})
+
+    def stop(self):
+        pass
+
+
+class _LegacyClient(PubSubClient):
+    """The callback as it was before the inbox: everything on the awscrt thread."""
+
+    def on_publish_received(self, publish_packet_data):
+        try:
+            publish_packet = publish_packet_data.publish_packet
+            assert isinstance(publish_packet, mqtt5.PublishPacket)
+            logging.info(
+                "Received message from topic '%s': %s",
+                publish_packet.topic,
+                publish_packet.payload,
+            )
+            try:
+                payload = json.loads(publish_packet.payload)
+                action_name = payload.get("toolName")
+                if action_name:
+                    self.executor.add_action_to_queue(action_name)
+                else:
+                    logging.warning("No action specified in the payload")
+            except json.JSONDecodeError:
+                logging.error("Invalid JSON payload received")
+        except Exception as e:
+            logging.error("Exception in on_publish_received: %s", e)
+
+
+def _blackhole():
+    """Listener that accepts connections and never replies; returns its port."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(64)
+    held = []
+
+    def accept():
+        while True:
+            held.append(server.accept()[0])
+
+    threading.Thread(target=accept, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def _slow_proxy(host, port, handshake, rtt, seed=1):
+    """Listener that forwards to host:port after a handshake-like delay; returns its port."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(64)
+    jitter = random.Random(seed)
+
+    def pump(source, target):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                time.sleep(rtt / 2)
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, target):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    def relay(client, delay):
+        time.sleep(delay)
+        # Like TLS: a client stopped during the handshake never gets to send CONNECT
+        client.setblocking(False)
+        buffered = b""
+        try:
+            while True:
+                data = client.recv(65536)
+                if not data:
+                    client.close()
+                    return
+                buffered += data
+        except BlockingIOError:
+            pass
+        except OSError:
+            client.close()
+            return
+        client.setblocking(True)
+        upstream = socket.create_connection((host, port))
+        if buffered:
+            time.sleep(rtt / 2)
+            upstream.sendall(buffered)
+        threading.Thread(target=pump, args=(client, upstream), daemon=True).start()
+        threading.Thread(target=pump, args=(upstream, client), daemon=True).start()
+
+    def accept():
+        while True:
+            client = server.accept()[0]
+            delay = handshake * jitter.uniform(0.5, 1.5)
+            threading.Thread(target=relay, args=(client, delay), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return server.getsockname()[1]
+
+
+def _settings(host, port, unreachable_port, slow_port, client_id):
+    return {
+        "input_endpoint": host,
+        "input_clientId": client_id,
+        "input_topic": f"{client_id}/topic",
+        "tcp_port": port,
+        "unreachable_port": unreachable_port,
+        "slow_port": slow_port,
+        "slow_alt_port": slow_port,
+    }
+
+
+def _connect_once(settings, transports, strategy, timeout, stagger):
+    client = PubSubClient(settings, _NullExecutor, transports=transports, strategy=strategy,
+                          timeout=timeout, stagger=stagger)
+    try:
+        client.connect()
+        return client.connect_seconds, client.connection.transport
+    except Exception:
+        return None, None
+    finally:
+        for attempt in client._attempts:
+            attempt.stop()
+
+
+def bench_connect(args):
+    if args.broker:
+        host, port = args.broker.rsplit(":", 1)
+        port = int(port)
+        broker = None
+    else:
+        broker = TestBroker()
+        host, port = "127.0.0.1", broker.start()
+    # A transport that never connects, registered like any other transport
+    mqtt_core.TRANSPORTS["unreachable"] = mqtt_core.TRANSPORTS["tcp"]
+    mqtt_core.DEFAULT_PORTS["unreachable"] = 0
+    unreachable_port = _blackhole()
+    # Two reachable transports with a slow handshake, like mTLS and websocket on venue Wi-Fi
+    for transport in ("slow", "slow_alt"):
+        mqtt_core.TRANSPORTS[transport] = mqtt_core.TRANSPORTS["tcp"]
+        mqtt_core.DEFAULT_PORTS[transport] = 0
+    slow_port = _slow_proxy(host, port, args.handshake, args.rtt)
+
+    default_stagger = mqtt_core.RACE_STAGGER
+    cases = [
+        ("tcp only", ["tcp"], "sequential", 0.0),
+        ("sequential: unreachable, then tcp", ["unreachable", "tcp"], "sequential", 0.0),
+        (f"race: unreachable, tcp, stagger {default_stagger:g}s", ["unreachable", "tcp"], "race", default_stagger),
+        ("race: unreachable, tcp, no stagger", ["unreachable", "tcp"], "race", 0.0),
+        (f"race: tcp, unreachable, stagger {default_stagger:g}s", ["tcp", "unreachable"], "race", default_stagger),
+        ("race: slow, slow, stagger 0.25s", ["slow", "slow_alt"], "race", 0.25),
+        (f"race: slow, slow, stagger {default_stagger:g}s", ["slow", "slow_alt"], "race", default_stagger),
+    ]
+    print(f"Connect time to CONNACK, broker {host}:{port}, timeout {args.timeout:.0f}s, "
+          f"{args.runs} runs per case, slow handshake {args.handshake:g}s, rtt {args.rtt:g}s")
+    for n, (label, transports, strategy, stagger) in enumerate(cases):
+        times = []
+        winners = set()
+        duplicates = 0
+        for run in range(args.runs):
+            settings = _settings(host, port, unreachable_port, slow_port, f"bench-{n}-{run}")
+            connects = broker.connects if broker is not None else 0
+            seconds, winner = _connect_once(settings, transports, strategy, args.timeout, stagger)
+            if seconds is not None:
+                times.append(seconds)
+                winners.add(winner)
+            if broker is not None:
+                # Let a loser that finished its handshake reach the broker before counting
+                time.sleep(args.handshake * 1.5 + args.rtt)
+                duplicates += broker.connects - connects > 1
+        duplicated = f"  duplicate CONNECT {duplicates}/{args.runs}" if broker is not None else ""
+        if times:
+            print(f"  {label:<40} median {statistics.median(times) * 1000:8.1f} ms  "
+                  f"max {max(times) * 1000:8.1f} ms  via {', '.join(sorted(winners))}{duplicated}")
+        else:
+            print(f"  {label:<40} no connection{duplicated}")
+    if broker is not None:
+        broker.stop()
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def _flood_case(label, client_class, inbox_size, args, host, port):
+    settings = {"input_endpoint": host, "input_clientId": f"flood-{label}", "input_topic": "flood/robot",
+                "tcp_port": port}
+    client = client_class(settings, _QueueingExecutor, transports=["tcp"], inbox_size=inbox_size)
+    callback_seconds = []
+    handler = client.on_publish_received
+
+    def timed(publish_packet_data):
+        started = time.perf_counter()
+        handler(publish_packet_data)
+        callback_seconds.append(time.perf_counter() - started)
+
+    client.on_publish_received = timed
+    client.executor
+    client.connect()
+    client.subscribe()
+
+    publisher = PubSubClient({"input_endpoint": host, "input_clientId": f"flood-pub-{label}",
+                              "input_topic": "flood/unused", "tcp_port": port},
+                             _NullExecutor, transports=["tcp"], inbox_size=0)
+    publisher.connect()
+    payload = json.dumps({"toolName": "bow", "padding": "x" * 200}).encode()
+    stop = threading.Event()
+    probes = []
+
+    def probe():
+        # SUBACK round trips queue behind publish callbacks on the client's I/O thread
+        n = 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.client.subscribe(subscribe_packet=mqtt5.SubscribePacket(
+                subscriptions=[mqtt5.Subscription(topic_filter=f"probe/{n}", qos=mqtt5.QoS.AT_MOST_ONCE)]
+            )).result(10)
+            probes.append(time.perf_counter() - started)
+            n += 1
+            stop.wait(0.05)
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    sent = 0
+    started = time.perf_counter()
+    interval = 1.0 / args.rate
+    while time.perf_counter() - started < args.seconds:
+        publisher.client.publish(mqtt5.PublishPacket(topic="flood/robot", payload=payload,
+                                                     qos=mqtt5.QoS.AT_MOST_ONCE))
+        sent += 1
+        # Pace in batches of 100 to hold the target rate
+        if sent % 100 == 0:
+            ahead = sent * interval - (time.perf_counter() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+    publish_seconds = time.perf_counter() - started
+    time.sleep(1.0)
+    stop.set()
+    prober.join()
+    if client.inbox is not None:
+        client.inbox.drain(10.0)
+    queued = client.executor.action_queue.qsize()
+
+    us = [s * 1e6 for s in callback_seconds]
+    print(f"  {label}")
+    print(f"    sent {sent} ({sent / publish_seconds:.0f}/s), callbacks {len(us)}, actions queued {queued}")
+    print(f"    callback us   p50 {_percentile(us, 0.5):7.1f}  p99 {_percentile(us, 0.99):7.1f}  "
+          f"max {max(us, default=0):8.1f}  total {sum(us) / 1e6:.2f}s")
+    print(f"    SUBACK ms     p50 {_percentile(probes, 0.5) * 1000:7.1f}  "
+          f"p99 {_percentile(probes, 0.99) * 1000:7.1f}  max {max(probes, default=0) * 1000:8.1f}")
+    if client.inbox is not None:
+        m = client.inbox_metrics()
+        print(f"    inbox         dropped {m['dropped']}  high water {m['high_water']}/{m['capacity']}  "
+              f"lag avg {m['lag_ms_avg']:.1f} ms max {m['lag_ms_max']:.1f} ms")
+    for c in (publisher, client):
+        c.connection.stop()
+        c.connection.stopped.result(5)
+    if client.inbox is not None:
+        client.inbox.stop()
+
+
+def bench_flood(args):
+    broker = TestBroker()
+    port = broker.start()
+    # The legacy callback logged every payload at INFO; send it somewhere cheap but real
+    root = logging.getLogger()
+    root.handlers = [logging.StreamHandler(io.StringIO())]
+    root.setLevel(logging.INFO)
+    logging.getLogger("inbox").setLevel(logging.WARNING)
+    print(f"Flood at {args.rate}/s for {args.seconds:.0f}s through 127.0.0.1:{port}")
+    _flood_case("on the awscrt thread (before)", _LegacyClient, 0, args, "127.0.0.1", port)
+    _flood_case(f"inbox of {args.inbox_size}", PubSubClient, args.inbox_size, args, "127.0.0.1", port)
+    broker.stop()
+
+
+def _redeliver_case(label, dedupe_window, args):
+    broker = TestBroker(redeliver=args.fraction)
+    port = broker.start()
+    settings = {"input_endpoint": "127.0.0.1", "input_clientId": "redeliver", "input_topic": "redeliver/robot",
+                "tcp_port": port, "dedupe_window": dedupe_window}
+    client = PubSubClient(settings, _QueueingExecutor, transports=["tcp"])
+    client.executor
+    client.connect()
+    client.subscribe()
+    # Same payload shape as text_control's action_payload
+    payloads = [json.dumps({"toolName": "bow", "messageId": uuid4().hex, "sentAt": time.time()}).encode()
+                for _ in range(args.messages)]
+    replayed = payloads[-args.replay:] if args.replay else []
+    for n, payload in enumerate(payloads + replayed, 1):
+        broker.publish("redeliver/robot", payload, qos=1)
+        if n % 100 == 0:
+            # Stay within what the inbox absorbs; overflow drops are a different test
+            time.sleep(0.05)
+    deliveries = args.messages + args.replay
+    deadline = time.monotonic() + 10
+    while client.inbox.received < deliveries + broker.redelivered and time.monotonic() < deadline:
+        time.sleep(0.05)
+    client.inbox.drain(10.0)
+    queued = client.executor.action_queue.qsize()
+    metrics = client.inbox_metrics()
+    duplicates = metrics.get("dedupe", {}).get("duplicates", 0)
+    verdict = "OK" if queued == args.messages else f"{queued - args.messages} repeated actions"
+    print(f"  {label:<22} received {metrics['received']:5d}  (DUP {broker.redelivered}, replayed {args.replay})  "
+          f"queued {queued:5d}  dropped as duplicate {duplicates:5d}  overflow {metrics['dropped']}  {verdict}")
+    client.connection.stop()
+    client.connection.stopped.result(5)
+    client.inbox.stop()
+    broker.stop()
+    return queued == args.messages
+
+
+def bench_redeliver(args):
+    print(f"{args.messages} unique actions at QoS 1, {args.fraction:.0%} redelivered with DUP, "
+          f"last {args.replay} replayed")
+    ok = _redeliver_case("seen-ID cache", mqtt_core.DEDUPE_WINDOW, args)
+    _redeliver_case("no deduplication", 0, args)
+    raise SystemExit(0 if ok else 1)
+
+
+class _NoResubscribeClient(PubSubClient):
+    """The client before sessions: reconnects, but never subscribes again."""
+
+    def _on_reconnected(self, attempt, connack):
+        pass
+
+
+def _reconnect_case(label, client_class, session, args):
+    broker = TestBroker()
+    port = broker.start()
+    settings = {"input_endpoint": "127.0.0.1", "input_clientId": "reconnect", "input_topic": "reconnect/robot",
+                "tcp_port": port, **session}
+    client = client_class(settings, _QueueingExecutor, transports=["tcp"])
+    client.executor
+    client.connect()
+    client.subscribe()
+    published = 0
+    next_drop = time.monotonic() + args.interval
+    drops = 0
+    end = next_drop + args.drops * args.interval
+    while time.monotonic() < end:
+        payload = json.dumps({"toolName": "bow", "messageId": uuid4().hex, "sentAt": time.time()})
+        broker.publish("reconnect/robot", payload.encode(), qos=1)
+        published += 1
+        if drops < args.drops and time.monotonic() >= next_drop:
+            broker.drop("reconnect")
+            drops += 1
+            next_drop += args.interval
+        time.sleep(args.period)
+    # Let the last reconnect finish so every case is counted over the same commands
+    deadline = time.monotonic() + 15
+    while broker.connects <= broker.drops and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.5)
+    client.inbox.drain(5.0)
+    queued = client.executor.action_queue.qsize()
+    metrics = client.reconnect_metrics()
+    resubscribe = (f"avg {metrics['resubscribe_ms_avg']:6.0f} ms  max {metrics['resubscribe_ms_max']:6.0f} ms"
+                   if metrics["resubscribe_ms_avg"] is not None else "never resubscribed")
+    print(f"  {label:<36} reconnects {metrics['reconnects']}  resumed {metrics['session_resumed']}  "
+          f"{resubscribe:<30} commands {queued:4d}/{published} ({queued / published:.0%})")
+    client.connection.stop()
+    client.connection.stopped.result(5)
+    client.inbox.stop()
+    broker.stop()
+
+
+def bench_reconnect(args):
+    print(f"Command every {args.period * 1000:.0f} ms, connection dropped {args.drops} times, "
+          f"every {args.interval:.1f}s")
+    # awscrt's defaults: 1 s to 120 s backoff with full jitter
+    crt_defaults = {"session_behavior": "clean", "min_reconnect_ms": 1000, "max_reconnect_ms": 120000}
+    _reconnect_case("clean, no resubscribe (before)", _NoResubscribeClient, crt_defaults, args)
+    _reconnect_case("clean session, resubscribe", PubSubClient, crt_defaults, args)
+    _reconnect_case("persistent session, fast backoff", PubSubClient, {}, args)
+
+
+async def _read_packet(reader):
+    first = (await reader.readexactly(1))[0]
+    length, shift = 0, 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    return first >> 4, first & 0x0F, await reader.readexactly(length) if length else b""
+
+
+class _SimRobot:
+    """Bare MQTT 5 client that subscribes like a robot and timestamps each command."""
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.received = {}  # command -> perf_counter at arrival
+        self.arrived = None
+        self._reader = None
+        self._writer = None
+
+    async def connect(self, port, topics):
+        self._reader, self._writer = await asyncio.open_connection("127.0.0.1", port)
+        # MQTT 5, clean start, 60 s keep alive, no properties
+        body = encode_string("MQTT") + b"\x05\x02\x00\x3c\x00" + encode_string(self.client_id)
+        self._writer.write(packet(1, body))
+        assert (await _read_packet(self._reader))[0] == CONNACK
+        if topics:
+            body = b"\x00\x01\x00" + b"".join(encode_string(t) + b"\x01" for t in topics)
+            self._writer.write(packet(8, body, flags=0x02))
+            assert (await _read_packet(self._reader))[0] == SUBACK
+        return self
+
+    async def listen(self):
+        try:
+            while True:
+                packet_type, flags, body = await _read_packet(self._reader)
+                if packet_type != PUBLISH:
+                    continue
+                _, pos = decode_string(body, 0)
+                if flags & 0x06:
+                    self._writer.write(packet(PUBACK, body[pos:pos + 2]))
+                    pos += 2
+                command = body[pos + 1:].decode()
+                self.received[command] = time.perf_counter()
+                if self.arrived is not None:
+                    self.arrived.set()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def publish(self, topics, payload):
+        """QoS 1 publish to each topic, pipelined; returns once every PUBACK is in."""
+        for n, topic in enumerate(topics):
+            packet_id = n % 65535 + 1
+            self._writer.write(packet(PUBLISH, encode_string(topic) + packet_id.to_bytes(2, "big") + b"\x00"
+                                      + payload, flags=0x02))
+        await self._writer.drain()
+        acked = 0
+        while acked < len(topics):
+            if (await _read_packet(self._reader))[0] == PUBACK:
+                acked += 1
+
+    def close(self):
+        self._writer.close()
+
+
+async def _fanout_round(sender, robots, targets, topics, command):
+    started = time.perf_counter()
+    await sender.publish(topics, command.encode())
+    deadline = started + 30
+    while not all(command in robots[i].received for i in targets) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+    arrivals = sorted(robots[i].received.get(command, float("inf")) - started for i in targets)
+    return arrivals
+
+
+async def _fanout_fleet(count, args, port):
+    groups = [f"group_{g}" for g in range(args.groups)]
+    robots = [_SimRobot(f"robot_{i}") for i in range(1, count + 1)]
+    for start in range(0, count, 100):
+        await asyncio.gather(*(
+            robot.connect(port, [f"{robot.client_id}/topic", mqtt_core.BROADCAST_TOPIC,
+                                 mqtt_core.GROUP_TOPIC_PREFIX + groups[i % len(groups)]])
+            for i, robot in enumerate(robots[start:start + 100], start)
+        ))
+    listeners = [asyncio.ensure_future(robot.listen()) for robot in robots]
+    sender = await _SimRobot("text_control").connect(port, [])
+    everyone = range(count)
+    cases = [
+        ("all, one publish per robot (before)", everyone, [f"{r.client_id}/topic" for r in robots]),
+        (f"all, {mqtt_core.BROADCAST_TOPIC}", everyone, [mqtt_core.BROADCAST_TOPIC]),
+        (f"{groups[0]}, {mqtt_core.GROUP_TOPIC_PREFIX}{groups[0]}", range(0, count, len(groups)),
+         [mqtt_core.GROUP_TOPIC_PREFIX + groups[0]]),
+    ]
+    print(f"{count} robots")
+    for label, targets, topics in cases:
+        lasts, medians, missing = [], [], 0
+        for n in range(args.rounds):
+            arrivals = await _fanout_round(sender, robots, list(targets), topics, f"{label}#{n}")
+            missing += sum(1 for a in arrivals if a == float("inf"))
+            lasts.append(arrivals[-1])
+            medians.append(arrivals[len(arrivals) // 2])
+        print(f"  {label:<38} publishes {len(topics):5d}  robots {len(targets):5d}  "
+              f"median robot {1000 * statistics.median(medians):7.2f} ms  "
+              f"last robot {1000 * statistics.median(lasts):7.2f} ms"
+              + (f"  MISSING {missing}" if missing else ""))
+    sender.close()
+    for robot in robots:
+        robot.close()
+    for listener in listeners:
+        listener.cancel()
+
+
+def bench_fanout(args):
+    print(f"Command to every robot and to one of {args.groups} groups, median of {args.rounds} rounds")
+    for count in args.robots:
+        broker = TestBroker()
+        port = broker.start()
+        asyncio.run(_fanout_fleet(count, args, port))
+        broker.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT client core benchmarks")
+    parser.add_argument("--verbose", action="store_true", help="Show client lifecycle logging")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    connect = subparsers.add_parser("connect", help="Connect time per transport strategy")
+    connect.add_argument("--runs", type=int, default=5)
+    connect.add_argument("--timeout", type=float, default=mqtt_core.TIMEOUT)
+    connect.add_argument("--broker", help="HOST:PORT of a plain-TCP MQTT 5 broker")
+    connect.add_argument("--handshake", type=float, default=1.0,
+                         help="Mean handshake seconds of the slow transports")
+    connect.add_argument("--rtt", type=float, default=0.3, help="Round-trip seconds of the slow transports")
+    connect.set_defaults(func=bench_connect)
+    flood = subparsers.add_parser("flood", help="Callback cost and I/O-thread latency under a message flood")
+    flood.add_argument("--rate", type=int, default=10000, help="Messages per second")
+    flood.add_argument("--seconds", type=float, default=3.0)
+    flood.add_argument("--inbox-size", type=int, default=mqtt_core.INBOX_SIZE)
+    flood.set_defaults(func=bench_flood)
+    redeliver = subparsers.add_parser("redeliver", help="Inject QoS 1 redeliveries and count repeated actions")
+    redeliver.add_argument("--messages", type=int, default=1000)
+    redeliver.add_argument("--fraction", type=float, default=0.3, help="Share of deliveries sent twice")
+    redeliver.add_argument("--replay", type=int, default=100, help="Messages replayed at the end")
+    redeliver.set_defaults(func=bench_redeliver)
+    reconnect = subparsers.add_parser("reconnect", help="Resubscribe time and commands lost across dropped connections")
+    reconnect.add_argument("--drops", type=int, default=4)
+    reconnect.add_argument("--interval", type=float, default=3.0, help="Seconds between drops")
+    reconnect.add_argument("--period", type=float, default=0.05, help="Seconds between commands")
+    reconnect.set_defaults(func=bench_reconnect)
+    fanout = subparsers.add_parser("fanout", help="Publishes and delivery time for per-robot vs fleet topics")
+    fanout.add_argument("--robots", type=int, nargs="+", default=[9, 100, 1000])
+    fanout.add_argument("--rounds", type=int, default=5)
+    fanout.add_argument("--groups", type=int, default=4)
+    fanout.set_defaults(func=bench_fanout)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL,
+                        format="%(asctime)s [%(levelname)s] %(message)s")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,659 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0.
+
+"""
+MQTT5 client core shared by the dog and humanoid pubsub entry points.
+
+Each entry point only supplies its settings and a factory for its
+ActionExecutor:
+
+    settings = load_settings("settings.yaml")
+    client = PubSubClient(settings, make_executor, transports=["mtls", "websocket"])
+    client.run()
+
+The executor is built by the factory on first use, so importing an entry
+point never initializes ROS. run() builds it while the connection is being
+established.
+
+Transports are tried according to strategy:
+
+    race        start every transport, each stagger seconds after the
+                previous one, and keep whichever connects first
+    sequential  try each transport in turn, waiting up to timeout for each
+
+With race an unreachable mTLS port no longer costs a full timeout before
+the websocket attempt starts. AWS IoT allows one connection per client ID,
+so the losing attempts are stopped as soon as a winner connects. A loser
+that has already finished its TLS handshake has sent CONNECT by then, and
+AWS IoT drops the winner with DUPLICATE_CLIENT_ID. The default stagger is
+therefore longer than a typical handshake over venue Wi-Fi, so the
+preferred transport has normally connected before the next one starts.
+
+Received messages go through an Inbox (inbox.py): the awscrt callback only
+appends the raw payload, and a worker thread parses it and queues the
+action, so bursts never hold up the client's I/O thread and keep-alives.
+Messages are logged at DEBUG, one in log_sample_every. A message whose
+messageId was already handled is a QoS 1 redelivery and is dropped
+(seen_ids.py), so raising the publisher's QoS never repeats an action.
+
+Reconnects are tuned for flaky venue Wi-Fi. The session persists across
+drops: clean start is off after the first connection, and the broker
+keeps the subscription and queues QoS 1 commands for session_expiry
+seconds. When the CONNACK has session present, nothing needs to be
+resubscribed; otherwise the subscription is sent again from the
+reconnect callback. The CRT retries with exponential backoff and full jitter
+between min_reconnect_ms and max_reconnect_ms. The endpoint is resolved
+in the background while the executor starts, and all attempts share one
+client bootstrap, so its host resolver cache outlives individual
+connections. The Python CRT exposes no TLS session cache, so each
+reconnect still performs a full TLS handshake. reconnect_metrics()
+reports the time from each disconnection until the client was
+subscribed again.
+
+Besides its own topic, a robot subscribes to the fleet broadcast topic
+(broadcast_topic, fleet/all) and to its groups_topic. The web app keeps
+the robot's group membership in the robot table and publishes it there as
+a retained {"groups": [...]} message. Each update subscribes the robot to
+group_topic_prefix + <group> for the groups it joined, and unsubscribes it
+from the ones it left. A broadcast or group command is then one publish
+however many robots receive it.
+
+run() waits for 's' on an interactive terminal. Under a service manager,
+with --daemon or when stdin is not a terminal, it runs until SIGTERM or
+SIGINT.
+"""
+
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Dict, List, Optional
+
+import yaml
+from awscrt import auth, io, mqtt5
+from awsiot import mqtt5_client_builder
+from inbox import Inbox
+from seen_ids import SeenIds
+
+TIMEOUT = 10
+KEEP_ALIVE = 5
+DEFAULT_TRANSPORTS = ["mtls", "websocket"]
+DEFAULT_PORTS = {"mtls": 8883, "websocket": 443, "tcp": 1883}
+RACE_STAGGER = 1.5
+INBOX_SIZE = 256
+LOG_SAMPLE_EVERY = 100
+DEDUPE_WINDOW = 600
+DEDUPE_MAX_IDS = 10000
+SESSION_EXPIRY = 300
+MIN_RECONNECT_MS = 250
+MAX_RECONNECT_MS = 10000
+BROADCAST_TOPIC = "fleet/all"
+GROUP_TOPIC_PREFIX = "fleet/group/"
+
+SESSION_BEHAVIORS = {
+    "clean": mqtt5.ClientSessionBehaviorType.CLEAN,
+    "rejoin_post_success": mqtt5.ClientSessionBehaviorType.REJOIN_POST_SUCCESS,
+    "rejoin_always": mqtt5.ClientSessionBehaviorType.REJOIN_ALWAYS,
+}
+JITTER_MODES = {
+    "none": mqtt5.ExponentialBackoffJitterMode.NONE,
+    "full": mqtt5.ExponentialBackoffJitterMode.FULL,
+    "decorrelated": mqtt5.ExponentialBackoffJitterMode.DECORRELATED,
+}
+
+# Settings that may reference {robot_name} and {base_path}
+FORMATTED_KEYS = ["input_topic", "input_cert", "input_key", "input_ca", "input_clientId", "groups_topic"]
+
+
+def load_settings(settings_path: str) -> Dict[str, Any]:
+    """Load settings.yaml, expand the templated keys and fill AWS keys from the environment."""
+    try:
+        with open(settings_path, "r", encoding="utf-8") as file:
+            settings = yaml.safe_load(file)
+    except Exception as e:
+        logging.error("Failed to load settings: %s", e)
+        raise
+    return format_settings(settings, settings["robot_name"], settings["base_path"])
+
+
+def format_settings(
+    settings: Dict[str, Any], robot_name: str, base_path: str
+) -> Dict[str, Any]:
+    for key in FORMATTED_KEYS:
+        if key in settings:
+            settings[key] = settings[key].format(
+                robot_name=robot_name, base_path=base_path
+            )
+    if not settings.get("aws_access_key_id"):
+        settings["aws_access_key_id"] = os.environ.get("IoTRobotAccessKeyId", "")
+    if not settings.get("aws_secret_access_key"):
+        settings["aws_secret_access_key"] = os.environ.get("IoTRobotSecretAccessKey", "")
+    return settings
+
+
+def session_options(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Session and reconnect keyword arguments for the client builders, from settings."""
+    return dict(
+        session_behavior=SESSION_BEHAVIORS[settings.get("session_behavior", "rejoin_post_success")],
+        session_expiry_interval_sec=int(settings.get("session_expiry", SESSION_EXPIRY)),
+        retry_jitter_mode=JITTER_MODES[settings.get("reconnect_jitter", "full")],
+        min_reconnect_delay_ms=int(settings.get("min_reconnect_ms", MIN_RECONNECT_MS)),
+        max_reconnect_delay_ms=int(settings.get("max_reconnect_ms", MAX_RECONNECT_MS)),
+        client_bootstrap=io.ClientBootstrap.get_or_create_static_default(),
+    )
+
+
+def prefetch_address(endpoint: str) -> threading.Thread:
+    """Resolve endpoint in the background so the first connect finds it cached."""
+    def resolve():
+        started = time.perf_counter()
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(endpoint, None, type=socket.SOCK_STREAM)}
+            logging.info("Resolved %s in %.1f ms: %s", endpoint, (time.perf_counter() - started) * 1000,
+                         ", ".join(sorted(addresses)))
+        except OSError as e:
+            logging.warning("Could not resolve %s: %s", endpoint, e)
+
+    thread = threading.Thread(target=resolve, name="mqtt-resolve", daemon=True)
+    thread.start()
+    return thread
+
+
+def _build_mtls(settings: Dict[str, Any], port: int, **client_args) -> mqtt5.Client:
+    return mqtt5_client_builder.mtls_from_path(
+        port=port,
+        cert_filepath=settings["input_cert"],
+        pri_key_filepath=settings["input_key"],
+        ca_filepath=settings["input_ca"],
+        **client_args
+    )
+
+
+def _build_websocket(settings: Dict[str, Any], port: int, **client_args) -> mqtt5.Client:
+    # SigV4-signed websocket handshake with static IoT robot credentials
+    credentials_provider = auth.AwsCredentialsProvider.new_static(
+        access_key_id=settings["aws_access_key_id"],
+        secret_access_key=settings["aws_secret_access_key"],
+    )
+    return mqtt5_client_builder.websockets_with_default_aws_signing(
+        region=settings.get("region", "us-east-1"),
+        credentials_provider=credentials_provider,
+        ca_filepath=settings["input_ca"],
+        port=port,
+        **client_args
+    )
+
+
+def _build_tcp(settings: Dict[str, Any], port: int, **client_args) -> mqtt5.Client:
+    # Plain MQTT without TLS, for a broker on the local network or a test broker
+    return mqtt5.Client(
+        mqtt5.ClientOptions(
+            host_name=client_args["endpoint"],
+            port=port,
+            bootstrap=client_args.get("client_bootstrap"),
+            connect_options=mqtt5.ConnectPacket(
+                client_id=client_args["client_id"],
+                keep_alive_interval_sec=client_args["keep_alive_interval_sec"],
+                session_expiry_interval_sec=client_args.get("session_expiry_interval_sec"),
+            ),
+            session_behavior=client_args.get("session_behavior"),
+            retry_jitter_mode=client_args.get("retry_jitter_mode"),
+            min_reconnect_delay_ms=client_args.get("min_reconnect_delay_ms"),
+            max_reconnect_delay_ms=client_args.get("max_reconnect_delay_ms"),
+            on_publish_callback_fn=client_args["on_publish_received"],
+            on_lifecycle_event_stopped_fn=client_args["on_lifecycle_stopped"],
+            on_lifecycle_event_connection_success_fn=client_args["on_lifecycle_connection_success"],
+            on_lifecycle_event_connection_failure_fn=client_args["on_lifecycle_connection_failure"],
+            on_lifecycle_event_disconnection_fn=client_args.get("on_lifecycle_disconnection"),
+        )
+    )
+
+
+# Transport name -> builder(settings, port, **client_args); add entries for other transports
+TRANSPORTS: Dict[str, Callable[..., mqtt5.Client]] = {
+    "mtls": _build_mtls,
+    "websocket": _build_websocket,
+    "tcp": _build_tcp,
+}
+
+
+class ConnectAttempt:
+    """One transport's client and the futures its lifecycle callbacks resolve."""
+
+    def __init__(self, transport: str, on_publish_received: Callable) -> None:
+        self.transport = transport
+        self.client: Optional[mqtt5.Client] = None
+        self.connected = Future()
+        self.stopped = Future()
+        self.started_at = 0.0
+        self.failures = 0
+        self.disconnected_at: Optional[float] = None
+        # Called with (attempt, connack) when an established connection comes back
+        self.on_reconnected: Optional[Callable] = None
+        self._on_publish_received = on_publish_received
+
+    def start(self, settings: Dict[str, Any], port: int) -> None:
+        self.client = TRANSPORTS[self.transport](
+            settings,
+            port,
+            endpoint=settings["input_endpoint"],
+            client_id=settings["input_clientId"],
+            keep_alive_interval_sec=KEEP_ALIVE,
+            on_publish_received=self._on_publish_received,
+            on_lifecycle_stopped=self.on_lifecycle_stopped,
+            on_lifecycle_connection_success=self.on_lifecycle_connection_success,
+            on_lifecycle_connection_failure=self.on_lifecycle_connection_failure,
+            on_lifecycle_disconnection=self.on_lifecycle_disconnection,
+            **session_options(settings)
+        )
+        self.started_at = time.perf_counter()
+        self.client.start()
+
+    def on_lifecycle_stopped(self, lifecycle_stopped_data: mqtt5.LifecycleStoppedData):
+        logging.info("Lifecycle Stopped (%s)", self.transport)
+        if not self.stopped.done():
+            self.stopped.set_result(lifecycle_stopped_data)
+
+    def on_lifecycle_connection_success(
+        self, lifecycle_connect_success_data: mqtt5.LifecycleConnectSuccessData
+    ):
+        logging.info("Lifecycle Connection Success (%s)", self.transport)
+        if not self.connected.done():
+            self.connected.set_result(lifecycle_connect_success_data)
+        elif self.on_reconnected is not None:
+            self.on_reconnected(self, lifecycle_connect_success_data.connack_packet)
+
+    def on_lifecycle_disconnection(self, lifecycle_disconnect_data: mqtt5.LifecycleDisconnectData):
+        self.disconnected_at = time.perf_counter()
+        logging.warning("Lifecycle Disconnection (%s): %s", self.transport, lifecycle_disconnect_data.exception)
+
+    def on_lifecycle_connection_failure(
+        self, lifecycle_connection_failure: mqtt5.LifecycleConnectFailureData
+    ):
+        self.failures += 1
+        logging.error(
+            "Lifecycle Connection Failure (%s): %s",
+            self.transport,
+            lifecycle_connection_failure.exception,
+        )
+
+    def stop(self) -> None:
+        if self.client is not None:
+            self.client.stop()
+
+
+class PubSubClient:
+    """Connects over the first transport that works and queues received actions."""
+
+    def __init__(
+        self,
+        settings: Dict[str, Any],
+        executor_factory: Callable[[], Any],
+        transports: Optional[List[str]] = None,
+        strategy: str = "race",
+        timeout: float = TIMEOUT,
+        stagger: float = RACE_STAGGER,
+        inbox_size: Optional[int] = None,
+    ) -> None:
+        self.settings = settings
+        self.executor_factory = executor_factory
+        self.transports = transports or settings.get("transports") or DEFAULT_TRANSPORTS
+        self.strategy = strategy
+        self.timeout = timeout
+        self.stagger = stagger
+        self.message_topic = settings["input_topic"]
+        self.broadcast_topic = settings.get("broadcast_topic", BROADCAST_TOPIC)
+        self.group_topic_prefix = settings.get("group_topic_prefix", GROUP_TOPIC_PREFIX)
+        # robot_1/topic -> robot_1/groups
+        self.groups_topic = settings.get("groups_topic") or self.message_topic.rsplit("/", 1)[0] + "/groups"
+        self.groups: List[str] = []
+        self._groups_lock = threading.Lock()
+        self.client: Optional[mqtt5.Client] = None
+        self.connection: Optional[ConnectAttempt] = None
+        self.connect_seconds: Optional[float] = None
+        self.received_all_event = threading.Event()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.log_sample_every = int(settings.get("log_sample_every", LOG_SAMPLE_EVERY))
+        self._handled = 0
+        if inbox_size is None:
+            inbox_size = int(settings.get("inbox_size", INBOX_SIZE))
+        dedupe_window = float(settings.get("dedupe_window", DEDUPE_WINDOW))
+        self.seen_ids = (
+            SeenIds(dedupe_window, max_ids=int(settings.get("dedupe_max_ids", DEDUPE_MAX_IDS)))
+            if dedupe_window > 0 else None
+        )
+        # inbox_size 0 handles messages on the awscrt thread, as before the inbox
+        self.inbox = Inbox(self.handle_message, inbox_size).start() if inbox_size > 0 else None
+        # (seconds from disconnection to subscribed again, session resumed) per reconnect
+        self.reconnects: List[tuple] = []
+
+    @property
+    def executor(self):
+        """The ActionExecutor, built by executor_factory on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = self.executor_factory()
+            return self._executor
+
+    def port_for(self, transport: str) -> int:
+        return int(self.settings.get(f"{transport}_port", DEFAULT_PORTS[transport]))
+
+    def on_publish_received(self, publish_packet_data):
+        # Runs on the awscrt event-loop thread: hand off and return
+        publish_packet = publish_packet_data.publish_packet
+        if self.inbox is not None:
+            self.inbox.put(publish_packet.topic, publish_packet.payload)
+        else:
+            self.handle_message(publish_packet.topic, publish_packet.payload)
+
+    def handle_message(self, topic: str, payload: bytes) -> None:
+        """Parse and validate one message and queue its action."""
+        self._handled += 1
+        if self._handled % self.log_sample_every == 1 or self.log_sample_every <= 1:
+            logging.debug("Received message %d from topic '%s': %.200r", self._handled, topic, payload)
+        if topic == self.groups_topic and not payload:
+            # Retained membership cleared: the robot was deleted
+            self.update_groups([])
+            return
+        try:
+            message = json.loads(payload)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            logging.error("Invalid JSON payload received on '%s'", topic)
+            return
+        if topic == self.groups_topic:
+            groups = message.get("groups") if isinstance(message, dict) else None
+            if not isinstance(groups, list) or not all(isinstance(g, str) for g in groups):
+                logging.warning("Ignoring invalid group list on '%s'", topic)
+                return
+            self.update_groups(groups)
+            return
+        action_name = message.get("toolName") if isinstance(message, dict) else None
+        if not isinstance(action_name, str) or not action_name:
+            logging.warning("No action specified in the payload")
+            return
+        message_id = message.get("messageId")
+        if message_id is not None and self.seen_ids is not None and self.seen_ids.check_and_add(message_id):
+            logging.info("Dropping redelivered message %s (%s)", message_id, action_name)
+            return
+        try:
+            self.executor.add_action_to_queue(action_name)
+        except Exception as e:
+            logging.error("Exception queueing action %s: %s", action_name, e)
+
+    def group_topic(self, group: str) -> str:
+        return self.group_topic_prefix + group
+
+    @property
+    def topics(self) -> List[str]:
+        """Every topic this robot takes commands from."""
+        topics = [self.message_topic, self.groups_topic]
+        if self.broadcast_topic:
+            topics.append(self.broadcast_topic)
+        return topics + [self.group_topic(g) for g in self.groups]
+
+    def update_groups(self, groups: List[str]) -> None:
+        """Follow a new group list: subscribe to joined groups, unsubscribe from left ones."""
+        with self._groups_lock:
+            joined = [g for g in dict.fromkeys(groups) if g not in self.groups]
+            left = [g for g in self.groups if g not in groups]
+            self.groups = list(dict.fromkeys(groups))
+        if not joined and not left:
+            return
+        logging.info("Groups now %s (joined %s, left %s)", self.groups, joined, left)
+        if self.client is None:
+            # Not connected yet: subscribe() picks up self.groups
+            return
+        # May run on the awscrt thread when there is no inbox: never wait here
+        if joined:
+            joined_topics = [self.group_topic(g) for g in joined]
+            self.client.subscribe(
+                subscribe_packet=self._subscribe_packet(joined_topics)
+            ).add_done_callback(lambda done: self._log_ack("Subscribe", joined_topics, done))
+        if left:
+            left_topics = [self.group_topic(g) for g in left]
+            self.client.unsubscribe(
+                unsubscribe_packet=mqtt5.UnsubscribePacket(topic_filters=left_topics)
+            ).add_done_callback(lambda done: self._log_ack("Unsubscribe", left_topics, done))
+
+    @staticmethod
+    def _log_ack(operation: str, topics: List[str], done: Future) -> None:
+        if done.exception() is not None:
+            logging.error("%s %s failed: %s", operation, topics, done.exception())
+        else:
+            logging.info("%s %s: %s", operation, topics, done.result().reason_codes)
+
+    def inbox_metrics(self) -> Dict[str, Any]:
+        metrics = self.inbox.metrics() if self.inbox is not None else {"handled_inline": self._handled}
+        if self.seen_ids is not None:
+            metrics["dedupe"] = self.seen_ids.metrics()
+        return metrics
+
+    def reconnect_metrics(self) -> Dict[str, Any]:
+        seconds = [s for s, _ in self.reconnects if s is not None]
+        return {
+            "reconnects": len(self.reconnects),
+            "session_resumed": sum(1 for _, resumed in self.reconnects if resumed),
+            "resubscribe_ms_last": 1000.0 * seconds[-1] if seconds else None,
+            "resubscribe_ms_avg": 1000.0 * sum(seconds) / len(seconds) if seconds else None,
+            "resubscribe_ms_max": 1000.0 * max(seconds) if seconds else None,
+        }
+
+    def _on_reconnected(self, attempt: ConnectAttempt, connack: mqtt5.ConnackPacket) -> None:
+        # Runs on the awscrt thread: never wait on a future here
+        lost_at = attempt.disconnected_at or time.perf_counter()
+        if connack.session_present:
+            self._record_reconnect(lost_at, True)
+            return
+        subscribe_future = attempt.client.subscribe(subscribe_packet=self._subscribe_packet())
+
+        def on_suback(done):
+            if done.exception() is not None:
+                logging.error("Resubscribe to %s failed: %s", self.topics, done.exception())
+                self.reconnects.append((None, False))
+            else:
+                self._record_reconnect(lost_at, False)
+
+        subscribe_future.add_done_callback(on_suback)
+
+    def _record_reconnect(self, lost_at: float, resumed: bool) -> None:
+        seconds = time.perf_counter() - lost_at
+        self.reconnects.append((seconds, resumed))
+        logging.info("Subscribed again %.0f ms after the connection dropped (%s)", seconds * 1000,
+                     "session resumed" if resumed else "resubscribed")
+
+    def start_connecting(self) -> List[ConnectAttempt]:
+        """Start the first attempt (every attempt for race with no stagger)."""
+        self._attempts = [ConnectAttempt(t, self.on_publish_received) for t in self.transports]
+        self._started = time.perf_counter()
+        self._next_attempt = 0
+        self._launch_next()
+        if self.strategy == "race" and self.stagger <= 0:
+            while self._next_attempt < len(self._attempts):
+                self._launch_next()
+        return self._attempts
+
+    def _launch_next(self) -> None:
+        attempt = self._attempts[self._next_attempt]
+        self._next_attempt += 1
+        logging.info("Trying MQTT %s connection...", attempt.transport)
+        try:
+            attempt.start(self.settings, self.port_for(attempt.transport))
+        except Exception as e:
+            # e.g. missing certificate files; the other transports can still win
+            logging.warning("MQTT %s could not start: %s", attempt.transport, e)
+            attempt.connected.set_exception(e)
+
+    def finish_connecting(self) -> mqtt5.Client:
+        """Wait for a winner, stop the other attempts and return the connected client."""
+        if self.strategy == "sequential":
+            winner = self._await_sequential()
+        else:
+            winner = self._await_race()
+        for attempt in self._attempts:
+            if attempt is not winner and attempt.client is not None:
+                attempt.stop()
+        self.connection = winner
+        self.client = winner.client
+        winner.on_reconnected = self._on_reconnected
+        self.connect_seconds = time.perf_counter() - self._started
+        connack_packet = winner.connected.result().connack_packet
+        logging.info(
+            "Connected to endpoint: '%s' with Client ID: '%s' (%s, %.2fs) reason_code: %s",
+            self.settings["input_endpoint"],
+            self.settings["input_clientId"],
+            winner.transport,
+            self.connect_seconds,
+            repr(connack_packet.reason_code),
+        )
+        return self.client
+
+    def _await_sequential(self) -> ConnectAttempt:
+        while True:
+            attempt = self._attempts[self._next_attempt - 1]
+            try:
+                attempt.connected.result(self.timeout)
+                return attempt
+            except Exception as e:
+                if self._next_attempt == len(self._attempts):
+                    raise
+                logging.warning("MQTT %s failed: %s. Trying %s...", attempt.transport, e,
+                                self._attempts[self._next_attempt].transport)
+                attempt.stop()
+                self._launch_next()
+
+    def _await_race(self) -> ConnectAttempt:
+        deadline = time.perf_counter() + self.timeout
+        next_launch = self._started + self.stagger
+        while True:
+            now = time.perf_counter()
+            for attempt in self._attempts[:self._next_attempt]:
+                if attempt.connected.done() and attempt.connected.exception() is None:
+                    return attempt
+            launched = self._attempts[:self._next_attempt]
+            if self._next_attempt < len(self._attempts) and (
+                now >= next_launch or all(a.connected.done() for a in launched)
+            ):
+                # Start the next transport early once every running one has given up
+                self._launch_next()
+                next_launch = now + self.stagger
+                continue
+            if now >= deadline:
+                raise TimeoutError(
+                    f"No MQTT transport connected within {self.timeout}s "
+                    f"({', '.join(a.transport for a in self._attempts)})"
+                )
+            if all(a.connected.done() for a in self._attempts):
+                raise ConnectionError("Every MQTT transport failed to start")
+            pending = [a.connected for a in launched if not a.connected.done()]
+            until = deadline
+            if self._next_attempt < len(self._attempts):
+                until = min(until, next_launch)
+            wait(pending, timeout=max(until - now, 0.0), return_when=FIRST_COMPLETED)
+
+    def connect(self) -> mqtt5.Client:
+        self.start_connecting()
+        return self.finish_connecting()
+
+    def _subscribe_packet(self, topics: Optional[List[str]] = None) -> mqtt5.SubscribePacket:
+        return mqtt5.SubscribePacket(
+            subscriptions=[
+                mqtt5.Subscription(
+                    topic_filter=topic, qos=mqtt5.QoS.AT_LEAST_ONCE
+                )
+                for topic in (topics or self.topics)
+            ]
+        )
+
+    def subscribe(self) -> None:
+        logging.info("Subscribing to topics %s...", self.topics)
+        subscribe_future = self.client.subscribe(subscribe_packet=self._subscribe_packet())
+        suback = subscribe_future.result(self.timeout)
+        logging.info("Subscribed with %s", suback.reason_codes)
+
+    def unsubscribe(self) -> None:
+        try:
+            logging.info("Unsubscribing from topics %s", self.topics)
+            unsubscribe_future = self.client.unsubscribe(
+                unsubscribe_packet=mqtt5.UnsubscribePacket(
+                    topic_filters=self.topics
+                )
+            )
+            unsuback = unsubscribe_future.result(self.timeout)
+            logging.info("Unsubscribed with %s", unsuback.reason_codes)
+        except Exception as e:
+            logging.warning("Exception during unsubscribe: %s", e)
+
+    def stop(self) -> None:
+        logging.info("Stopping Client")
+        if self.connection is not None:
+            self.connection.stop()
+        if self.inbox is not None:
+            self.inbox.drain(1.0)
+            self.inbox.stop()
+            logging.info("Inbox: %s", self.inbox_metrics())
+        if self.reconnects:
+            logging.info("Reconnects: %s", self.reconnect_metrics())
+        if self._executor is not None:
+            self._executor.stop()
+        if self.connection is not None:
+            try:
+                self.connection.stopped.result(self.timeout)
+            except Exception as e:
+                logging.warning("Exception waiting for client stop: %s", e)
+        logging.info("Client Stopped!")
+
+    def wait_for_stop(self, daemon: Optional[bool] = None) -> None:
+        """Block until 's' is typed or, as a daemon, until SIGTERM/SIGINT."""
+        if daemon is None:
+            daemon = not sys.stdin.isatty()
+        if not daemon:
+            logging.info("Receiving messages until user inputs 's' to stop")
+            try:
+                while True:
+                    user_input = input("Type 's' and press Enter to stop the program: ")
+                    if user_input.strip().lower() == "s":
+                        logging.info("'s' received, shutting down gracefully...")
+                        self.received_all_event.set()
+                        return
+            except EOFError:
+                logging.info("stdin closed; running until SIGTERM")
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self.received_all_event.set())
+        logging.info("Running as a daemon until SIGTERM or SIGINT")
+        self.received_all_event.wait()
+        logging.info("Signal received, shutting down gracefully...")
+
+    def run(self, daemon: Optional[bool] = None) -> None:
+        try:
+            prefetch_address(self.settings["input_endpoint"])
+            self.start_connecting()
+            # Build the executor (ROS start-up included) while the connection is set up
+            self.executor
+            self.finish_connecting()
+            self.subscribe()
+            self.wait_for_stop(daemon)
+        except KeyboardInterrupt:
+            logging.info("KeyboardInterrupt received, shutting down...")
+        finally:
+            if self.client is not None:
+                self.unsubscribe()
+            else:
+                for attempt in getattr(self, "_attempts", []):
+                    attempt.stop()
+            self.stop()
+
+
+def add_client_arguments(parser) -> None:
+    """Command-line options shared by the pubsub entry points."""
+    parser.add_argument("--settings", default="settings.yaml")
+    parser.add_argument("--daemon", action="store_true", default=None,
+                        help="Run until SIGTERM instead of reading 's' from stdin")
+    parser.add_argument("--transport", action="append", choices=sorted(TRANSPORTS),
+                        help="Transport to try, in order of preference; repeatable")
+    parser.add_argument("--strategy", choices=["race", "sequential"], default="race")
@@ -0,0 +1,351 @@
+"""
+Minimal MQTT 5 broker for benchmarks and local runs, without TLS or auth.
+
+It implements only what the robot clients use: CONNECT, SUBSCRIBE,
+UNSUBSCRIBE, PUBLISH at QoS 0 and 1 with + and # wildcards, retained
+messages, PINGREQ and DISCONNECT. QoS 1 deliveries are sent with a packet ID but not resent
+unless redeliver is set: that fraction of QoS 1 deliveries is sent a
+second time with the DUP flag, as a broker does after a lost PUBACK.
+
+Sessions follow MQTT 5: a client that connects without clean start and
+with a session expiry interval gets its subscriptions back, and the QoS 1
+messages routed to it while it was away, with session present set in the
+CONNACK. drop() cuts a client's connection without a DISCONNECT, like a
+Wi-Fi dropout.
+
+    python mqtt_test_broker.py --port 1883
+
+or in-process:
+
+    broker = TestBroker()
+    port = broker.start()          # background thread, free port
+    ...
+    broker.stop()
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+SESSION_EXPIRY_INTERVAL = 0x11
+# Property identifier -> encoding, for skipping the properties the broker ignores
+PROPERTY_TYPES = {
+    0x01: 1, 0x17: 1, 0x19: 1, 0x24: 1, 0x25: 1, 0x28: 1, 0x29: 1, 0x2A: 1,
+    0x13: 2, 0x21: 2, 0x22: 2, 0x23: 2,
+    0x02: 4, 0x11: 4, 0x18: 4, 0x27: 4,
+    0x0B: "varint",
+    0x03: "string", 0x08: "string", 0x12: "string", 0x15: "string", 0x1A: "string", 0x1C: "string",
+    0x1F: "string", 0x09: "string", 0x16: "string",
+    0x26: "pair",
+}
+OFFLINE_QUEUE_LIMIT = 1000
+
+
+def encode_varint(value):
+    out = bytearray()
+    while True:
+        byte, value = value % 128, value // 128
+        out.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(out)
+
+
+def decode_varint(data, pos):
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_string(text):
+    raw = text.encode("utf-8")
+    return len(raw).to_bytes(2, "big") + raw
+
+
+def decode_string(data, pos):
+    length = int.from_bytes(data[pos:pos + 2], "big")
+    return data[pos + 2:pos + 2 + length].decode("utf-8"), pos + 2 + length
+
+
+def decode_properties(data, pos):
+    """Returns ({identifier: value} for fixed-size properties, position after them)."""
+    length, pos = decode_varint(data, pos)
+    end = pos + length
+    properties = {}
+    while pos < end:
+        identifier = data[pos]
+        pos += 1
+        kind = PROPERTY_TYPES[identifier]
+        if kind == "varint":
+            _, pos = decode_varint(data, pos)
+        elif kind == "string":
+            pos += 2 + int.from_bytes(data[pos:pos + 2], "big")
+        elif kind == "pair":
+            for _ in range(2):
+                pos += 2 + int.from_bytes(data[pos:pos + 2], "big")
+        else:
+            properties[identifier] = int.from_bytes(data[pos:pos + kind], "big")
+            pos += kind
+    return properties, end
+
+
+def packet(packet_type, body, flags=0):
+    return bytes([packet_type << 4 | flags]) + encode_varint(len(body)) + body
+
+
+def topic_matches(topic_filter, topic):
+    filter_parts = topic_filter.split("/")
+    topic_parts = topic.split("/")
+    for i, part in enumerate(filter_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(filter_parts) == len(topic_parts)
+
+
+class Session:
+    def __init__(self, writer):
+        self.writer = writer
+        self.client_id = None
+        self.subscriptions = {}  # topic filter -> granted QoS
+        self.next_packet_id = 1
+        self.expiry = 0
+        # (topic, payload) queued while the client was offline
+        self.pending = deque(maxlen=OFFLINE_QUEUE_LIMIT)
+
+    def packet_id(self):
+        packet_id = self.next_packet_id
+        self.next_packet_id = packet_id % 65535 + 1
+        return packet_id
+
+
+class TestBroker:
+    """Routes publishes between connected clients; one asyncio loop on a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=0, redeliver=0.0):
+        self.host = host
+        self.port = port
+        self.redeliver = redeliver
+        self.redelivered = 0
+        self.sessions = {}  # client ID -> Session
+        self.offline = {}  # client ID -> (Session, expires at)
+        self.retained = {}  # topic -> (payload, QoS)
+        self.connects = 0
+        self.resumed = 0
+        self.drops = 0
+        self.published = 0
+        self.delivered = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    async def _read_packet(self, reader):
+        first = await reader.readexactly(1)
+        length, shift = 0, 0
+        while True:
+            byte = (await reader.readexactly(1))[0]
+            length |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+            shift += 7
+        body = await reader.readexactly(length) if length else b""
+        return first[0] >> 4, first[0] & 0x0F, body
+
+    async def _handle(self, reader, writer):
+        session = Session(writer)
+        try:
+            while True:
+                packet_type, flags, body = await self._read_packet(reader)
+                if packet_type == CONNECT:
+                    self._on_connect(session, body)
+                elif packet_type == PUBLISH:
+                    self._on_publish(session, flags, body)
+                elif packet_type == SUBSCRIBE:
+                    self._on_subscribe(session, body)
+                elif packet_type == UNSUBSCRIBE:
+                    self._on_unsubscribe(session, body)
+                elif packet_type == PINGREQ:
+                    writer.write(packet(PINGRESP, b""))
+                elif packet_type == DISCONNECT:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if session.client_id is not None and self.sessions.get(session.client_id) is session:
+                del self.sessions[session.client_id]
+                if session.expiry:
+                    self.offline[session.client_id] = (session, time.monotonic() + session.expiry)
+            writer.close()
+
+    def _on_connect(self, session, body):
+        pos = 0
+        _, pos = decode_string(body, pos)  # protocol name
+        clean_start = body[pos + 1] & 0x02
+        pos += 4  # level, flags, keep alive
+        properties, pos = decode_properties(body, pos)
+        session.expiry = properties.get(SESSION_EXPIRY_INTERVAL, 0)
+        session.client_id, pos = decode_string(body, pos)
+        previous = self.sessions.get(session.client_id)
+        if previous is not None:
+            # Same client ID: the newer connection takes over, as on AWS IoT
+            previous.writer.close()
+        stored, expires_at = self.offline.pop(session.client_id, (None, 0.0))
+        session_present = bool(stored and not clean_start and time.monotonic() < expires_at)
+        if session_present:
+            session.subscriptions = stored.subscriptions
+            session.pending = stored.pending
+            self.resumed += 1
+        self.sessions[session.client_id] = session
+        self.connects += 1
+        session.writer.write(packet(CONNACK, bytes([session_present]) + b"\x00\x00"))
+        while session.pending:
+            self._deliver(session, *session.pending.popleft(), 1)
+
+    def _on_publish(self, session, flags, body):
+        qos = (flags >> 1) & 0x03
+        topic, pos = decode_string(body, 0)
+        if qos:
+            packet_id = int.from_bytes(body[pos:pos + 2], "big")
+            pos += 2
+            session.writer.write(packet(PUBACK, packet_id.to_bytes(2, "big")))
+        properties, pos = decode_varint(body, pos)
+        payload = body[pos + properties:]
+        self.published += 1
+        self.route(topic, payload, qos, retain=bool(flags & 0x01))
+
+    def route(self, topic, payload, qos=1, retain=False):
+        if retain:
+            # An empty retained payload clears the topic
+            if payload:
+                self.retained[topic] = (payload, qos)
+            else:
+                self.retained.pop(topic, None)
+        for target in list(self.sessions.values()):
+            granted = max(
+                (q for f, q in target.subscriptions.items() if topic_matches(f, topic)), default=None
+            )
+            if granted is not None:
+                self._deliver(target, topic, payload, min(qos, granted))
+        if qos:
+            now = time.monotonic()
+            for client_id, (target, expires_at) in list(self.offline.items()):
+                if now >= expires_at:
+                    del self.offline[client_id]
+                elif any(q and topic_matches(f, topic) for f, q in target.subscriptions.items()):
+                    target.pending.append((topic, payload))
+
+    def _deliver(self, target, topic, payload, out_qos, retain=False):
+        header = encode_string(topic)
+        if out_qos:
+            header += target.packet_id().to_bytes(2, "big")
+        body = header + b"\x00" + payload
+        target.writer.write(packet(PUBLISH, body, flags=out_qos << 1 | retain))
+        self.delivered += 1
+        if out_qos and self.redeliver and random.random() < self.redeliver:
+            target.writer.write(packet(PUBLISH, body, flags=out_qos << 1 | 0x08))
+            self.redelivered += 1
+
+    def _on_subscribe(self, session, body):
+        packet_id = body[:2]
+        properties, pos = decode_varint(body, 2)
+        pos += properties
+        codes = bytearray()
+        topic_filters = []
+        while pos < len(body):
+            topic_filter, pos = decode_string(body, pos)
+            qos = body[pos] & 0x03
+            pos += 1
+            session.subscriptions[topic_filter] = min(qos, 1)
+            codes.append(min(qos, 1))
+            topic_filters.append(topic_filter)
+        session.writer.write(packet(SUBACK, packet_id + b"\x00" + bytes(codes)))
+        for topic, (payload, qos) in list(self.retained.items()):
+            for topic_filter in topic_filters:
+                if topic_matches(topic_filter, topic):
+                    self._deliver(session, topic, payload, min(qos, session.subscriptions[topic_filter]), True)
+                    break
+
+    def _on_unsubscribe(self, session, body):
+        packet_id = body[:2]
+        properties, pos = decode_varint(body, 2)
+        pos += properties
+        codes = bytearray()
+        while pos < len(body):
+            topic_filter, pos = decode_string(body, pos)
+            codes.append(0x00 if session.subscriptions.pop(topic_filter, None) is not None else 0x11)
+        session.writer.write(packet(UNSUBACK, packet_id + b"\x00" + bytes(codes)))
+
+    async def _serve(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start(self):
+        """Serve on a background thread; returns the bound port."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self.port
+
+    def _run(self):
+        try:
+            self._loop.run_until_complete(self._serve())
+        except asyncio.CancelledError:
+            pass
+
+    def drop(self, client_id):
+        """Cut a client's connection abruptly, without a DISCONNECT."""
+        def abort():
+            session = self.sessions.get(client_id)
+            if session is not None:
+                self.drops += 1
+                session.writer.transport.abort()
+        self._loop.call_soon_threadsafe(abort)
+
+    def publish(self, topic, payload, qos=1, retain=False):
+        """Publish from outside the broker's loop, as if a client had sent it."""
+        self._loop.call_soon_threadsafe(self.route, topic, payload, qos, retain)
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            for session in list(self.sessions.values()):
+                self._loop.call_soon_threadsafe(session.writer.close)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Minimal MQTT 5 broker for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    broker = TestBroker(args.host, args.port)
+    logger.info("Serving MQTT on %s:%d", args.host, args.port)
+    try:
+        asyncio.run(broker._serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Bounded memory of recently seen message IDs, for dropping MQTT redeliveries.
+
+At QoS 1 the broker redelivers any message it has not seen acknowledged,
+for example across a reconnect. A redelivered action must not make the
+robot dance twice. Publishers stamp every message with a messageId, and
+the robot keeps the IDs it has handled in time buckets:
+
+    seen = SeenIds(window=600, buckets=10, max_ids=10000)
+    if seen.check_and_add(message["messageId"]):
+        return                      # duplicate
+
+IDs are remembered for window seconds, less up to one bucket. Each bucket
+holds the IDs from one slice of the window, and the oldest bucket is
+discarded as time moves on. A bucket that grows past max_ids / buckets is
+rotated early, so memory stays bounded under a flood and the window
+shrinks instead.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class SeenIds:
+    """Time-bucketed set of message IDs."""
+
+    def __init__(self, window=600.0, buckets=10, max_ids=10000, clock=time.monotonic):
+        self.window = window
+        self.bucket_seconds = window / buckets
+        self.max_per_bucket = max(1, max_ids // buckets)
+        self._clock = clock
+        self._buckets = deque([set()], maxlen=buckets)
+        self._bucket_started = clock()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.early_rotations = 0
+
+    def _rotate(self, now):
+        elapsed = now - self._bucket_started
+        if elapsed >= self.bucket_seconds:
+            # Skip buckets for slices in which nothing arrived
+            for _ in range(min(int(elapsed // self.bucket_seconds), self._buckets.maxlen)):
+                self._buckets.append(set())
+            self._bucket_started = now
+        elif len(self._buckets[-1]) >= self.max_per_bucket:
+            self._buckets.append(set())
+            self._bucket_started = now
+            self.early_rotations += 1
+
+    def check_and_add(self, message_id):
+        """True if message_id was seen within the window; otherwise remember it."""
+        with self._lock:
+            self._rotate(self._clock())
+            for bucket in self._buckets:
+                if message_id in bucket:
+                    self.duplicates += 1
+                    return True
+            self._buckets[-1].add(message_id)
+            return False
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(bucket) for bucket in self._buckets)
+
+    def metrics(self):
+        return {"remembered": len(self), "duplicates": self.duplicates, "early_rotations": self.early_rotations}
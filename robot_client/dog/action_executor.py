@@ -7,9 +7,13 @@ from typing import Any, Dict, Optional
 from uuid import uuid4
 
 import rclpy
+from rclpy.executors import MultiThreadedExecutor
 from rclpy.node import Node
 from std_srvs.srv import SetBool
-from puppy_control_msgs.msg import Velocity, Pose, Gait
+from gait_presets import GaitManager, load_gait_settings
+from motion_blend import blend_motions
+from ros_publishers import RobotPublishers
+from velocity_streamer import VelocityStreamer, load_velocity_settings
 
 logger = logging.getLogger(__name__)
 
@@ -95,9 +99,10 @@ class ActionExecutor:
         self.node = Node('puppy_action_executor')
         
         # 创建ROS2发布者
-        self.pose_pub = self.node.create_publisher(Pose, '/puppy_control/pose', 10)
-        self.gait_pub = self.node.create_publisher(Gait, '/puppy_control/gait', 10)
-        self.velocity_pub = self.node.create_publisher(Velocity, '/puppy_control/velocity', 10)
+        self.publishers = RobotPublishers(self.node)
+        velocity_settings, self.motions = load_velocity_settings()
+        self.velocity_streamer = VelocityStreamer(self.node, self.publishers.velocity, **velocity_settings)
+        self.gait_manager = GaitManager(self.publishers, **load_gait_settings())
         
         # 创建服务客户端
         self.set_mark_time_client = self.node.create_client(SetBool, '/puppy_control/set_mark_time')
@@ -105,14 +110,70 @@ class ActionExecutor:
         self.consumer_thread = threading.Thread(target=self._consumer, daemon=True)
         self.consumer_thread.start()
         
-        # ROS2 spin线程
+        # ROS2 spin线程; the velocity streamer's timer runs on this executor
+        self.ros_executor = MultiThreadedExecutor(num_threads=2)
+        self.ros_executor.add_node(self.node)
         self.ros_thread = threading.Thread(target=self._ros_spin, daemon=True)
         self.ros_thread.start()
 
-    def _run_action(self, p1: str, p2: str) -> Optional[Dict[str, Any]]:
+    def _ros_spin(self) -> None:
+        try:
+            self.ros_executor.spin()
+        except Exception as e:
+            if not self._stop_event.is_set():
+                self.logger.error(f"ROS spin error: {e}")
+
+    def _execute_ros_action(self, action_name: str) -> None:
+        """Stream the motion configured for action_name in settings.yaml."""
+        motion = self.motions.get(action_name)
+        if motion is None:
+            self.logger.warning("No motion configured for %s", action_name)
+            self.velocity_streamer.stop()
+            return
+        if not motion.get("distance") and not motion.get("yaw"):
+            self.velocity_streamer.run_motion()
+            return
+        if self.gait_manager.apply(self.gait_manager.select(action_name, motion)):
+            # Let the gait controller re-plan before the dog starts moving
+            time.sleep(self.gait_manager.settle_seconds)
+        self.velocity_streamer.run_motion(**{k: v for k, v in motion.items() if k != "gait"})
+
+    def _is_motion(self, action_name: str) -> bool:
+        motion = self.motions.get(action_name) or {}
+        return bool(motion.get("distance") or motion.get("yaw"))
+
+    def _take_blend_followers(self, action_name: str) -> list:
+        """Pull the motions queued right behind action_name so they run as one blend."""
+        if not self.velocity_streamer.blend or not self._is_motion(action_name):
+            return []
+        with self.queue_lock:
+            pending = list(self.action_queue.queue)
+            followers = []
+            for item in pending:
+                if not self._is_motion(item["name"]):
+                    break
+                followers.append(item)
+            if followers:
+                self._replace_queue(pending[len(followers):])
+        return followers
+
+    def _run_blend(self, names: list) -> float:
+        """Stream consecutive motions as one blended profile; returns its length in seconds."""
+        motions = [self.motions[name] for name in names]
+        # One gait for the whole blend, chosen for the fastest linear motion
+        fastest = max(motions, key=lambda m: abs(m.get("speed", 0.0)) if m.get("distance") else 0.0)
+        if self.gait_manager.apply(self.gait_manager.select(names[0], fastest)):
+            time.sleep(self.gait_manager.settle_seconds)
+        profile = blend_motions(
+            motions, self.velocity_streamer.max_accel, self.velocity_streamer.max_yaw_accel, names
+        )
+        self.velocity_streamer.run_profile(profile)
+        return profile.duration
+
+    def _run_action(self, action_name: str) -> Optional[Dict[str, Any]]:
         """Execute action using ROS2."""
         try:
-            self._execute_ros_action(p1)
+            self._execute_ros_action(action_name)
             return {"result": "success"}
         except Exception as e:
             self.logger.error(f"Error running action: {e}")
@@ -121,7 +182,7 @@ class ActionExecutor:
     def _run_stop_action(self) -> Optional[Dict[str, Any]]:
         """Stop current action using ROS2."""
         try:
-            self._publish_velocity(0.0, 0.0, 0.0)
+            self.velocity_streamer.stop()
             return {"result": "success"}
         except Exception as e:
             self.logger.error(f"Error stopping action: {e}")
@@ -157,14 +218,21 @@ class ActionExecutor:
         """Execute a single action from the queue."""
         action_name = action_item["name"]
         action = actions[action_name]
+        followers = self._take_blend_followers(action_name)
         self.current_action = {
             "name": action["name"],
             "sleep_time": action["sleep_time"],
         }
         try:
-            self._run_action(action["action"][0], action["action"][1])
+            if followers:
+                names = [action_name] + [item["name"] for item in followers]
+                sleep_time = self._run_blend(names)
+                self.current_action = {"name": action["name"], "sleep_time": sleep_time, "blended": names}
+            else:
+                self._run_action(action_name)
+                sleep_time = action["sleep_time"]
             elapsed = 0.0
-            while elapsed < action["sleep_time"]:
+            while elapsed < sleep_time:
                 if self._immediate_stop_event.is_set():
                     self.logger.info("Stopping action execution for %s", action_name)
                     self._immediate_stop_event.clear()
@@ -249,6 +317,7 @@ class ActionExecutor:
             "queue": queue_items,
             "current_action": self.current_action,
             "is_running": self.is_running,
+            "gait": self.gait_manager.metrics(),
         }
 
     def stop(self) -> None:
@@ -266,3 +335,5 @@ class ActionExecutor:
         """Gracefully shutdown the consumer thread."""
         self._stop_event.set()
         self.consumer_thread.join()
+        self.velocity_streamer.destroy()
+        self.ros_executor.shutdown()
@@ -7,19 +7,34 @@ from typing import Any, Dict, Optional
 from uuid import uuid4
 
 import rclpy
+from rclpy.callback_groups import MutuallyExclusiveCallbackGroup, ReentrantCallbackGroup
+from rclpy.executors import MultiThreadedExecutor
 from rclpy.node import Node
 from std_srvs.srv import SetBool
-from puppy_control_msgs.msg import Velocity, Pose, Gait
 from puppy_control_msgs.srv import SetRunActionName
+from gait_presets import GaitManager, load_gait_settings
+from motion_blend import blend_motions
+from ros_publishers import RobotPublishers
+from velocity_streamer import VelocityStreamer, load_velocity_settings
 
 logger = logging.getLogger(__name__)
 
+RUN_ACTION_SERVICE = '/puppy_control/runActionGroup'
+# How long an action waits for the service to be discovered before giving up
+SERVICE_WAIT_TIMEOUT = 5.0
+# Extra time allowed past an action's sleep_time for runActionGroup to respond
+SERVICE_RESPONSE_MARGIN = 5.0
+
 # 動作配置字典 (Action configuration dictionary)
 actions: Dict[str, Dict[str, Any]] = {
     # 基础移动
     "back_fast": {"sleep_time": 4.5, "action": ["2", "4"], "name": "back_fast", "type": "velocity"},
     "go_forward": {"sleep_time": 3.5, "action": ["1", "4"], "name": "go_forward", "type": "velocity"},
     "stop": {"sleep_time": 1, "action": ["24", "2"], "name": "stop", "type": "velocity"},
+    "left_move_fast": {"sleep_time": 3, "action": ["3", "4"], "name": "left_move_fast", "type": "velocity"},
+    "right_move_fast": {"sleep_time": 3, "action": ["4", "4"], "name": "right_move_fast", "type": "velocity"},
+    "turn_left": {"sleep_time": 4, "action": ["7", "4"], "name": "turn_left", "type": "velocity"},
+    "turn_right": {"sleep_time": 4, "action": ["8", "4"], "name": "turn_right", "type": "velocity"},
     
     # 姿态动作
     "stand": {"sleep_time": 2, "action": ["stand"], "name": "stand", "type": "action"},
@@ -62,52 +77,122 @@ class ActionExecutor:
         self._immediate_stop_event = threading.Event()
         self.queue_lock = threading.Lock()
         self._stop_event = threading.Event()
+        self._pending_future = None
+        self._pending_abandoned = None
         
         # 初始化ROS2
         rclpy.init()
         self.node = Node('puppy_action_executor')
+        # Service responses and discovery run in separate groups so neither waits on the other
+        self.service_group = MutuallyExclusiveCallbackGroup()
+        self.discovery_group = ReentrantCallbackGroup()
         
         # 创建ROS2发布者
-        self.pose_pub = self.node.create_publisher(Pose, '/puppy_control/pose', 10)
-        self.velocity_pub = self.node.create_publisher(Velocity, '/puppy_control/velocity', 10)
+        self.publishers = RobotPublishers(self.node)
+        # Locomotion is streamed at a fixed rate rather than sent as a single message
+        velocity_settings, self.motions = load_velocity_settings()
+        self.velocity_streamer = VelocityStreamer(self.node, self.publishers.velocity, **velocity_settings)
+        self.gait_manager = GaitManager(self.publishers, **load_gait_settings())
         
-        # 创建动作服务客户端
-        self.run_action_client = self.node.create_client(SetRunActionName, '/puppy_control/runActionGroup')
-        while not self.run_action_client.wait_for_service(timeout_sec=1.0):
-            self.logger.info('Service /puppy_control/runActionGroup not available, waiting...')
+        # 创建动作服务客户端; discovered in the background so startup never blocks on it
+        self.run_action_client = self.node.create_client(
+            SetRunActionName, RUN_ACTION_SERVICE, callback_group=self.service_group
+        )
+        self.service_ready = threading.Event()
+        self._discovery_timer = self.node.create_timer(
+            1.0, self._check_service, callback_group=self.discovery_group
+        )
         
-        self.consumer_thread = threading.Thread(target=self._consumer, daemon=True)
-        self.consumer_thread.start()
-        
-        # ROS2 spin线程
+        # The only thread that spins the node; callbacks run on the executor's pool
+        self.ros_executor = MultiThreadedExecutor(num_threads=2)
+        self.ros_executor.add_node(self.node)
         self.ros_thread = threading.Thread(target=self._ros_spin, daemon=True)
         self.ros_thread.start()
+        self._check_service()
+        
+        self.consumer_thread = threading.Thread(target=self._consumer, daemon=True)
+        self.consumer_thread.start()
 
     def _ros_spin(self):
-        while not self._stop_event.is_set():
-            try:
-                rclpy.spin_once(self.node, timeout_sec=0.1)
-            except Exception as e:
+        try:
+            self.ros_executor.spin()
+        except Exception as e:
+            if not self._stop_event.is_set():
                 self.logger.error(f"ROS spin error: {e}")
-                break
+
+    def _check_service(self):
+        """Timer callback: mark runActionGroup ready once it appears, then stop polling."""
+        if self.service_ready.is_set():
+            return
+        if self.run_action_client.service_is_ready():
+            self.logger.info('Service %s available', RUN_ACTION_SERVICE)
+            self.service_ready.set()
+            self._discovery_timer.cancel()
+        else:
+            self.logger.info('Service %s not available yet', RUN_ACTION_SERVICE)
     
     def _execute_ros_action(self, action_name: str, action_type: str):
+        """Start an action; returns a threading.Event set when it finishes, or None."""
         if action_type == "velocity":
-            self._execute_velocity_action(action_name)
+            return self._execute_velocity_action(action_name)
         elif action_type == "action":
-            self._execute_predefined_action(action_name)
+            return self._execute_predefined_action(action_name)
         else:
-            self._publish_velocity(0.0, 0.0, 0.0)
+            self.velocity_streamer.stop()
+        return None
     
     def _execute_velocity_action(self, action_name: str):
-        if action_name == "go_forward":
-            self._publish_velocity(5.0, 0.0, 0.0)
-        elif action_name == "back_fast":
-            self._publish_velocity(-5.0, 0.0, 0.0)
-        elif action_name == "stop":
-            self._publish_velocity(0.0, 0.0, 0.0)
+        """Run the motion configured for action_name; returns an Event set when it ends."""
+        motion = self.motions.get(action_name)
+        if motion is None:
+            self.logger.error("No motion configured for %s", action_name)
+            self.velocity_streamer.stop()
+            return None
+        if self._is_motion(action_name) and self.gait_manager.apply(self.gait_manager.select(action_name, motion)):
+            # Let the gait controller re-plan before the dog starts moving
+            time.sleep(self.gait_manager.settle_seconds)
+        return self.velocity_streamer.run_motion(**{k: v for k, v in motion.items() if k != "gait"})
     
+    def _is_motion(self, action_name: str) -> bool:
+        motion = self.motions.get(action_name) or {}
+        return bool(motion.get("distance") or motion.get("yaw"))
+
+    def _take_blend_followers(self, action_name: str) -> list:
+        """Pull the motions queued right behind action_name so they run as one blend."""
+        if not self.velocity_streamer.blend or not self._is_motion(action_name):
+            return []
+        with self.queue_lock:
+            pending = list(self.action_queue.queue)
+            followers = []
+            for item in pending:
+                if actions[item["name"]].get("type", "velocity") != "velocity" or not self._is_motion(item["name"]):
+                    break
+                followers.append(item)
+            if followers:
+                self._replace_queue(pending[len(followers):])
+        return followers
+
+    def _execute_blend(self, names: list):
+        """Stream consecutive motions as one blended profile; returns (Event, seconds)."""
+        motions = [self.motions[name] for name in names]
+        # One gait for the whole blend, chosen for the fastest linear motion
+        fastest = max(motions, key=lambda m: abs(m.get("speed", 0.0)) if m.get("distance") else 0.0)
+        if self.gait_manager.apply(self.gait_manager.select(names[0], fastest)):
+            time.sleep(self.gait_manager.settle_seconds)
+        profile = blend_motions(
+            motions, self.velocity_streamer.max_accel, self.velocity_streamer.max_yaw_accel, names,
+        )
+        return self.velocity_streamer.run_profile(profile), profile.duration
+
     def _execute_predefined_action(self, action_name: str):
+        """Call runActionGroup without blocking; the returned Event is set on completion."""
+        finished = threading.Event()
+        if not self.service_ready.wait(SERVICE_WAIT_TIMEOUT):
+            self.logger.error('Service %s not available, skipping %s', RUN_ACTION_SERVICE, action_name)
+            self._on_predefined_action_failed(action_name)
+            finished.set()
+            return finished
+
         request = SetRunActionName.Request()
         # 处理特殊文件名
         if action_name == "look_down":
@@ -116,49 +201,57 @@ class ActionExecutor:
             request.name = f'{action_name}.d6ac'
         
         request.wait = True
+        abandoned = threading.Event()
         future = self.run_action_client.call_async(request)
-        
-        # 等待服务调用完成
-        rclpy.spin_until_future_complete(self.node, future, timeout_sec=10.0)
-        
-        if future.result() is not None:
-            self.logger.info(f'Successfully executed predefined action: {action_name}')
-        else:
-            self.logger.error(f'Failed to execute predefined action: {action_name}')
-            # 如果服务调用失败，尝试使用pose作为备用
-            if action_name == "stand":
-                self._publish_pose()
-    
-    def _publish_velocity(self, x: float, y: float, yaw_rate: float):
-        msg = Velocity()
-        msg.x = x
-        msg.y = y
-        msg.yaw_rate = yaw_rate
-        self.velocity_pub.publish(msg)
-    
-    def _publish_pose(self):
-        msg = Pose()
-        msg.stance_x = 0.0
-        msg.stance_y = 0.0
-        msg.x_shift = -0.6
-        msg.height = -10.0
-        msg.roll = 0.0
-        msg.pitch = 0.0
-        msg.yaw = 0.0
-        msg.run_time = 500
-        self.pose_pub.publish(msg)
+        self._pending_future = future
+        self._pending_abandoned = abandoned
+
+        # 服务调用完成后由执行器线程回调
+        def on_done(done_future):
+            # The action group leaves the body in its own pose
+            self.gait_manager.invalidate()
+            if abandoned.is_set():
+                # The scheduler gave up on this call; a late response changes nothing.
+                # rclpy runs the callbacks again if a response arrives after cancel()
+                return
+            if done_future.cancelled():
+                self.logger.info(f'Predefined action interrupted: {action_name}')
+            elif done_future.exception() is not None or done_future.result() is None:
+                self.logger.error(f'Failed to execute predefined action: {action_name}')
+                self._on_predefined_action_failed(action_name)
+            else:
+                self.logger.info(f'Successfully executed predefined action: {action_name}')
+            finished.set()
+
+        future.add_done_callback(on_done)
+        return finished
+
+    def _abandon_pending(self):
+        """Stop waiting for the runActionGroup call in flight and ignore its response."""
+        if self._pending_abandoned is not None:
+            self._pending_abandoned.set()
+        if self._pending_future is not None:
+            self._pending_future.cancel()
+
+    def _on_predefined_action_failed(self, action_name: str):
+        # 如果服务调用失败，尝试使用pose作为备用
+        if action_name == "stand":
+            self.gait_manager.restore_pose()
+
+    def get_gait_metrics(self) -> Dict[str, Any]:
+        return self.gait_manager.metrics()
 
     def _run_action(self, action_name: str, action_type: str) -> Optional[Dict[str, Any]]:
         try:
-            self._execute_ros_action(action_name, action_type)
-            return {"result": "success"}
+            finished = self._execute_ros_action(action_name, action_type)
+            return {"result": "success", "finished": finished}
         except Exception as e:
             self.logger.error(f"Error running action: {e}")
             return None
 
     def _run_stop_action(self) -> Optional[Dict[str, Any]]:
         try:
-            self._publish_velocity(0.0, 0.0, 0.0)
+            self.velocity_streamer.stop()
             return {"result": "success"}
         except Exception as e:
             self.logger.error(f"Error stopping action: {e}")
@@ -167,24 +260,48 @@ class ActionExecutor:
     def _execute_action(self, action_item: Dict[str, Any]) -> None:
         action_name = action_item["name"]
         action = actions[action_name]
+        action_type = action.get("type", "velocity")
+        followers = self._take_blend_followers(action_name) if action_type == "velocity" else []
         self.current_action = {
             "name": action["name"],
             "sleep_time": action["sleep_time"],
         }
         try:
-            self._run_action(action_name, action.get("type", "velocity"))
-            elapsed = 0.0
-            while elapsed < action["sleep_time"]:
-                if self._immediate_stop_event.is_set():
+            if followers:
+                # Consecutive motions run back to back without stopping in between
+                names = [action_name] + [item["name"] for item in followers]
+                finished, sleep_time = self._execute_blend(names)
+                self.current_action = {"name": action["name"], "sleep_time": sleep_time, "blended": names}
+            else:
+                result = self._run_action(action_name, action_type)
+                finished = result["finished"] if result else None
+                sleep_time = action["sleep_time"]
+            if finished is None:
+                # Fire-and-forget actions run for their configured time
+                deadline = time.monotonic() + sleep_time
+            else:
+                # runActionGroup answers, or the motion ramps to rest, when the action is done
+                deadline = time.monotonic() + sleep_time + SERVICE_RESPONSE_MARGIN
+            while True:
+                remaining = deadline - time.monotonic()
+                if finished is not None and finished.is_set():
+                    break
+                if remaining <= 0:
+                    if finished is not None:
+                        self.logger.error("Action %s did not finish in time", action_name)
+                        self._abandon_pending()
+                    break
+                if self._immediate_stop_event.wait(min(remaining, 0.1)):
                     self.logger.info("Stopping action execution for %s", action_name)
                     self._immediate_stop_event.clear()
+                    self._abandon_pending()
                     self._run_stop_action()
                     break
-                time.sleep(0.1)
-                elapsed += 0.1
         except Exception as e:
             self.logger.error("Error executing action %s: %s", action_name, e)
         finally:
+            self._pending_future = None
+            self._pending_abandoned = None
             self._remove_action_by_id(action_item["id"])
             self.current_action = idle_action.copy()
 
@@ -248,4 +365,8 @@ class ActionExecutor:
 
     def shutdown(self) -> None:
         self._stop_event.set()
-        self.consumer_thread.join()
\ No newline at end of file
+        self.consumer_thread.join()
+        self.velocity_streamer.destroy()
+        self.ros_executor.shutdown()
+        self.ros_thread.join()
+        self.node.destroy_node()
\ No newline at end of file
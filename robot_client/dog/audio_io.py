@@ -0,0 +1,350 @@
+"""
+Audio I/O backends for the local_chat voice pipeline.
+
+A backend opens 16-bit little-endian PCM streams with a PyAudio-like
+interface, so AudioStreamer can run against a sound card, WAV files, raw
+PCM pipes or memory buffers:
+
+    backend = create_audio_backend("wav", input_path="in.wav", output_path="out.wav")
+    input_stream = backend.open_input(16000, 1, 1024, callback)
+    output_stream = backend.open_output(24000, 1, 1024)
+
+Input streams call callback(pcm_bytes) from a backend thread for every
+buffer of frames_per_buffer frames. backend.input_done is set once a finite
+input source is exhausted.
+
+Devices that cannot run at the pipeline's rate or channel count report the
+nearest format they do support through negotiate_input/negotiate_output;
+make_converter then bridges the two in-process.
+"""
+
+import sys
+import threading
+import time
+import wave
+
+SAMPLE_WIDTH = 2  # bytes per int16 sample
+
+
+class AudioBackend:
+    """Base class for audio backends."""
+
+    def __init__(self):
+        self.input_done = threading.Event()
+
+    def negotiate_input(self, rate, channels):
+        """Return the (rate, channels) closest to the request that input can be opened at."""
+        return rate, channels
+
+    def negotiate_output(self, rate, channels):
+        """Return the (rate, channels) closest to the request that output can be opened at."""
+        return rate, channels
+
+    def open_input(self, rate, channels, frames_per_buffer, callback):
+        raise NotImplementedError
+
+    def open_output(self, rate, channels, frames_per_buffer):
+        raise NotImplementedError
+
+    def terminate(self):
+        """Release backend resources after all streams are closed."""
+
+
+# Rates tried after the requested one and the device default; most boards support one of these
+FALLBACK_RATES = (48000, 44100)
+
+
+class PyAudioBackend(AudioBackend):
+    """Sound card I/O through PyAudio."""
+
+    def __init__(self):
+        super().__init__()
+        import pyaudio
+        self.pyaudio = pyaudio
+        self.p = pyaudio.PyAudio()
+
+    def _negotiate(self, rate, channels, is_input):
+        if is_input:
+            device = self.p.get_default_input_device_info()
+        else:
+            device = self.p.get_default_output_device_info()
+        direction = "input" if is_input else "output"
+        rates = [rate, int(device["defaultSampleRate"]), *FALLBACK_RATES]
+        for candidate_channels in dict.fromkeys([channels, 2]):
+            for candidate_rate in dict.fromkeys(rates):
+                try:
+                    supported = self.p.is_format_supported(
+                        candidate_rate,
+                        **{
+                            f"{direction}_device": device["index"],
+                            f"{direction}_channels": candidate_channels,
+                            f"{direction}_format": self.pyaudio.paInt16,
+                        },
+                    )
+                except ValueError:
+                    supported = False
+                if supported:
+                    return candidate_rate, candidate_channels
+        # Nothing matched; let open() report the device error
+        return rate, channels
+
+    def negotiate_input(self, rate, channels):
+        return self._negotiate(rate, channels, is_input=True)
+
+    def negotiate_output(self, rate, channels):
+        return self._negotiate(rate, channels, is_input=False)
+
+    def open_input(self, rate, channels, frames_per_buffer, callback):
+        paContinue = self.pyaudio.paContinue
+
+        def stream_callback(in_data, frame_count, time_info, status):
+            callback(in_data)
+            return (None, paContinue)
+
+        return self.p.open(
+            format=self.pyaudio.paInt16,
+            channels=channels,
+            rate=rate,
+            input=True,
+            frames_per_buffer=frames_per_buffer,
+            stream_callback=stream_callback,
+        )
+
+    def open_output(self, rate, channels, frames_per_buffer):
+        return self.p.open(
+            format=self.pyaudio.paInt16,
+            channels=channels,
+            rate=rate,
+            output=True,
+            frames_per_buffer=frames_per_buffer,
+        )
+
+    def terminate(self):
+        self.p.terminate()
+
+
+class ThreadedInputStream:
+    """Pulls buffers from read_buffer() on a thread and hands them to the callback.
+
+    With realtime set, buffers are paced at the stream's sample rate like a
+    microphone; otherwise they are delivered as fast as they can be read.
+    """
+
+    def __init__(self, backend, read_buffer, rate, frames_per_buffer, callback, realtime=True, on_close=None):
+        self.backend = backend
+        self.read_buffer = read_buffer
+        self.on_close = on_close
+        self.period = frames_per_buffer / rate
+        self.callback = callback
+        self.realtime = realtime
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start_stream(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        next_buffer_at = time.monotonic()
+        while not self._stop_event.is_set():
+            data = self.read_buffer()
+            if not data:
+                self.backend.input_done.set()
+                break
+            self.callback(data)
+            if self.realtime:
+                next_buffer_at += self.period
+                self._stop_event.wait(max(0.0, next_buffer_at - time.monotonic()))
+
+    def is_active(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop_stream(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop_stream()
+        if self.on_close is not None:
+            self.on_close()
+            self.on_close = None
+
+
+class CallbackOutputStream:
+    """Output stream that passes every write to a sink function."""
+
+    def __init__(self, sink, close=None):
+        self.sink = sink
+        self._close = close
+        self._active = True
+
+    def write(self, data):
+        self.sink(data)
+
+    def is_active(self):
+        return self._active
+
+    def start_stream(self):
+        self._active = True
+
+    def stop_stream(self):
+        self._active = False
+
+    def close(self):
+        self._active = False
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+
+class WavFileBackend(AudioBackend):
+    """Reads microphone audio from a WAV file and writes playback to another."""
+
+    def __init__(self, input_path=None, output_path=None, realtime=True):
+        super().__init__()
+        self.input_path = input_path
+        self.output_path = output_path
+        self.realtime = realtime
+
+    def negotiate_input(self, rate, channels):
+        # The file's own format; AudioStreamer converts it to the pipeline's
+        with wave.open(self.input_path, "rb") as reader:
+            if reader.getsampwidth() != SAMPLE_WIDTH:
+                raise ValueError(f"{self.input_path} must be 16-bit PCM")
+            return reader.getframerate(), reader.getnchannels()
+
+    def open_input(self, rate, channels, frames_per_buffer, callback):
+        reader = wave.open(self.input_path, "rb")
+        if (reader.getframerate(), reader.getnchannels(), reader.getsampwidth()) != (rate, channels, SAMPLE_WIDTH):
+            reader.close()
+            raise ValueError(
+                f"{self.input_path} must be {rate} Hz, {channels} channel(s), 16-bit PCM"
+            )
+        return ThreadedInputStream(
+            self, lambda: reader.readframes(frames_per_buffer), rate, frames_per_buffer,
+            callback, self.realtime, on_close=reader.close,
+        )
+
+    def open_output(self, rate, channels, frames_per_buffer):
+        writer = wave.open(self.output_path, "wb")
+        writer.setnchannels(channels)
+        writer.setsampwidth(SAMPLE_WIDTH)
+        writer.setframerate(rate)
+        return CallbackOutputStream(writer.writeframes, writer.close)
+
+
+class FixedFormatMixin:
+    """Reports configured input/output formats; None keeps the requested value."""
+
+    input_rate = input_channels = output_rate = output_channels = None
+
+    def negotiate_input(self, rate, channels):
+        return self.input_rate or rate, self.input_channels or channels
+
+    def negotiate_output(self, rate, channels):
+        return self.output_rate or rate, self.output_channels or channels
+
+
+class PipeBackend(FixedFormatMixin, AudioBackend):
+    """Raw PCM over binary pipes, stdin and stdout by default.
+
+    Raw PCM carries no header, so input_rate/input_channels and
+    output_rate/output_channels describe the other end of each pipe.
+    """
+
+    def __init__(self, input_path=None, output_path=None, realtime=True,
+                 input_rate=None, input_channels=None, output_rate=None, output_channels=None):
+        super().__init__()
+        self.input_path = input_path
+        self.output_path = output_path
+        self.realtime = realtime
+        self.input_rate = input_rate
+        self.input_channels = input_channels
+        self.output_rate = output_rate
+        self.output_channels = output_channels
+
+    def open_input(self, rate, channels, frames_per_buffer, callback):
+        source = open(self.input_path, "rb") if self.input_path else sys.stdin.buffer
+        buffer_bytes = frames_per_buffer * channels * SAMPLE_WIDTH
+        return ThreadedInputStream(
+            self, lambda: source.read(buffer_bytes), rate, frames_per_buffer, callback,
+            self.realtime, on_close=source.close if self.input_path else None,
+        )
+
+    def open_output(self, rate, channels, frames_per_buffer):
+        sink = open(self.output_path, "wb") if self.output_path else sys.stdout.buffer
+
+        def write(data):
+            sink.write(data)
+            sink.flush()
+
+        return CallbackOutputStream(write, sink.close if self.output_path else None)
+
+
+class MemoryBackend(FixedFormatMixin, AudioBackend):
+    """Plays input from a bytes buffer and collects output in memory.
+
+    output_chunks holds (monotonic time, bytes) for every playback write.
+    The rate and channel arguments simulate a device with that native format.
+    """
+
+    def __init__(self, input_audio=b"", realtime=True,
+                 input_rate=None, input_channels=None, output_rate=None, output_channels=None):
+        super().__init__()
+        self.input_audio = input_audio
+        self.realtime = realtime
+        self.output_chunks = []
+        self.input_rate = input_rate
+        self.input_channels = input_channels
+        self.output_rate = output_rate
+        self.output_channels = output_channels
+
+    def open_input(self, rate, channels, frames_per_buffer, callback):
+        buffer_bytes = frames_per_buffer * channels * SAMPLE_WIDTH
+        view = memoryview(self.input_audio)
+        position = [0]
+
+        def read_buffer():
+            start = position[0]
+            position[0] += buffer_bytes
+            return bytes(view[start:start + buffer_bytes])
+
+        return ThreadedInputStream(self, read_buffer, rate, frames_per_buffer, callback, self.realtime)
+
+    def open_output(self, rate, channels, frames_per_buffer):
+        return CallbackOutputStream(lambda data: self.output_chunks.append((time.monotonic(), data)))
+
+    def output_audio(self):
+        return b"".join(data for _, data in self.output_chunks)
+
+
+AUDIO_BACKENDS = {
+    "pyaudio": PyAudioBackend,
+    "wav": WavFileBackend,
+    "pipe": PipeBackend,
+    "memory": MemoryBackend,
+}
+
+
+def make_converter(in_rate, in_channels, out_rate, out_channels):
+    """Return a resample.AudioConverter between two formats, or None if they match.
+
+    NumPy is only imported when a conversion is actually needed.
+    """
+    if (in_rate, in_channels) == (out_rate, out_channels):
+        return None
+    from resample import AudioConverter
+    return AudioConverter(in_rate, in_channels, out_rate, out_channels)
+
+
+def create_audio_backend(name="pyaudio", **kwargs):
+    """Create a backend by name; keyword arguments go to its constructor."""
+    try:
+        backend_class = AUDIO_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown audio backend '{name}', expected one of {', '.join(AUDIO_BACKENDS)}")
+    return backend_class(**kwargs)
@@ -0,0 +1,148 @@
+"""
+In-process stand-in for the Nova Sonic bidirectional stream.
+
+FakeBedrockClient mimics the parts of BedrockRuntimeClient that
+BedrockStreamManager uses, so the voice pipeline can be benchmarked and
+load-tested without AWS credentials:
+
+    client = FakeBedrockClient(fail_after=2.0)
+    manager = BedrockStreamManager(client=client, sdk=FAKE_SDK)
+"""
+
+import asyncio
+import base64
+import json
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+
+class _PayloadPart:
+    def __init__(self, bytes_):
+        self.bytes_ = bytes_
+
+
+class _InputChunk:
+    def __init__(self, value):
+        self.value = value
+
+
+class _OperationInput:
+    def __init__(self, model_id):
+        self.model_id = model_id
+
+
+# Drop-in for the SDK model classes BedrockStreamManager builds requests with
+FAKE_SDK = SimpleNamespace(
+    InvokeModelWithBidirectionalStreamOperationInput=_OperationInput,
+    InvokeModelWithBidirectionalStreamInputChunk=_InputChunk,
+    BidirectionalInputPayloadPart=_PayloadPart,
+)
+
+_CLOSED = object()
+
+
+class FakeInputStream:
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def send(self, chunk):
+        self.stream.on_input(json.loads(chunk.value.bytes_))
+
+    async def close(self):
+        self.stream.close()
+
+
+class _OutputReceiver:
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def receive(self):
+        return await self.stream.next_output()
+
+
+class FakeBidirectionalStream:
+    """One stream: records input events and produces scripted output events."""
+
+    def __init__(self, client, stream_id):
+        self.client = client
+        self.stream_id = stream_id
+        self.input_stream = FakeInputStream(self)
+        self.outputs = asyncio.Queue()
+        self.events = Counter()
+        self.audio_received_at = []
+        self.replies_sent_at = []
+        self.opened_at = time.monotonic()
+        self.closed = False
+
+    def on_input(self, event):
+        name = next(iter(event.get("event", {})), "unknown")
+        self.events[name] += 1
+        if name != "audioInput":
+            return
+        self.audio_received_at.append(time.monotonic())
+        reply_every = self.client.reply_every
+        if reply_every and self.events["audioInput"] % reply_every == 0:
+            content = base64.b64encode(bytes(self.client.reply_bytes)).decode("utf-8")
+            self.replies_sent_at.append(time.monotonic())
+            self.outputs.put_nowait({"event": {"audioOutput": {"content": content}}})
+            if self.client.tool_name:
+                tool_use_id = f"tool-{self.stream_id}-{len(self.replies_sent_at)}"
+                self.outputs.put_nowait({"event": {"toolUse": {
+                    "toolName": self.client.tool_name, "toolUseId": tool_use_id, "content": "{}",
+                }}})
+                self.outputs.put_nowait({"event": {"contentEnd": {"type": "TOOL"}}})
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.outputs.put_nowait(_CLOSED)
+
+    async def await_output(self):
+        return (None, _OutputReceiver(self))
+
+    async def next_output(self):
+        timeout = None
+        if self.client.fail_after is not None:
+            timeout = max(0.0, self.opened_at + self.client.fail_after - time.monotonic())
+        try:
+            event = await asyncio.wait_for(self.outputs.get(), timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError("ModelTimeoutException: simulated stream failure")
+        if event is _CLOSED:
+            raise StopAsyncIteration
+        return SimpleNamespace(value=_PayloadPart(json.dumps(event).encode("utf-8")))
+
+
+class FakeBedrockClient:
+    """Opens fake streams after handshake_delay seconds.
+
+    Each stream fails fail_after seconds after opening (None for never) and
+    answers every reply_every audio chunks with reply_bytes of silence,
+    followed by a tool_name tool call when one is given.
+    """
+
+    def __init__(self, handshake_delay=0.05, fail_after=None, reply_every=0, reply_bytes=3200, tool_name=None):
+        self.handshake_delay = handshake_delay
+        self.fail_after = fail_after
+        self.reply_every = reply_every
+        self.reply_bytes = reply_bytes
+        self.tool_name = tool_name
+        self.streams = []
+
+    async def invoke_model_with_bidirectional_stream(self, operation_input):
+        await asyncio.sleep(self.handshake_delay)
+        stream = FakeBidirectionalStream(self, len(self.streams))
+        self.streams.append(stream)
+        return stream
+
+    def audio_chunks_received(self):
+        return sum(len(stream.audio_received_at) for stream in self.streams)
+
+    def audio_gaps(self):
+        """Seconds between the last audio chunk on each stream and the first on the next."""
+        gaps = []
+        received = [stream.audio_received_at for stream in self.streams if stream.audio_received_at]
+        for previous, following in zip(received, received[1:]):
+            gaps.append(following[0] - previous[-1])
+        return gaps
@@ -0,0 +1,168 @@
+"""
+Gait and pose presets for PuppyPi locomotion, from the puppy_demo tunings.
+
+GaitManager picks a preset for each motion and publishes the gait and pose
+only when they differ from what the controller already has, since every
+reconfiguration makes the gait controller re-plan:
+
+    gaits = GaitManager(publishers, **load_gait_settings())
+    settle = gaits.apply(gaits.select("go_forward", motion))
+    time.sleep(settle)        # non-zero only after an actual switch
+
+metrics() reports switch counts per preset transition, redundant requests
+that were skipped, and publish timing.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# Gait timing and the body x_shift each gait balances best with
+GAIT_PRESETS = {
+    "Trot": {
+        "gait": {"overlap_time": 0.2, "swing_time": 0.3, "clearance_time": 0.0, "z_clearance": 5.0},
+        "x_shift": -0.6,
+    },
+    "Amble": {
+        "gait": {"overlap_time": 0.1, "swing_time": 0.2, "clearance_time": 0.1, "z_clearance": 5.0},
+        "x_shift": -0.9,
+    },
+    "Walk": {
+        "gait": {"overlap_time": 0.1, "swing_time": 0.2, "clearance_time": 0.3, "z_clearance": 5.0},
+        "x_shift": -0.65,
+    },
+}
+
+BASE_POSE = {
+    "stance_x": 0.0,
+    "stance_y": 0.0,
+    "x_shift": 0.5,
+    "height": -10.0,
+    "roll": 0.0,
+    "pitch": 0.0,
+    "yaw": 0.0,
+}
+
+DEFAULT_GAIT_SETTINGS = {
+    "default": "Trot",
+    "settle_seconds": 0.3,
+    "pose_run_time": 500,
+    # Slowest gait whose top speed covers the motion; faster motions use default
+    "by_speed": {"Walk": 2.0, "Amble": 4.0},
+}
+
+
+def pose_for(gait_name):
+    """Full body pose for a gait preset."""
+    pose = dict(BASE_POSE)
+    pose["x_shift"] = GAIT_PRESETS[gait_name]["x_shift"]
+    return pose
+
+
+def load_gait_settings(settings_path="settings.yaml"):
+    """Return GaitManager keyword arguments from the gait section of settings.yaml."""
+    try:
+        with open(settings_path, "r", encoding="utf-8") as file:
+            section = (yaml.safe_load(file) or {}).get("gait") or {}
+    except FileNotFoundError:
+        section = {}
+    settings = dict(DEFAULT_GAIT_SETTINGS)
+    settings.update(section)
+    return settings
+
+
+class GaitManager:
+    """Selects gait presets and publishes only the parts that change."""
+
+    def __init__(self, publishers, default="Trot", settle_seconds=0.3, pose_run_time=500, by_speed=None):
+        self.publishers = publishers
+        self.default = default
+        self.settle_seconds = settle_seconds
+        self.pose_run_time = pose_run_time
+        self.by_speed = sorted((by_speed or {}).items(), key=lambda item: item[1])
+        self.active = None
+        # What the controller was last sent; None means unknown
+        self._gait_sent = None
+        self._pose_sent = None
+        self._lock = threading.Lock()
+        self.switches = Counter()
+        self.skipped = 0
+        self.gait_publishes = 0
+        self.pose_publishes = 0
+        self.publish_seconds = 0.0
+        self.max_publish_seconds = 0.0
+        self.last_switch_at = None
+
+    def select(self, action_name, motion):
+        """Preset for a motion: its own gait key, else by linear speed, else the default."""
+        if motion.get("gait"):
+            return motion["gait"]
+        if motion.get("distance"):
+            speed = abs(motion.get("speed", 0.0))
+            for gait_name, top_speed in self.by_speed:
+                if speed <= top_speed:
+                    return gait_name
+        return self.default
+
+    def apply(self, gait_name):
+        """Make gait_name active; returns seconds to let the controller settle."""
+        preset = GAIT_PRESETS[gait_name]
+        pose = pose_for(gait_name)
+        with self._lock:
+            if gait_name == self.active and self._gait_sent == preset["gait"] and self._pose_sent == pose:
+                self.skipped += 1
+                return 0.0
+            started = time.perf_counter()
+            if self._gait_sent != preset["gait"]:
+                self.publishers.publish_gait(**preset["gait"])
+                self._gait_sent = dict(preset["gait"])
+                self.gait_publishes += 1
+            if self._pose_sent != pose:
+                self.publishers.publish_pose(run_time=self.pose_run_time, **pose)
+                self._pose_sent = pose
+                self.pose_publishes += 1
+            elapsed = time.perf_counter() - started
+            self.publish_seconds += elapsed
+            self.max_publish_seconds = max(self.max_publish_seconds, elapsed)
+            self.switches[f"{self.active}->{gait_name}"] += 1
+            self.active = gait_name
+            self.last_switch_at = time.monotonic()
+        logger.info("Gait %s (%.2f ms to publish)", gait_name, elapsed * 1000)
+        return self.settle_seconds
+
+    def restore_pose(self):
+        """Republish the active preset's pose, e.g. after a fallback or a failed action."""
+        gait_name = self.active or self.default
+        pose = pose_for(gait_name)
+        with self._lock:
+            self.publishers.publish_pose(run_time=self.pose_run_time, **pose)
+            self._pose_sent = pose
+            self.pose_publishes += 1
+
+    def invalidate(self, gait=False):
+        """Forget the cached pose (and gait) after something else moved the robot."""
+        with self._lock:
+            self._pose_sent = None
+            if gait:
+                self._gait_sent = None
+                self.active = None
+
+    def metrics(self):
+        with self._lock:
+            publishes = self.gait_publishes + self.pose_publishes
+            return {
+                "active": self.active,
+                "switches": sum(self.switches.values()),
+                "switches_by_transition": dict(self.switches),
+                "skipped": self.skipped,
+                "gait_publishes": self.gait_publishes,
+                "pose_publishes": self.pose_publishes,
+                "publish_ms_avg": 1000.0 * self.publish_seconds / publishes if publishes else 0.0,
+                "publish_ms_max": 1000.0 * self.max_publish_seconds,
+                "seconds_since_switch": time.monotonic() - self.last_switch_at if self.last_switch_at else None,
+            }
@@ -1,22 +1,23 @@
+import time
+
+# Captured before the heavier imports so --profile-startup can report true cold start
+_PROCESS_START = time.perf_counter()
+
 import os
+import sys
 import asyncio
 import base64
 import json
 import uuid
 import warnings
-import pyaudio
-import pytz
 import random
 import hashlib
 import datetime
-import time
-import inspect
-from aws_sdk_bedrock_runtime.client import BedrockRuntimeClient, InvokeModelWithBidirectionalStreamOperationInput
-from aws_sdk_bedrock_runtime.models import InvokeModelWithBidirectionalStreamInputChunk, BidirectionalInputPayloadPart
-from aws_sdk_bedrock_runtime.config import Config, HTTPAuthSchemeResolver, SigV4AuthScheme
-from smithy_aws_core.credentials_resolvers.environment import EnvironmentCredentialsResolver
+from collections import deque
+from types import SimpleNamespace
+from audio_io import SAMPLE_WIDTH, PyAudioBackend, create_audio_backend, make_converter
 from tools import TOOLS
-import boto3
+from tracing import TRACER
 
 # Suppress warnings
 warnings.filterwarnings("ignore")
@@ -25,34 +26,108 @@ warnings.filterwarnings("ignore")
 INPUT_SAMPLE_RATE = 16000
 OUTPUT_SAMPLE_RATE = 24000
 CHANNELS = 1
-FORMAT = pyaudio.paInt16
 CHUNK_SIZE = 1024  # Number of frames per buffer
 
+# Microphone audio kept while no stream can take it, e.g. during a session handoff
+HOLD_BUFFER_SECONDS = 10
+
+# Speech onset for tracing: a frame peaking above this level after a quiet stretch
+SPEECH_ONSET_PEAK = 1500
+SPEECH_ONSET_QUIET_SECONDS = 0.8
+
 # Debug mode flag
 DEBUG = False
 
 def debug_print(message):
     """Print only if debug mode is enabled"""
     if DEBUG:
-        functionName = inspect.stack()[1].function
+        # sys._getframe is a pointer walk; inspect.stack() reads source for every frame
+        frame = sys._getframe(1)
+        functionName = frame.f_code.co_name
         if  functionName == 'time_it' or functionName == 'time_it_async':
-            functionName = inspect.stack()[2].function
+            functionName = frame.f_back.f_code.co_name
         print('{:%Y-%m-%d %H:%M:%S.%f}'.format(datetime.datetime.now())[:-3] + ' ' + functionName + ' ' + message)
 
 def time_it(label, methodToRun):
-    start_time = time.perf_counter()
+    start_time = time.perf_counter_ns()
     result = methodToRun()
-    end_time = time.perf_counter()
-    debug_print(f"Execution time for {label}: {end_time - start_time:.4f} seconds")
+    end_time = time.perf_counter_ns()
+    TRACER.record_span(label, start_time, end_time)
+    debug_print(f"Execution time for {label}: {(end_time - start_time) / 1e9:.4f} seconds")
     return result
 
 async def time_it_async(label, methodToRun):
-    start_time = time.perf_counter()
+    start_time = time.perf_counter_ns()
     result = await methodToRun()
-    end_time = time.perf_counter()
-    debug_print(f"Execution time for {label}: {end_time - start_time:.4f} seconds")
+    end_time = time.perf_counter_ns()
+    TRACER.record_span(label, start_time, end_time)
+    debug_print(f"Execution time for {label}: {(end_time - start_time) / 1e9:.4f} seconds")
     return result
 
+# Heavy dependencies are imported on first use so that startup can overlap them
+# with device and network setup instead of paying for them serially at import.
+# PyAudio is only imported by audio_io.PyAudioBackend.
+_bedrock_sdk = None
+
+def load_bedrock_sdk():
+    """Import the Bedrock runtime SDK on first use."""
+    global _bedrock_sdk
+    if _bedrock_sdk is None:
+        from aws_sdk_bedrock_runtime.client import BedrockRuntimeClient, InvokeModelWithBidirectionalStreamOperationInput
+        from aws_sdk_bedrock_runtime.models import InvokeModelWithBidirectionalStreamInputChunk, BidirectionalInputPayloadPart
+        from aws_sdk_bedrock_runtime.config import Config, HTTPAuthSchemeResolver, SigV4AuthScheme
+        from smithy_aws_core.credentials_resolvers.environment import EnvironmentCredentialsResolver
+        _bedrock_sdk = SimpleNamespace(
+            BedrockRuntimeClient=BedrockRuntimeClient,
+            InvokeModelWithBidirectionalStreamOperationInput=InvokeModelWithBidirectionalStreamOperationInput,
+            InvokeModelWithBidirectionalStreamInputChunk=InvokeModelWithBidirectionalStreamInputChunk,
+            BidirectionalInputPayloadPart=BidirectionalInputPayloadPart,
+            Config=Config,
+            HTTPAuthSchemeResolver=HTTPAuthSchemeResolver,
+            SigV4AuthScheme=SigV4AuthScheme,
+            EnvironmentCredentialsResolver=EnvironmentCredentialsResolver,
+        )
+    return _bedrock_sdk
+
+def export_aws_credentials():
+    """Expose boto3's resolved credentials to the Bedrock SDK's environment resolver."""
+    import boto3
+    session = boto3.Session()
+    credentials = session.get_credentials()
+    if credentials is not None:
+        os.environ['AWS_ACCESS_KEY_ID'] = credentials.access_key
+        os.environ['AWS_SECRET_ACCESS_KEY'] = credentials.secret_key
+        if credentials.token:
+            os.environ['AWS_SESSION_TOKEN'] = credentials.token
+    os.environ['AWS_DEFAULT_REGION'] = "us-east-1"
+
+class StartupProfiler:
+    """Records startup milestones relative to process start for --profile-startup."""
+
+    def __init__(self, enabled=False, origin=_PROCESS_START):
+        self.enabled = enabled
+        self.origin = origin
+        self.marks = {}
+
+    def mark(self, name):
+        """Record the first occurrence of a milestone."""
+        if self.enabled and name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.origin
+            if name == "first_audio_out":
+                self.report()
+
+    def report(self):
+        """Print all milestones, including cold start and time to first audio."""
+        if not self.enabled:
+            return
+        print("Startup profile (seconds since process start):")
+        for name, elapsed in sorted(self.marks.items(), key=lambda item: item[1]):
+            print(f"  {name:<24} {elapsed:8.3f}")
+        if "ready" in self.marks:
+            print(f"  cold start               {self.marks['ready']:8.3f}")
+        if "first_audio_out" in self.marks:
+            print(f"  time to first audio      {self.marks['first_audio_out']:8.3f}")
+
 class BedrockStreamManager:
     """Manages bidirectional streaming with AWS Bedrock using asyncio"""
     
@@ -160,6 +235,21 @@ class BedrockStreamManager:
         }
     }'''
 
+    HISTORY_CONTENT_START_EVENT = '''{
+        "event": {
+            "contentStart": {
+            "promptName": "%s",
+            "contentName": "%s",
+            "type": "TEXT",
+            "role": "%s",
+            "interactive": false,
+                "textInputConfiguration": {
+                    "mediaType": "text/plain"
+                }
+            }
+        }
+    }'''
+
     SESSION_END_EVENT = '''{
         "event": {
             "sessionEnd": {}
@@ -218,22 +308,48 @@ class BedrockStreamManager:
         }
         return json.dumps(tool_result_event)
    
-    def __init__(self, model_id='amazon.nova-sonic-v1:0', region='us-east-1'):
-        """Initialize the stream manager."""
+    DEFAULT_SYSTEM_PROMPT = "You are a friend. The user and you will engage in a spoken dialog exchanging the transcripts of a natural real-time conversation." \
+        "When reading order numbers, please read each digit individually, separated by pauses. For example, order #1234 should be read as 'order number one-two-three-four' rather than 'order number one thousand two hundred thirty-four'."
+
+    def __init__(self, model_id='amazon.nova-sonic-v1:0', region='us-east-1', init_event_delay=0.1,
+                 system_prompt=None, history=None, client=None, sdk=None):
+        """Initialize the stream manager.
+
+        init_event_delay is the pause after each initialization event; fast
+        startup sets it to 0 since sends are already awaited in order.
+        history is a list of (role, text) turns replayed after the system
+        prompt, used when a session is renewed. client and sdk replace the
+        Bedrock runtime client and SDK model classes, e.g. with a fake stream.
+        """
         self.model_id = model_id
         self.region = region
-        
+        self.init_event_delay = init_event_delay
+        self.system_prompt = system_prompt or self.DEFAULT_SYSTEM_PROMPT
+        self.history = list(history or [])
+        self.created_at = time.monotonic()
+
         # Replace RxPy subjects with asyncio queues
         self.audio_input_queue = asyncio.Queue()
         self.audio_output_queue = asyncio.Queue()
         self.output_queue = asyncio.Queue()
         
         self.response_task = None
+        self.audio_input_task = None
         self.stream_response = None
         self.is_active = False
         self.barge_in = False
-        self.bedrock_client = None
-        
+        self.bedrock_client = client
+        self._sdk = sdk
+
+        # Called with this manager once the response stream stops
+        self.on_close = None
+        self.close_reason = None
+        self.closed_at = None
+        self.last_output_at = 0.0
+
+        # Final USER/ASSISTANT transcripts as (role, text), for session renewal
+        self.transcript = []
+
         # Audio playback components
         self.audio_player = None
         
@@ -251,48 +367,52 @@ class BedrockStreamManager:
 
     def _initialize_client(self):
         """Initialize the Bedrock client."""
-        config = Config(
+        sdk = load_bedrock_sdk()
+        config = sdk.Config(
             endpoint_uri=f"https://bedrock-runtime.{self.region}.amazonaws.com",
             region=self.region,
-            aws_credentials_identity_resolver=EnvironmentCredentialsResolver(),
-            http_auth_scheme_resolver=HTTPAuthSchemeResolver(),
-            http_auth_schemes={"aws.auth#sigv4": SigV4AuthScheme()}
+            aws_credentials_identity_resolver=sdk.EnvironmentCredentialsResolver(),
+            http_auth_scheme_resolver=sdk.HTTPAuthSchemeResolver(),
+            http_auth_schemes={"aws.auth#sigv4": sdk.SigV4AuthScheme()}
         )
-        self.bedrock_client = BedrockRuntimeClient(config=config)
-    
+        self.bedrock_client = sdk.BedrockRuntimeClient(config=config)
+        self._sdk = sdk
+
     async def initialize_stream(self):
         """Initialize the bidirectional stream with Bedrock."""
         if not self.bedrock_client:
             self._initialize_client()
-        
+
         try:
-            self.stream_response = await time_it_async("invoke_model_with_bidirectional_stream", lambda : self.bedrock_client.invoke_model_with_bidirectional_stream( InvokeModelWithBidirectionalStreamOperationInput(model_id=self.model_id)))
+            operation_input = self._sdk.InvokeModelWithBidirectionalStreamOperationInput(model_id=self.model_id)
+            self.stream_response = await time_it_async("invoke_model_with_bidirectional_stream", lambda : self.bedrock_client.invoke_model_with_bidirectional_stream(operation_input))
             self.is_active = True
-            default_system_prompt = "You are a friend. The user and you will engage in a spoken dialog exchanging the transcripts of a natural real-time conversation." \
-            "When reading order numbers, please read each digit individually, separated by pauses. For example, order #1234 should be read as 'order number one-two-three-four' rather than 'order number one thousand two hundred thirty-four'."
-            
+
             # Send initialization events
             prompt_event = self.start_prompt()
             text_content_start = self.TEXT_CONTENT_START_EVENT % (self.prompt_name, self.content_name, "SYSTEM")
-            text_content = self.TEXT_INPUT_EVENT % (self.prompt_name, self.content_name, default_system_prompt)
+            text_content = self.TEXT_INPUT_EVENT % (self.prompt_name, self.content_name, self.system_prompt)
             text_content_end = self.CONTENT_END_EVENT % (self.prompt_name, self.content_name)
             
             init_events = [self.START_SESSION_EVENT, prompt_event, text_content_start, text_content, text_content_end]
+            init_events.extend(self.history_events())
             
             for event in init_events:
                 await self.send_raw_event(event)
-                # Small delay between init events
-                await asyncio.sleep(0.1)
-            
+                if self.init_event_delay:
+                    # Small delay between init events
+                    await asyncio.sleep(self.init_event_delay)
+
             # Start listening for responses
             self.response_task = asyncio.create_task(self._process_responses())
-            
+
             # Start processing audio input
-            asyncio.create_task(self._process_audio_input())
-            
-            # Wait a bit to ensure everything is set up
-            await asyncio.sleep(0.1)
-            
+            self.audio_input_task = asyncio.create_task(self._process_audio_input())
+
+            if self.init_event_delay:
+                # Wait a bit to ensure everything is set up
+                await asyncio.sleep(self.init_event_delay)
+
             debug_print("Stream initialized successfully")
             return self
         except Exception as e:
@@ -300,14 +420,29 @@ class BedrockStreamManager:
             print(f"Failed to initialize stream: {str(e)}")
             raise
     
+    def history_events(self):
+        """Build non-interactive text content blocks replaying the seeded history."""
+        events = []
+        for role, text in self.history:
+            content_name = str(uuid.uuid4())
+            events.append(self.HISTORY_CONTENT_START_EVENT % (self.prompt_name, content_name, role))
+            # Transcripts are free text; escape them for the JSON string template
+            events.append(self.TEXT_INPUT_EVENT % (self.prompt_name, content_name, json.dumps(text)[1:-1]))
+            events.append(self.CONTENT_END_EVENT % (self.prompt_name, content_name))
+        return events
+
+    def is_idle(self, quiet_period=1.0):
+        """True when no assistant output is queued or has arrived recently."""
+        return self.audio_output_queue.empty() and time.monotonic() - self.last_output_at > quiet_period
+
     async def send_raw_event(self, event_json):
         """Send a raw event JSON to the Bedrock stream."""
         if not self.stream_response or not self.is_active:
             debug_print("Stream not initialized or closed")
             return
        
-        event = InvokeModelWithBidirectionalStreamInputChunk(
-            value=BidirectionalInputPayloadPart(bytes_=event_json.encode('utf-8'))
+        event = self._sdk.InvokeModelWithBidirectionalStreamInputChunk(
+            value=self._sdk.BidirectionalInputPayloadPart(bytes_=event_json.encode('utf-8'))
         )
         
         try:
@@ -426,6 +561,7 @@ class BedrockStreamManager:
                     output = await self.stream_response.await_output()
                     result = await output[1].receive()
                     if result.value and result.value.bytes_:
+                        self.last_output_at = time.monotonic()
                         try:
                             response_data = result.value.bytes_.decode('utf-8')
                             json_data = json.loads(response_data)
@@ -437,6 +573,7 @@ class BedrockStreamManager:
                                     content_start = json_data['event']['contentStart']
                                     # set role
                                     self.role = content_start['role']
+                                    TRACER.mark("content_start", role=self.role, type=content_start.get('type'))
                                     # Check for speculative content
                                     if 'additionalModelFields' in content_start:
                                         try:
@@ -461,22 +598,30 @@ class BedrockStreamManager:
                                     elif (self.role == "USER"):
                                         print(f"User: {text_content}")
 
+                                    # Keep final (non-speculative) turns for session renewal
+                                    if '{ "interrupted" : true }' not in text_content and role in ("USER", "ASSISTANT") and not (role == "ASSISTANT" and self.display_assistant_text):
+                                        self.transcript.append((role, text_content))
+
                                 elif 'audioOutput' in json_data['event']:
                                     audio_content = json_data['event']['audioOutput']['content']
                                     audio_bytes = base64.b64decode(audio_content)
+                                    TRACER.turn_mark("first_audio_received")
                                     await self.audio_output_queue.put(audio_bytes)
                                 elif 'toolUse' in json_data['event']:
                                     self.toolUseContent = json_data['event']['toolUse']
                                     self.toolName = json_data['event']['toolUse']['toolName']
                                     self.toolUseId = json_data['event']['toolUse']['toolUseId']
                                     debug_print(f"Tool use detected: {self.toolName}, ID: {self.toolUseId}")
+                                    TRACER.turn_mark("tool_use", tool=self.toolName)
                                 elif 'contentEnd' in json_data['event'] and json_data['event'].get('contentEnd', {}).get('type') == 'TOOL':
                                     debug_print("Processing tool use and sending result")
-                                    toolResult = await self.processToolUse(self.toolName, self.toolUseContent)
+                                    with TRACER.span("process_tool_use", tool=self.toolName):
+                                        toolResult = await self.processToolUse(self.toolName, self.toolUseContent)
                                     toolContent = str(uuid.uuid4())
-                                    await self.send_tool_start_event(toolContent)
-                                    await self.send_tool_result_event(toolContent, toolResult)
-                                    await self.send_tool_content_end_event(toolContent)
+                                    with TRACER.span("send_tool_result", tool=self.toolName):
+                                        await self.send_tool_start_event(toolContent)
+                                        await self.send_tool_result_event(toolContent, toolResult)
+                                        await self.send_tool_content_end_event(toolContent)
                                 
                                 elif 'completionEnd' in json_data['event']:
                                     # Handle end of conversation, no more response will be generated
@@ -496,12 +641,17 @@ class BedrockStreamManager:
                         print(f"Validation error: {error_message}")
                     else:
                         print(f"Error receiving response: {e}")
+                    self.close_reason = str(e)
                     break
                     
         except Exception as e:
             print(f"Response processing error: {e}")
+            self.close_reason = str(e)
         finally:
             self.is_active = False
+            self.closed_at = time.monotonic()
+            if self.on_close is not None:
+                self.on_close(self)
 
     async def processToolUse(self, toolName, toolUseContent):
         """Return the tool result"""
@@ -513,76 +663,324 @@ class BedrockStreamManager:
     async def close(self):
         """Close the stream properly."""
         if not self.is_active:
+            if self.stream_response and self.close_reason:
+                # The stream already failed; just release the input side
+                try:
+                    await self.stream_response.input_stream.close()
+                except Exception as e:
+                    debug_print(f"Error closing failed stream: {e}")
             return
-       
-        self.is_active = False
-        if self.response_task and not self.response_task.done():
-            self.response_task.cancel()
 
+        # End events must go out while the stream is still marked active
         await self.send_audio_content_end_event()
         await self.send_prompt_end_event()
         await self.send_session_end_event()
 
+        self.is_active = False
+        for task in (self.response_task, self.audio_input_task):
+            if task and not task.done():
+                task.cancel()
+
         if self.stream_response:
             await self.stream_response.input_stream.close()
 
+class StandbySession:
+    """Keeps a pre-initialized stream ready so a reconnect skips the handshake.
+
+    Bedrock closes idle streams, so the standby is replaced once it is older
+    than max_age seconds.
+    """
+
+    def __init__(self, factory, max_age=45.0):
+        self.factory = factory
+        self.max_age = max_age
+        self._task = None
+
+    def prewarm(self):
+        """Start opening a standby stream in the background."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._open())
+
+    async def _open(self):
+        manager = self.factory()
+        await manager.initialize_stream()
+        return manager
+
+    async def take(self):
+        """Return a ready stream manager and start warming its replacement."""
+        task, self._task = self._task, None
+        manager = None
+        if task is not None:
+            try:
+                manager = await task
+            except Exception as e:
+                debug_print(f"Standby stream failed: {e}")
+        if manager is None or not manager.is_active or time.monotonic() - manager.created_at > self.max_age:
+            if manager is not None:
+                asyncio.create_task(manager.close())
+            manager = await self._open()
+        self.prewarm()
+        return manager
+
+    async def close(self):
+        """Close the standby stream if one was opened."""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        elif not task.cancelled() and task.exception() is None:
+            await task.result().close()
+
+class SessionSupervisor:
+    """Renews the Bedrock stream on expiry or error and hands audio over to the replacement.
+
+    Nova Sonic caps a bidirectional stream at 8 minutes, so with renew set a
+    replacement is opened renew_margin seconds before max_session_age and
+    switched in at a pause in assistant speech. The replacement gets the same
+    system prompt and tool configuration plus a condensed conversation history.
+    """
+
+    def __init__(self, factory, audio_streamer, standby=None, renew=True, max_session_age=480.0,
+                 renew_margin=60.0, history_turns=8, history_chars=2000, check_interval=0.1):
+        self.factory = factory
+        self.audio_streamer = audio_streamer
+        self.standby = standby
+        self.renew = renew
+        self.max_session_age = max_session_age
+        self.renew_margin = renew_margin
+        self.history_turns = history_turns
+        self.history_chars = history_chars
+        self.check_interval = check_interval
+        self.handoffs = []
+        self._wake = asyncio.Event()
+
+    def condensed_history(self, manager):
+        """Merge the seeded history and new transcript into a bounded list of turns."""
+        turns = []
+        for role, text in manager.history + manager.transcript:
+            text = text.strip()
+            if not text:
+                continue
+            if turns and turns[-1][0] == role:
+                turns[-1] = (role, turns[-1][1] + " " + text)
+            else:
+                turns.append((role, text))
+        turns = [(role, text[-self.history_chars:]) for role, text in turns[-self.history_turns:]]
+        # Drop the oldest turns until the replay fits the character budget
+        while sum(len(text) for _, text in turns) > self.history_chars:
+            turns.pop(0)
+        return turns
+
+    def watch(self, manager):
+        manager.on_close = self._on_stream_closed
+
+    def _on_stream_closed(self, manager):
+        if manager is self.audio_streamer.stream_manager:
+            self._wake.set()
+
+    async def _open_replacement(self, history):
+        if self.standby is not None and not history:
+            return await self.standby.take()
+        manager = self.factory(history=history)
+        await manager.initialize_stream()
+        return manager
+
+    async def run(self):
+        """Watch the active stream until streaming stops."""
+        self.watch(self.audio_streamer.stream_manager)
+        retry_delay = 1.0
+        while self.audio_streamer.is_streaming:
+            manager = self.audio_streamer.stream_manager
+            try:
+                if not manager.is_active:
+                    await self.handoff(f"error: {manager.close_reason or 'stream closed'}")
+                elif self.renew and time.monotonic() - manager.created_at > self.max_session_age - self.renew_margin:
+                    await self.handoff("expiry")
+                retry_delay = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Session renewal failed, retrying in {retry_delay:.0f}s: {e}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 10.0)
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def handoff(self, reason):
+        """Open a replacement stream in the background and switch audio over to it."""
+        old = self.audio_streamer.stream_manager
+        started = time.monotonic()
+        debug_print(f"Renewing session ({reason})")
+        replacement = await self._open_replacement(self.condensed_history(old))
+        prepared = time.monotonic()
+
+        if old.is_active:
+            # Proactive renewal: wait for a pause in assistant speech, up to the hard limit
+            deadline = old.created_at + self.max_session_age - 5.0
+            while old.is_active and not old.is_idle() and time.monotonic() < deadline:
+                await asyncio.sleep(self.check_interval)
+
+        await self.audio_streamer.switch_stream_manager(replacement)
+        switched = time.monotonic()
+        self.watch(replacement)
+        asyncio.create_task(old.close())
+
+        record = {
+            "reason": reason,
+            "prepare_seconds": prepared - started,
+            # Time without a live stream: from failure (or the switch itself) to the switch
+            "stream_gap_seconds": switched - (old.closed_at or switched),
+            "held_seconds": self.audio_streamer.last_switch["held_seconds"],
+            "frames_flushed": self.audio_streamer.last_switch["frames_flushed"],
+            "frames_dropped": self.audio_streamer.frames_dropped,
+            "history_turns": len(replacement.history),
+        }
+        self.handoffs.append(record)
+        print(f"Session renewed ({reason}) in {record['prepare_seconds']:.3f}s, "
+              f"{record['frames_flushed']} held frames replayed")
+        return record
+
 class AudioStreamer:
     """Handles continuous microphone input and audio output using separate streams."""
     
-    def __init__(self, stream_manager):
+    def __init__(self, stream_manager, open_devices=True, profiler=None, backend=None):
+        """backend is an audio_io.AudioBackend; PyAudio is used when omitted."""
         self.stream_manager = stream_manager
         self.is_streaming = False
         self.loop = asyncio.get_event_loop()
+        self.profiler = profiler or StartupProfiler()
+        self.backend = backend
+        self.input_stream = None
+        self.output_stream = None
+        # Native device formats and in-process converters to and from the pipeline's
+        self.input_format = (INPUT_SAMPLE_RATE, CHANNELS)
+        self.output_format = (OUTPUT_SAMPLE_RATE, CHANNELS)
+        self.input_converter = None
+        self.output_converter = None
+
+        # Frames held while no stream is live, flushed in order on the next switch
+        self.holding = False
+        self.hold_buffer = deque(maxlen=HOLD_BUFFER_SECONDS * INPUT_SAMPLE_RATE // CHUNK_SIZE)
+        self.held_since = None
+        self.frames_dropped = 0
+        self.last_switch = None
+        # Last time the microphone was loud, for speech onset tracing
+        self.loud_at = 0.0
+        if open_devices:
+            self.open_devices()
+
+    def open_devices(self):
+        """Initialize the audio backend and open both streams; blocking, so it can run in an executor."""
+        if self.backend is None:
+            # Initialize PyAudio
+            debug_print("AudioStreamer Initializing PyAudio...")
+            self.backend = time_it("AudioStreamerInitPyAudio", PyAudioBackend)
+            debug_print("AudioStreamer PyAudio initialized")
 
-        # Initialize PyAudio
-        debug_print("AudioStreamer Initializing PyAudio...")
-        self.p = time_it("AudioStreamerInitPyAudio", pyaudio.PyAudio)
-        debug_print("AudioStreamer PyAudio initialized")
+        # Open devices at their native format when they can't do Nova Sonic's
+        self.input_format = self.backend.negotiate_input(INPUT_SAMPLE_RATE, CHANNELS)
+        self.output_format = self.backend.negotiate_output(OUTPUT_SAMPLE_RATE, CHANNELS)
+        self.input_converter = make_converter(*self.input_format, INPUT_SAMPLE_RATE, CHANNELS)
+        self.output_converter = make_converter(OUTPUT_SAMPLE_RATE, CHANNELS, *self.output_format)
+        if self.input_converter or self.output_converter:
+            print(f"Converting audio: mic {self.input_format[0]} Hz x{self.input_format[1]}, "
+                  f"speaker {self.output_format[0]} Hz x{self.output_format[1]}")
+        # Keep buffers the same duration as CHUNK_SIZE frames at the pipeline rate
+        input_frames = CHUNK_SIZE * self.input_format[0] // INPUT_SAMPLE_RATE
+        output_frames = CHUNK_SIZE * self.output_format[0] // OUTPUT_SAMPLE_RATE
 
         # Initialize separate streams for input and output
         # Input stream with callback for microphone
         debug_print("Opening input audio stream...")
-        self.input_stream = time_it("AudioStreamerOpenAudio", lambda  : self.p.open(
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=INPUT_SAMPLE_RATE,
-            input=True,
-            frames_per_buffer=CHUNK_SIZE,
-            stream_callback=self.input_callback
+        self.input_stream = time_it("AudioStreamerOpenAudio", lambda  : self.backend.open_input(
+            *self.input_format, input_frames, self.input_callback
         ))
         debug_print("input audio stream opened")
 
         # Output stream for direct writing (no callback)
         debug_print("Opening output audio stream...")
-        self.output_stream = time_it("AudioStreamerOpenAudio", lambda  : self.p.open(
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=OUTPUT_SAMPLE_RATE,
-            output=True,
-            frames_per_buffer=CHUNK_SIZE
+        self.output_stream = time_it("AudioStreamerOpenAudio", lambda  : self.backend.open_output(
+            *self.output_format, output_frames
         ))
 
         debug_print("output audio stream opened")
+        self.profiler.mark("audio_devices_open")
 
-    def input_callback(self, in_data, frame_count, time_info, status):
+    def input_callback(self, in_data):
         """Callback function that schedules audio processing in the asyncio event loop"""
         if self.is_streaming and in_data:
+            if self.input_converter is not None:
+                # Convert on the capture thread so the event loop only sees 16 kHz mono
+                in_data = self.input_converter.process(in_data)
             # Schedule the task in the event loop
             asyncio.run_coroutine_threadsafe(
                 self.process_input_audio(in_data), 
                 self.loop
             )
-        return (None, pyaudio.paContinue)
+
+    def _trace_speech_onset(self, audio_data):
+        """Start a trace turn on the first loud frame after a quiet stretch."""
+        if max(memoryview(audio_data).cast('h'), default=0) < SPEECH_ONSET_PEAK:
+            return
+        now = time.monotonic()
+        if now - self.loud_at > SPEECH_ONSET_QUIET_SECONDS:
+            TRACER.begin_turn()
+        self.loud_at = now
 
     async def process_input_audio(self, audio_data):
         """Process a single audio chunk directly"""
         try:
+            if TRACER.enabled:
+                self._trace_speech_onset(audio_data)
+            if self.holding or not self.stream_manager.is_active:
+                # No live stream to take the frame; keep it for the next one
+                if self.held_since is None:
+                    self.held_since = time.monotonic()
+                if len(self.hold_buffer) == self.hold_buffer.maxlen:
+                    self.frames_dropped += 1
+                self.hold_buffer.append(audio_data)
+                return
             # Send audio to Bedrock immediately
             self.stream_manager.add_audio_chunk(audio_data)
         except Exception as e:
             if self.is_streaming:
                 print(f"Error processing input audio: {e}")
-    
+
+    async def switch_stream_manager(self, stream_manager):
+        """Route microphone audio and playback to a different, initialized stream.
+
+        Frames the previous stream queued but never sent, and frames held
+        while switching, are replayed to the new stream in capture order.
+        """
+        previous = self.stream_manager
+        self.holding = True
+        try:
+            if self.is_streaming:
+                await stream_manager.send_audio_content_start_event()
+            leftovers = []
+            if not previous.is_active:
+                while not previous.audio_input_queue.empty():
+                    leftovers.append(previous.audio_input_queue.get_nowait()['audio_bytes'])
+            held = list(self.hold_buffer)
+            self.hold_buffer.clear()
+            self.stream_manager = stream_manager
+            for frame in leftovers + held:
+                stream_manager.add_audio_chunk(frame)
+            self.last_switch = {
+                "frames_flushed": len(leftovers) + len(held),
+                "held_seconds": time.monotonic() - self.held_since if self.held_since else 0.0,
+            }
+        finally:
+            self.holding = False
+            self.held_since = None
+        return previous
+
     async def play_output_audio(self):
         """Play audio responses from Nova Sonic"""
         while self.is_streaming:
@@ -609,6 +1007,12 @@ class AudioStreamer:
                 if audio_data and self.is_streaming:
                     # Write directly to the output stream in smaller chunks
                     chunk_size = CHUNK_SIZE  # Use the same chunk size as the stream
+                    if self.output_converter is not None:
+                        audio_data = self.output_converter.process(audio_data)
+                        # Same playback duration per write, whole frames only
+                        rate, channels = self.output_format
+                        frame_bytes = channels * SAMPLE_WIDTH
+                        chunk_size = CHUNK_SIZE * rate // OUTPUT_SAMPLE_RATE * channels // frame_bytes * frame_bytes
                     
                     # Write the audio data in chunks to avoid blocking too long
                     for i in range(0, len(audio_data), chunk_size):
@@ -624,6 +1028,8 @@ class AudioStreamer:
                         
                         # Pass the chunk to the function
                         await asyncio.get_event_loop().run_in_executor(None, write_chunk, chunk)
+                        self.profiler.mark("first_audio_out")
+                        TRACER.turn_mark("first_audio_out")
                         
                         # Brief yield to allow other tasks to run
                         await asyncio.sleep(0.001)
@@ -638,13 +1044,18 @@ class AudioStreamer:
                     traceback.print_exc()
                 await asyncio.sleep(0.05)
     
-    async def start_streaming(self):
-        """Start streaming audio."""
+    async def start_streaming(self, on_started=None, until=None):
+        """Start streaming audio.
+
+        on_started is run as a task once audio is flowing. Streaming stops when
+        the until coroutine function returns, or when Enter is pressed.
+        """
         if self.is_streaming:
             return
         
-        print("Starting audio streaming. Speak into your microphone...")
-        print("Press Enter to stop streaming...")
+        if until is None:
+            print("Starting audio streaming. Speak into your microphone...")
+            print("Press Enter to stop streaming...")
         
         # Send audio content start event
         await time_it_async("send_audio_content_start_event", lambda : self.stream_manager.send_audio_content_start_event())
@@ -658,9 +1069,15 @@ class AudioStreamer:
         # Start processing tasks
         #self.input_task = asyncio.create_task(self.process_input_audio())
         self.output_task = asyncio.create_task(self.play_output_audio())
+        self.profiler.mark("ready")
+        if on_started is not None:
+            self.watch_task = asyncio.create_task(on_started())
         
-        # Wait for user to press Enter to stop
-        await asyncio.get_event_loop().run_in_executor(None, input)
+        if until is not None:
+            await until()
+        else:
+            # Wait for user to press Enter to stop
+            await asyncio.get_event_loop().run_in_executor(None, input)
         
         # Once input() returns, stop streaming
         await self.stop_streaming()
@@ -678,6 +1095,8 @@ class AudioStreamer:
             tasks.append(self.input_task)
         if hasattr(self, 'output_task') and not self.output_task.done():
             tasks.append(self.output_task)
+        if hasattr(self, 'watch_task') and not self.watch_task.done():
+            tasks.append(self.watch_task)
         for task in tasks:
             task.cancel()
         if tasks:
@@ -691,35 +1110,99 @@ class AudioStreamer:
             if self.output_stream.is_active():
                 self.output_stream.stop_stream()
             self.output_stream.close()
-        if self.p:
-            self.p.terminate()
+        if self.backend:
+            self.backend.terminate()
         
         await self.stream_manager.close() 
 
 
-async def main(debug=False):
-    """Main function to run the application."""
+async def main(debug=False, fast_start=False, standby=False, profile_startup=False, supervise=False,
+               audio_backend=None, linger=2.0, trace=None, trace_capacity=8192):
+    """Main function to run the application.
+
+    With an audio_backend from audio_io the session runs headless and ends
+    linger seconds after the backend's input is exhausted. With trace set,
+    per-turn latency events are written to that path on exit.
+    """
     global DEBUG
     DEBUG = debug
+    if trace:
+        TRACER.enable(trace_capacity)
+
+    profiler = StartupProfiler(enabled=profile_startup)
+    profiler.mark("imports_done")
+
+    def create_stream_manager(history=None):
+        return BedrockStreamManager(
+            model_id='amazon.nova-sonic-v1:0',
+            region='us-east-1',
+            init_event_delay=0 if fast_start else 0.1,
+            history=history,
+        )
 
     # Create stream manager
-    stream_manager = BedrockStreamManager(model_id='amazon.nova-sonic-v1:0', region='us-east-1')
+    stream_manager = create_stream_manager()
 
-    # Create audio streamer
-    audio_streamer = AudioStreamer(stream_manager)
+    if fast_start:
+        # Open the audio devices on a worker thread while the Bedrock stream handshakes
+        loop = asyncio.get_event_loop()
+        audio_streamer = AudioStreamer(stream_manager, open_devices=False, profiler=profiler, backend=audio_backend)
 
-    # Initialize the stream
-    await time_it_async("initialize_stream", stream_manager.initialize_stream)
+        async def initialize_stream():
+            # Import the SDK off the event loop too, so it overlaps the device setup
+            await loop.run_in_executor(None, load_bedrock_sdk)
+            await stream_manager.initialize_stream()
+
+        await asyncio.gather(
+            loop.run_in_executor(None, audio_streamer.open_devices),
+            time_it_async("initialize_stream", initialize_stream),
+        )
+    else:
+        # Create audio streamer
+        audio_streamer = AudioStreamer(stream_manager, profiler=profiler, backend=audio_backend)
+
+        # Initialize the stream
+        await time_it_async("initialize_stream", stream_manager.initialize_stream)
+    profiler.mark("stream_initialized")
+
+    standby_session = None
+    if standby:
+        standby_session = StandbySession(create_stream_manager)
+        standby_session.prewarm()
+
+    supervisor = None
+    if supervise or standby:
+        # Reconnects on stream errors; with --supervise also renews before expiry
+        supervisor = SessionSupervisor(create_stream_manager, audio_streamer, standby=standby_session, renew=supervise)
+
+    until = None
+    if audio_backend is not None:
+        async def until():
+            # Headless: run until the input source is exhausted, then let responses finish
+            while not audio_backend.input_done.is_set():
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(linger)
 
     try:
         # This will run until the user presses Enter
-        await audio_streamer.start_streaming()
+        await audio_streamer.start_streaming(
+            on_started=supervisor.run if supervisor else None,
+            until=until,
+        )
         
     except KeyboardInterrupt:
         print("Interrupted by user")
     finally:
         # Clean up
         await audio_streamer.stop_streaming()
+        if standby_session:
+            await standby_session.close()
+        if "first_audio_out" not in profiler.marks:
+            profiler.report()
+        if trace:
+            TRACER.write(trace)
+            TRACER.print_summary()
+            print(f"Trace written to {trace}")
         
 
 if __name__ == "__main__":
@@ -727,22 +1210,35 @@ if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description='Nova Sonic Python Streaming')
     parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--fast-start', action='store_true', help='Open audio devices and the Bedrock stream concurrently, without init delays')
+    parser.add_argument('--standby', action='store_true', help='Keep a pre-warmed standby session for instant reconnect')
+    parser.add_argument('--profile-startup', action='store_true', help='Report cold-start and time-to-first-audio metrics')
+    parser.add_argument('--supervise', action='store_true', help='Renew the Bedrock stream before expiry and after errors')
+    parser.add_argument('--audio-backend', choices=['pyaudio', 'wav', 'pipe'], default='pyaudio', help='Audio I/O backend')
+    parser.add_argument('--input-file', help='Input WAV file or raw PCM path (pipe backend defaults to stdin)')
+    parser.add_argument('--output-file', help='Output WAV file or raw PCM path (pipe backend defaults to stdout)')
+    parser.add_argument('--linger', type=float, default=2.0, help='Seconds to keep playing responses after headless input ends')
+    parser.add_argument('--pipe-rate', type=int, help='Sample rate of raw PCM on both pipes (pipe backend)')
+    parser.add_argument('--pipe-channels', type=int, help='Channel count of raw PCM on both pipes (pipe backend)')
+    parser.add_argument('--trace', metavar='PATH', help='Record turn latency; .json writes a Chrome trace, anything else JSON lines')
+    parser.add_argument('--trace-capacity', type=int, default=8192, help='Trace events kept in the ring buffer')
     args = parser.parse_args()
+    audio_backend = None
+    if args.audio_backend != 'pyaudio':
+        backend_options = {'input_path': args.input_file, 'output_path': args.output_file}
+        if args.audio_backend == 'pipe':
+            backend_options.update(input_rate=args.pipe_rate, input_channels=args.pipe_channels,
+                                   output_rate=args.pipe_rate, output_channels=args.pipe_channels)
+        audio_backend = create_audio_backend(args.audio_backend, **backend_options)
     # Set your AWS credentials here or use environment variables
-    session = boto3.Session()
-    credentials = session.get_credentials()
-    if credentials is not None:
-        os.environ['AWS_ACCESS_KEY_ID'] = credentials.access_key
-        os.environ['AWS_SECRET_ACCESS_KEY'] = credentials.secret_key
-        if credentials.token:
-            os.environ['AWS_SESSION_TOKEN'] = credentials.token
-    os.environ['AWS_DEFAULT_REGION'] = "us-east-1"
+    export_aws_credentials()
 
     # Run the main function
     try:
-        asyncio.run(main(debug=args.debug))
+        asyncio.run(main(debug=args.debug, fast_start=args.fast_start, standby=args.standby, profile_startup=args.profile_startup, supervise=args.supervise,
+                         audio_backend=audio_backend, linger=args.linger, trace=args.trace, trace_capacity=args.trace_capacity))
     except Exception as e:
         print(f"Application error: {e}")
         if args.debug:
             import traceback
-
+            traceback.print_exc()
@@ -0,0 +1,242 @@
+"""
+Blends consecutive locomotion motions into one continuous velocity profile.
+
+Run one after another, go_forward, turn_left, go_forward ramps to a stop and
+restarts the gait at every boundary. blend_motions instead builds a single
+time-parameterized, piecewise-linear profile per axis:
+
+    profile = blend_motions([motions["go_forward"], motions["turn_left"]], max_accel, max_yaw_accel)
+    finished = streamer.run_profile(profile)
+
+Each motion contributes a step at its cruise velocity lasting distance/speed
+(or yaw/yaw_rate). Every step change becomes an acceleration-limited ramp
+centred on the boundary, which covers the same distance as the step, so the
+blend travels what the motions ask for. A motion too short for the ramps at
+both of its ends is slowed down, and lengthened to match, until they fit.
+
+    python motion_blend.py go_forward turn_left go_forward
+"""
+
+import math
+from bisect import bisect_right
+
+import yaml
+
+AXES = 3  # x, y, yaw_rate
+
+# Settings and motions live here rather than in velocity_streamer, so this
+# module and its comparison run without ROS installed
+DEFAULT_VELOCITY_SETTINGS = {
+    "rate_hz": 20.0,
+    "max_accel": 10.0,
+    "max_yaw_accel": 2.0,
+    "command_timeout": 0.5,
+    # Merge consecutive queued motions into one profile (blend_motions)
+    "blend": True,
+}
+
+# Fallback motions when settings.yaml has no velocity.motions section
+DEFAULT_MOTIONS = {
+    "go_forward": {"distance": 17.5, "speed": 5.0},
+    "back_fast": {"distance": -22.5, "speed": 5.0},
+    "left_move_fast": {"distance": 10.0, "speed": 5.0, "lateral": True},
+    "right_move_fast": {"distance": -10.0, "speed": 5.0, "lateral": True},
+    "turn_left": {"yaw": 1.57, "yaw_rate": 0.5},
+    "turn_right": {"yaw": -1.57, "yaw_rate": 0.5},
+    "stop": {"distance": 0.0},
+}
+
+
+def load_velocity_settings(settings_path="settings.yaml"):
+    """Return (streamer settings, motions) from the velocity section of settings.yaml."""
+    try:
+        with open(settings_path, "r", encoding="utf-8") as file:
+            section = (yaml.safe_load(file) or {}).get("velocity") or {}
+    except FileNotFoundError:
+        section = {}
+    settings = {key: type(default)(section.get(key, default)) for key, default in DEFAULT_VELOCITY_SETTINGS.items()}
+    motions = section.get("motions") or DEFAULT_MOTIONS
+    return settings, motions
+
+
+def motion_step(motion):
+    """(velocity per axis, seconds) of the constant-velocity step a motion stands for."""
+    distance = motion.get("distance", 0.0)
+    speed = abs(motion.get("speed", 5.0))
+    yaw = motion.get("yaw", 0.0)
+    yaw_rate = abs(motion.get("yaw_rate", 0.5))
+    if distance and speed:
+        duration = abs(distance) / speed
+        linear = speed if distance > 0 else -speed
+        turn = yaw / duration if yaw else 0.0
+        velocity = (0.0, linear, turn) if motion.get("lateral") else (linear, 0.0, turn)
+        return velocity, duration
+    if yaw and yaw_rate:
+        return (0.0, 0.0, yaw_rate if yaw > 0 else -yaw_rate), abs(yaw) / yaw_rate
+    return (0.0, 0.0, 0.0), 0.0
+
+
+def ramp_plan(amount, speed, accel):
+    """Trapezoidal profile covering amount; returns (peak speed, seconds at target)."""
+    amount = abs(amount)
+    if amount == 0 or speed == 0:
+        return 0.0, 0.0
+    speed = abs(speed)
+    if amount >= speed * speed / accel:
+        # Ramp up, cruise, ramp down; the target is held through ramp-up and cruise
+        return speed, speed / accel + (amount - speed * speed / accel) / speed
+    # Too short to reach speed: triangular profile
+    peak = math.sqrt(amount * accel)
+    return peak, peak / accel
+
+
+def integrate(samples):
+    """Distance along x and y and total yaw covered by (time, x, y, yaw_rate) samples."""
+    totals = [0.0] * AXES
+    for (t0, *v0), (t1, *_) in zip(samples, list(samples)[1:]):
+        for axis in range(AXES):
+            totals[axis] += v0[axis] * (t1 - t0)
+    return tuple(totals)
+
+
+def _intersect(p0, p1, q0, q1):
+    """Point where segment p0-p1 and segment q0-q1, extended as lines, cross."""
+    slope_p = (p1[1] - p0[1]) / (p1[0] - p0[0])
+    slope_q = (q1[1] - q0[1]) / (q1[0] - q0[0])
+    if slope_p == slope_q:
+        middle = (p1[0] + q0[0]) / 2
+        return (middle, p0[1] + slope_p * (middle - p0[0]))
+    t = (q0[1] - p0[1] + slope_p * p0[0] - slope_q * q0[0]) / (slope_p - slope_q)
+    return (t, p0[1] + slope_p * (t - p0[0]))
+
+
+class VelocityProfile:
+    """Piecewise-linear velocity per axis; points[axis] is a list of (seconds, value)."""
+
+    def __init__(self, points, names=()):
+        self.points = points
+        self.names = list(names)
+        self.duration = max(axis[-1][0] for axis in points)
+        self._times = [[t for t, _ in axis] for axis in points]
+
+    def value_at(self, t):
+        """(x, y, yaw_rate) at t seconds into the profile."""
+        values = []
+        for axis, times in zip(self.points, self._times):
+            i = bisect_right(times, t)
+            if i == 0 or i == len(axis):
+                values.append(0.0)
+                continue
+            (t0, v0), (t1, v1) = axis[i - 1], axis[i]
+            values.append(v0 if t1 == t0 else v0 + (v1 - v0) * (t - t0) / (t1 - t0))
+        return tuple(values)
+
+    def totals(self):
+        """Distance along x and y and yaw covered by the whole profile."""
+        return tuple(
+            sum((t1 - t0) * (v0 + v1) / 2 for (t0, v0), (t1, v1) in zip(axis, axis[1:]))
+            for axis in self.points
+        )
+
+
+def blend_motions(motions, max_accel, max_yaw_accel, names=()):
+    """Build one VelocityProfile running the motions back to back without stopping."""
+    steps = [motion_step(motion) for motion in motions]
+    steps = [step for step in steps if step[1] > 0]
+    limits = (max_accel, max_accel, max_yaw_accel)
+
+    def ramp_halves(steps):
+        velocities = [(0.0,) * AXES] + [velocity for velocity, _ in steps] + [(0.0,) * AXES]
+        # Half-width of the ramp at each boundary, per axis
+        half = [
+            [abs(after[axis] - before[axis]) / (2 * limits[axis]) for axis in range(AXES)]
+            for before, after in zip(velocities, velocities[1:])
+        ]
+        return velocities, half
+
+    for _ in range(8):
+        velocities, half = ramp_halves(steps)
+        changed = False
+        for k, (velocity, duration) in enumerate(steps):
+            needed = max(half[k][axis] + half[k + 1][axis] for axis in range(AXES))
+            if duration < needed * 0.999:
+                # Same distance at a lower speed: the ramps shrink as the step grows
+                scale = math.sqrt(duration / needed)
+                steps[k] = (tuple(v * scale for v in velocity), duration / scale)
+                changed = True
+        if not changed:
+            break
+    velocities, half = ramp_halves(steps)
+    # Boundary times of the step profile, shifted so the first ramp starts at 0
+    boundaries = [max(half[0])]
+    for _, duration in steps:
+        boundaries.append(boundaries[-1] + duration)
+
+    points = []
+    for axis in range(AXES):
+        axis_points = [(0.0, 0.0)]
+        for j, boundary in enumerate(boundaries):
+            h = half[j][axis]
+            if h == 0:
+                continue
+            start = (boundary - h, velocities[j][axis])
+            end = (boundary + h, velocities[j + 1][axis])
+            previous = axis_points[-1]
+            if start[0] < previous[0] and len(axis_points) >= 2:
+                # Ramps overlap on a short motion: meet where the two ramps cross
+                crossing = _intersect(axis_points[-2], previous, start, end)
+                axis_points[-1] = crossing
+                axis_points.append(end)
+            else:
+                if start[0] > previous[0]:
+                    axis_points.append(start)
+                axis_points.append(end)
+        points.append(axis_points)
+    return VelocityProfile(points, names)
+
+
+def sequential_seconds(motions, max_accel, max_yaw_accel, gap=0.5, alignment=0.5):
+    """Time to run motions one at a time: ramp up, cruise, ramp down, then the scheduler gap.
+
+    alignment is the average wait for the consumer's whole-second alignment.
+    """
+    total = 0.0
+    for motion in motions:
+        velocity, duration = motion_step(motion)
+        if duration == 0:
+            continue
+        limits = (max_accel, max_accel, max_yaw_accel)
+        ramp = max(abs(velocity[axis]) / limits[axis] for axis in range(AXES))
+        # A trapezoid covering the same distance is one ramp longer than the step
+        total += duration + ramp + gap + alignment
+    return total
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare sequential and blended locomotion sequences")
+    parser.add_argument("actions", nargs="*", default=["go_forward", "turn_left", "go_forward"])
+    args = parser.parse_args()
+
+    settings, motions = load_velocity_settings()
+    sequence = [motions[name] for name in args.actions]
+    accel, yaw_accel = settings["max_accel"], settings["max_yaw_accel"]
+    profile = blend_motions(sequence, accel, yaw_accel, args.actions)
+    before = sequential_seconds(sequence, accel, yaw_accel)
+    wanted = [0.0, 0.0, 0.0]
+    for motion in sequence:
+        velocity, duration = motion_step(motion)
+        for axis in range(AXES):
+            wanted[axis] += velocity[axis] * duration
+
+    print(f"Sequence: {', '.join(args.actions)}")
+    print(f"  sequential  {before:6.2f}s  (stop between motions, 0.5s gap, second alignment)")
+    print(f"  blended     {profile.duration:6.2f}s  ({100 * (1 - profile.duration / before):.0f}% shorter)")
+    covered = profile.totals()
+    print(f"  requested   x {wanted[0]:.2f}  y {wanted[1]:.2f}  yaw {wanted[2]:.3f}")
+    print(f"  blended     x {covered[0]:.2f}  y {covered[1]:.2f}  yaw {covered[2]:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,29 +2,21 @@
 # coding=utf8
 
 import sys
-import math
 import rclpy
 from rclpy.node import Node
 from std_srvs.srv import SetBool
 from puppy_control_msgs.msg import Velocity, Pose, Gait
+from gait_presets import GAIT_PRESETS, pose_for
 
 ROS_NODE_NAME = 'puppy_demo'
 
 PuppyMove = {'x': 5.0, 'y': 0.0, 'yaw_rate': 0.0}
 
-PuppyPose = {'roll': math.radians(0), 'pitch': math.radians(0), 'yaw': 0.000, 'height': -10.0, 'x_shift': 0.5, 'stance_x': 0.0, 'stance_y': 0.0}
-
 gait = 'Trot'
 
-if gait == 'Trot':
-    GaitConfig = {'overlap_time': 0.2, 'swing_time': 0.3, 'clearance_time': 0.0, 'z_clearance': 5.0}
-    PuppyPose['x_shift'] = -0.6
-elif gait == 'Amble':
-    GaitConfig = {'overlap_time': 0.1, 'swing_time': 0.2, 'clearance_time': 0.1, 'z_clearance': 5.0}
-    PuppyPose['x_shift'] = -0.9
-elif gait == 'Walk':
-    GaitConfig = {'overlap_time': 0.1, 'swing_time': 0.2, 'clearance_time': 0.3, 'z_clearance': 5.0}
-    PuppyPose['x_shift'] = -0.65
+# Trot, Amble and Walk tunings live in gait_presets
+GaitConfig = GAIT_PRESETS[gait]['gait']
+PuppyPose = pose_for(gait)
 
 
 class PuppyDemoNode(Node):
@@ -0,0 +1,124 @@
+"""
+Streaming sample-rate and channel conversion for 16-bit PCM audio.
+
+Robot boards often only capture at 44.1/48 kHz or in stereo, while Nova Sonic
+takes 16 kHz mono in and produces 24 kHz mono out. AudioConverter bridges the
+two in-process:
+
+    converter = AudioConverter(48000, 2, 16000, 1)
+    pcm_16k_mono = converter.process(pcm_48k_stereo)
+
+Resampling uses a rational polyphase filter bank built once from a
+Kaiser-windowed sinc, so each block costs one vectorized multiply-accumulate
+per output sample. Added latency is half the filter length, about
+zero_crossings sample periods at the lower of the two rates.
+"""
+
+from math import ceil, gcd
+
+import numpy as np
+
+INT16_MAX = 32767
+
+
+def design_filter_bank(up, down, zero_crossings=8, beta=8.0, rolloff=0.95):
+    """Return an (up, taps_per_phase) polyphase bank of a windowed-sinc low-pass.
+
+    The sinc is kept for zero_crossings lobes on each side of its centre.
+    Row p holds the taps used for output phase p, ordered oldest input first.
+    """
+    # Cutoff in cycles per sample at the upsampled rate
+    cutoff = rolloff * 0.5 / max(up, down)
+    taps_per_phase = ceil(zero_crossings / cutoff / up)
+    length = taps_per_phase * up
+    n = np.arange(length) - (length - 1) / 2.0
+    prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+    prototype *= up / prototype.sum()
+    # Tap j of phase p multiplies the input j samples back from the newest
+    bank = prototype.reshape(taps_per_phase, up).T
+    return np.ascontiguousarray(bank[:, ::-1], dtype=np.float32)
+
+
+def mix_channels(samples, channels):
+    """Mix a (frames, channels) float array to the given channel count."""
+    in_channels = samples.shape[1]
+    if in_channels == channels:
+        return samples
+    if channels == 1:
+        return samples.mean(axis=1, keepdims=True)
+    if in_channels == 1:
+        return np.repeat(samples, channels, axis=1)
+    if in_channels > channels:
+        return samples[:, :channels]
+    return np.pad(samples, ((0, 0), (0, channels - in_channels)))
+
+
+class PolyphaseResampler:
+    """Streaming rational resampler for (frames, channels) float32 blocks."""
+
+    def __init__(self, in_rate, out_rate, channels=1, zero_crossings=8, beta=8.0):
+        divisor = gcd(in_rate, out_rate)
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        self.bank = design_filter_bank(self.up, self.down, zero_crossings, beta)
+        self.taps = self.bank.shape[1]
+        # Input index and filter phase for each output in one period of up outputs
+        k = np.arange(self.up)
+        self._cycle_base = (k * self.down) // self.up
+        self._cycle_phase = (k * self.down) % self.up
+        # Pending input, primed with silence; _offset is the input index of row 0
+        self._buffer = np.zeros((self.taps - 1, channels), dtype=np.float32)
+        self._offset = -(self.taps - 1)
+        self._next_output = 0
+
+    def process(self, block):
+        """Resample a (frames, channels) block and return the outputs it completes."""
+        buffer = np.concatenate((self._buffer, block.astype(np.float32, copy=False)))
+        last_input = self._offset + len(buffer) - 1
+        # Outputs whose newest input sample has arrived
+        last_output = (last_input * self.up + self.up - 1) // self.down
+        count = last_output - self._next_output + 1
+        if count <= 0:
+            self._buffer = buffer
+            return np.zeros((0, buffer.shape[1]), dtype=np.float32)
+
+        outputs = np.arange(self._next_output, last_output + 1)
+        cycles, within = np.divmod(outputs, self.up)
+        newest = cycles * self.down + self._cycle_base[within]
+        phases = self._cycle_phase[within]
+
+        windows = np.lib.stride_tricks.sliding_window_view(buffer, self.taps, axis=0)
+        # windows[i] covers buffer rows i .. i + taps - 1, shaped (channels, taps)
+        selected = windows[newest - self.taps + 1 - self._offset]
+        result = np.einsum("kct,kt->kc", selected, self.bank[phases])
+
+        self._next_output = last_output + 1
+        next_newest = (self._next_output * self.down) // self.up
+        keep_from = next_newest - self.taps + 1 - self._offset
+        self._buffer = buffer[keep_from:]
+        self._offset += keep_from
+        return result
+
+
+class AudioConverter:
+    """Converts interleaved int16 PCM between rates and channel counts, block by block."""
+
+    def __init__(self, in_rate, in_channels, out_rate, out_channels, zero_crossings=8):
+        self.in_rate = in_rate
+        self.in_channels = in_channels
+        self.out_rate = out_rate
+        self.out_channels = out_channels
+        # Resample at the smaller channel count to do the least filtering work
+        self.resample_channels = min(in_channels, out_channels)
+        self.resampler = None
+        if in_rate != out_rate:
+            self.resampler = PolyphaseResampler(in_rate, out_rate, self.resample_channels, zero_crossings)
+
+    def process(self, pcm):
+        """Convert a block of PCM bytes; may return fewer bytes while the filter fills."""
+        samples = np.frombuffer(pcm, dtype=np.int16).reshape(-1, self.in_channels)
+        samples = mix_channels(samples.astype(np.float32), self.resample_channels)
+        if self.resampler is not None:
+            samples = self.resampler.process(samples)
+        samples = mix_channels(samples, self.out_channels)
+        return np.clip(np.rint(samples), -INT16_MAX - 1, INT16_MAX).astype("<i2").tobytes()
@@ -0,0 +1,191 @@
+"""
+Publishing layer for the PuppyPi control topics.
+
+Each topic gets a QoS profile suited to its traffic and one preallocated
+message object that is refilled on every publish:
+
+    publishers = RobotPublishers(node)
+    publishers.publish_velocity(5.0, 0.0, 0.0)
+    publishers.publish_pose(height=-10.0, x_shift=-0.6, run_time=500)
+
+Velocity is a stream where only the newest sample matters, so it keeps a
+history of one: a sample not yet delivered is replaced by the next one
+rather than queued behind it. It is reliable by default, because a reliable
+publisher matches both reliable and best-effort subscribers, and whether
+the gait node's subscription has been discovered when the publisher is
+created depends on DDS timing. ros_qos.velocity: best_effort opts in to
+best-effort delivery for a gait node known to subscribe best-effort. Pose
+and gait are one-off commands and are reliable with a deeper history.
+
+rclpy has no intra-process transport. When the consumer runs in the same
+Python process, add_local_sink delivers messages to it by direct call, and
+local_only skips DDS entirely.
+"""
+
+import threading
+import time
+
+import yaml
+from rclpy.qos import DurabilityPolicy, HistoryPolicy, QoSProfile, ReliabilityPolicy
+from puppy_control_msgs.msg import Velocity, Pose, Gait
+
+VELOCITY_TOPIC = '/puppy_control/velocity'
+POSE_TOPIC = '/puppy_control/pose'
+GAIT_TOPIC = '/puppy_control/gait'
+
+# Latest-wins stream that matches any subscriber: never queue stale velocities
+VELOCITY_QOS = QoSProfile(
+    history=HistoryPolicy.KEEP_LAST,
+    depth=1,
+    reliability=ReliabilityPolicy.RELIABLE,
+    durability=DurabilityPolicy.VOLATILE,
+)
+# Never retransmitted either; only matches best-effort subscribers
+BEST_EFFORT_VELOCITY_QOS = QoSProfile(
+    history=HistoryPolicy.KEEP_LAST,
+    depth=1,
+    reliability=ReliabilityPolicy.BEST_EFFORT,
+    durability=DurabilityPolicy.VOLATILE,
+)
+# One-off commands that must arrive
+COMMAND_QOS = QoSProfile(
+    history=HistoryPolicy.KEEP_LAST,
+    depth=10,
+    reliability=ReliabilityPolicy.RELIABLE,
+    durability=DurabilityPolicy.VOLATILE,
+)
+
+
+def load_qos_settings(settings_path="settings.yaml"):
+    """Return the ros_qos section of settings.yaml, or an empty dict."""
+    try:
+        with open(settings_path, "r", encoding="utf-8") as file:
+            return (yaml.safe_load(file) or {}).get("ros_qos") or {}
+    except FileNotFoundError:
+        return {}
+
+
+class ReusedPublisher:
+    """A publisher that refills one message object instead of allocating per call."""
+
+    def __init__(self, node, msg_type, topic, qos, local_only=False):
+        self.topic = topic
+        self.qos = qos
+        self.publisher = None if local_only else node.create_publisher(msg_type, topic, qos)
+        self.msg = msg_type()
+        self.local_sinks = []
+        self.published = 0
+        # Callers on different threads share self.msg
+        self._lock = threading.Lock()
+
+    def publish(self, msg=None, **fields):
+        """Publish msg, or the reused message with fields assigned."""
+        with self._lock:
+            if msg is None:
+                msg = self.msg
+                for name, value in fields.items():
+                    setattr(msg, name, value)
+            if self.publisher is not None:
+                self.publisher.publish(msg)
+            for sink in self.local_sinks:
+                sink(msg)
+            self.published += 1
+
+    def subscription_count(self):
+        return self.publisher.get_subscription_count() if self.publisher is not None else len(self.local_sinks)
+
+
+class RobotPublishers:
+    """Velocity, pose and gait publishers with per-topic QoS."""
+
+    def __init__(self, node, qos_settings=None, local_only=False):
+        settings = load_qos_settings() if qos_settings is None else qos_settings
+        velocity_qos = VELOCITY_QOS
+        if settings.get("velocity", "reliable") == "best_effort":
+            velocity_qos = BEST_EFFORT_VELOCITY_QOS
+
+        self.velocity = ReusedPublisher(node, Velocity, VELOCITY_TOPIC, velocity_qos, local_only)
+        self.pose = ReusedPublisher(node, Pose, POSE_TOPIC, COMMAND_QOS, local_only)
+        self.gait = ReusedPublisher(node, Gait, GAIT_TOPIC, COMMAND_QOS, local_only)
+        self._by_topic = {p.topic: p for p in (self.velocity, self.pose, self.gait)}
+
+    def publish_velocity(self, x, y, yaw_rate):
+        self.velocity.publish(x=float(x), y=float(y), yaw_rate=float(yaw_rate))
+
+    def publish_pose(self, **fields):
+        self.pose.publish(**fields)
+
+    def publish_gait(self, **fields):
+        self.gait.publish(**fields)
+
+    def add_local_sink(self, topic, callback):
+        """Deliver every message on topic to callback in-process, alongside DDS."""
+        self._by_topic[topic].local_sinks.append(callback)
+
+
+def _bench_case(label, publish, seconds):
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            publish()
+        count += 100
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34} {count / elapsed:>10.0f} msg/s {elapsed / count * 1e6:>8.2f} us/msg")
+
+
+def main():
+    """Publish-rate benchmark: allocation vs reuse, reliable vs best-effort, local sink."""
+    import argparse
+
+    import rclpy
+    from rclpy.executors import SingleThreadedExecutor
+    from rclpy.node import Node
+
+    parser = argparse.ArgumentParser(description="Velocity publish-rate benchmark")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration of each case")
+    parser.add_argument("--topic", default="/puppy_control/velocity_bench",
+                        help="Topic to publish on; keep it away from the live velocity topic")
+    parser.add_argument("--with-subscriber", action="store_true",
+                        help="Add a same-process subscriber so DDS actually delivers")
+    args = parser.parse_args()
+
+    rclpy.init()
+    node = Node("ros_publishers_bench")
+    received = []
+    executor = None
+    if args.with_subscriber:
+        node.create_subscription(Velocity, args.topic, lambda msg: received.append(1), BEST_EFFORT_VELOCITY_QOS)
+        executor = SingleThreadedExecutor()
+        executor.add_node(node)
+        threading.Thread(target=executor.spin, daemon=True).start()
+        time.sleep(0.5)
+
+    default_pub = node.create_publisher(Velocity, args.topic, 10)
+    best_effort = ReusedPublisher(node, Velocity, args.topic, BEST_EFFORT_VELOCITY_QOS)
+    reliable = ReusedPublisher(node, Velocity, args.topic, VELOCITY_QOS)
+    local = ReusedPublisher(node, Velocity, args.topic, VELOCITY_QOS, local_only=True)
+    local.local_sinks.append(lambda msg: None)
+
+    print(f"Publish rate on {args.topic}, {args.seconds:.0f}s per case")
+    _bench_case("new Velocity(), reliable depth 10",
+                lambda: default_pub.publish(Velocity(x=5.0, y=0.0, yaw_rate=0.0)), args.seconds)
+    _bench_case("reused, reliable keep-last-1",
+                lambda: reliable.publish(x=5.0, y=0.0, yaw_rate=0.0), args.seconds)
+    _bench_case("reused, best-effort keep-last-1",
+                lambda: best_effort.publish(x=5.0, y=0.0, yaw_rate=0.0), args.seconds)
+    _bench_case("reused, in-process sink only",
+                lambda: local.publish(x=5.0, y=0.0, yaw_rate=0.0), args.seconds)
+    if args.with_subscriber:
+        time.sleep(0.5)
+        print(f"  subscriber received {len(received)} messages")
+
+    if executor is not None:
+        executor.shutdown()
+    node.destroy_node()
+    rclpy.shutdown()
+
+
+if __name__ == "__main__":
+    main()
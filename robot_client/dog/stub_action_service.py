@@ -0,0 +1,88 @@
+"""
+Stand-in for the PuppyPi /puppy_control/runActionGroup service, for running
+action_executor_ros without the robot's control stack:
+
+    python stub_action_service.py --startup-delay 3
+    python pubsub.py ...            # or any script that creates ActionExecutor
+
+Each request is answered once the named action's sleep_time has elapsed, as
+the real service does with wait=True. Requests are served on a
+MultiThreadedExecutor, so overlapping calls don't queue behind each other.
+--startup-delay exercises background service discovery, --fail-rate the
+failure path, and --no-reply the executor's response timeout.
+"""
+
+import argparse
+import logging
+import random
+import threading
+import time
+
+import rclpy
+from rclpy.callback_groups import ReentrantCallbackGroup
+from rclpy.executors import MultiThreadedExecutor
+from rclpy.node import Node
+from puppy_control_msgs.srv import SetRunActionName
+
+from action_executor_ros import RUN_ACTION_SERVICE, actions
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+logger = logging.getLogger(__name__)
+
+
+class StubActionService(Node):
+    def __init__(self, speed=1.0, fail_rate=0.0, no_reply=False):
+        super().__init__('stub_run_action_group')
+        self.speed = speed
+        self.fail_rate = fail_rate
+        self.no_reply = no_reply
+        self.calls = 0
+        self.service = self.create_service(
+            SetRunActionName, RUN_ACTION_SERVICE, self.handle_request,
+            callback_group=ReentrantCallbackGroup(),
+        )
+
+    def handle_request(self, request, response):
+        self.calls += 1
+        action_name = request.name.split('.')[0]
+        duration = actions.get(action_name, {}).get("sleep_time", 1.0) / self.speed
+        logger.info("runActionGroup %s (wait=%s), %.1fs", request.name, request.wait, duration)
+        if self.no_reply:
+            # Hold the request forever so the caller's timeout fires
+            threading.Event().wait()
+        if request.wait:
+            time.sleep(duration)
+        if random.random() < self.fail_rate:
+            raise RuntimeError(f"simulated failure running {request.name}")
+        if hasattr(response, "success"):
+            response.success = True
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub runActionGroup service")
+    parser.add_argument("--startup-delay", type=float, default=0.0, help="Seconds before the service is advertised")
+    parser.add_argument("--speed", type=float, default=1.0, help="Run actions this many times faster than sleep_time")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests that raise")
+    parser.add_argument("--no-reply", action="store_true", help="Never answer requests")
+    args = parser.parse_args()
+
+    time.sleep(args.startup_delay)
+    rclpy.init()
+    node = StubActionService(args.speed, args.fail_rate, args.no_reply)
+    executor = MultiThreadedExecutor(num_threads=4)
+    executor.add_node(node)
+    logger.info("Serving %s", RUN_ACTION_SERVICE)
+    try:
+        executor.spin()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Served %d requests", node.calls)
+        executor.shutdown()
+        node.destroy_node()
+        rclpy.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""
+Tests run from robot_client/dog/ with python -m pytest tests; the modules
+import each other by their top-level names, as pubsub.py does. They cover
+the ROS-free parts, so rclpy does not need to be installed.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+import pytest
+
+import velocity_streamer
+from motion_blend import integrate, ramp_plan
+from velocity_streamer import VelocityStreamer
+
+RATE_HZ = 50.0
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class _Node:
+    def create_timer(self, period, callback, callback_group=None):
+        self.period = period
+        self.tick = callback
+
+    def destroy_timer(self, timer):
+        pass
+
+
+class _Publisher:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, **fields):
+        self.published.append((fields["x"], fields["y"], fields["yaw_rate"]))
+
+
+@pytest.fixture
+def streamer(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(velocity_streamer, "time", clock)
+    node = _Node()
+    streamer = VelocityStreamer(node, _Publisher(), rate_hz=RATE_HZ, max_accel=10.0, max_yaw_accel=2.0,
+                                callback_group=object())
+
+    def run(seconds):
+        # The fake timer fires on an exact period
+        for _ in range(round(seconds * RATE_HZ)):
+            clock.now += node.period
+            node.tick()
+
+    streamer.run = run
+    return streamer
+
+
+@pytest.mark.parametrize("amount, speed, accel", [(20.0, 5.0, 10.0), (1.0, 5.0, 10.0), (1.57, 0.5, 2.0)])
+def test_ramp_plan_covers_the_amount(amount, speed, accel):
+    peak, hold = ramp_plan(amount, speed, accel)
+    # The ramp up ends peak / accel into the hold, and the ramp down is as long
+    # after it, so the trapezoid has the area of the held step
+    assert peak <= speed
+    assert hold >= peak / accel
+    assert peak * hold == pytest.approx(amount)
+
+
+@pytest.mark.parametrize("motion, axis, expected", [
+    ({"distance": 20.0, "speed": 5.0}, 0, 20.0),
+    ({"distance": -10.0, "speed": 5.0, "lateral": True}, 1, -10.0),
+    ({"yaw": 1.57, "yaw_rate": 0.5}, 2, 1.57),
+])
+def test_motion_integrates_to_the_requested_amount(streamer, motion, axis, expected):
+    finished = streamer.run_motion(**motion)
+    streamer.run(10.0)
+    assert finished.is_set()
+    covered = integrate(streamer.samples)
+    assert covered[axis] == pytest.approx(expected, rel=0.01)
+    assert [abs(covered[other]) for other in range(3) if other != axis] == [0.0, 0.0]
+
+
+def test_watchdog_zeroes_a_command_that_is_not_refreshed(streamer):
+    streamer.set_target(x=3.0)
+    streamer.run(0.3)
+    assert streamer._current[0] == pytest.approx(3.0)
+    # command_timeout is 0.5s and nothing refreshes the command
+    streamer.run(1.0)
+    assert streamer._current == [0.0, 0.0, 0.0]
+    assert streamer.publisher.published[-1] == (0.0, 0.0, 0.0)
+
+
+def test_only_one_zero_is_published_at_rest(streamer):
+    finished = streamer.run_motion(distance=2.0, speed=5.0)
+    streamer.run(3.0)
+    assert finished.is_set()
+    published = streamer.publisher.published
+    assert published[-1] == (0.0, 0.0, 0.0)
+    assert published[-2] != (0.0, 0.0, 0.0)
+    count = len(published)
+    streamer.run(2.0)
+    assert len(published) == count
+    # A new command is published again, even a zero one
+    streamer.set_target()
+    streamer.run(1.0)
+    assert len(published) == count + 1
@@ -0,0 +1,201 @@
+"""
+Lightweight latency tracing for the voice-to-motion pipeline.
+
+Probes append (timestamp, kind, name, turn, duration, thread, args) tuples to
+a fixed-size ring buffer and cost a single attribute check while tracing is
+off, so they can stay in the audio hot path:
+
+    TRACER.enable()
+    TRACER.begin_turn()                      # speech onset
+    TRACER.turn_mark("first_audio_out")
+    with TRACER.span("send_tool_result"):
+        ...
+    TRACER.write("trace.json")               # Chrome trace; .jsonl for JSON lines
+
+Each turn records the chain in TURN_CHAIN once, so turn_summaries() can show
+where the time between speech onset and the model's tool call goes. The
+chain currently ends at tool_use: local_chat's processToolUse does not run
+actions yet, and the action executors run in the pubsub process, which has
+no turns. Once a tool call queues an action in this process, add
+action_dispatched and action_complete marks where the action is queued and
+where the executor finishes it, and extend TURN_CHAIN.
+Timestamps come from time.perf_counter_ns() and are monotonic.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Per-turn milestones, in the order they normally happen
+TURN_CHAIN = ("speech_onset", "first_audio_out", "tool_use")
+
+INSTANT = "i"
+COMPLETE = "X"
+
+
+class _NullSpan:
+    """Shared no-op context manager handed out while tracing is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        self.tracer._record(self.start, COMPLETE, self.name, end - self.start, self.args)
+        return False
+
+
+class Tracer:
+    """Ring-buffer recorder of instant events and timed spans, grouped into turns."""
+
+    def __init__(self, capacity=8192, enabled=False):
+        self.enabled = enabled
+        self.events = deque(maxlen=capacity)
+        self.origin_ns = time.perf_counter_ns()
+        self.turn = 0
+        self._turn_seen = set()
+
+    def enable(self, capacity=None):
+        if capacity is not None and capacity != self.events.maxlen:
+            self.events = deque(self.events, maxlen=capacity)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def _record(self, timestamp_ns, kind, name, duration_ns=0, args=None):
+        # deque.append is atomic, so probes from audio and ROS threads need no lock
+        self.events.append((timestamp_ns, kind, name, self.turn, duration_ns, threading.get_ident(), args))
+
+    def mark(self, name, **args):
+        """Record an instant event."""
+        if not self.enabled:
+            return
+        self._record(time.perf_counter_ns(), INSTANT, name, 0, args or None)
+
+    def span(self, name, **args):
+        """Context manager that records how long its block took."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args or None)
+
+    def record_span(self, name, start_ns, end_ns, **args):
+        """Record a span whose start and end were measured elsewhere."""
+        if not self.enabled:
+            return
+        self._record(start_ns, COMPLETE, name, end_ns - start_ns, args or None)
+
+    def begin_turn(self, **args):
+        """Start a new turn at speech onset."""
+        if not self.enabled:
+            return
+        self.turn += 1
+        self._turn_seen = {"speech_onset"}
+        self._record(time.perf_counter_ns(), INSTANT, "speech_onset", 0, args or None)
+
+    def turn_mark(self, name, **args):
+        """Record a chain milestone the first time it happens in the current turn."""
+        if not self.enabled or name in self._turn_seen:
+            return
+        self._turn_seen.add(name)
+        self._record(time.perf_counter_ns(), INSTANT, name, 0, args or None)
+
+    def clear(self):
+        self.events.clear()
+        self.turn = 0
+        self._turn_seen = set()
+
+    def turn_summaries(self):
+        """Milliseconds from speech onset to each chain milestone, per turn."""
+        onsets = {}
+        summaries = {}
+        for timestamp_ns, kind, name, turn, _, _, _ in list(self.events):
+            if kind != INSTANT or name not in TURN_CHAIN or turn == 0:
+                continue
+            if name == "speech_onset":
+                onsets[turn] = timestamp_ns
+            if turn in onsets:
+                summaries.setdefault(turn, {})[name] = (timestamp_ns - onsets[turn]) / 1e6
+        return [dict(turn=turn, **summaries[turn]) for turn in sorted(summaries)]
+
+    def print_summary(self):
+        turns = self.turn_summaries()
+        if not turns:
+            print("No traced turns")
+            return
+        print("Turn latency from speech onset (ms):")
+        print(f"{'turn':>5} " + " ".join(f"{name:>18}" for name in TURN_CHAIN[1:]))
+        for summary in turns:
+            cells = []
+            for name in TURN_CHAIN[1:]:
+                value = summary.get(name)
+                cells.append(f"{value:>18.1f}" if value is not None else f"{'-':>18}")
+            print(f"{summary['turn']:>5} " + " ".join(cells))
+
+    def to_jsonl(self):
+        """Yield one JSON line per event, timestamps in ms from the tracer origin."""
+        for timestamp_ns, kind, name, turn, duration_ns, thread, args in list(self.events):
+            record = {
+                "t_ms": round((timestamp_ns - self.origin_ns) / 1e6, 3),
+                "type": "span" if kind == COMPLETE else "mark",
+                "name": name,
+                "turn": turn,
+                "thread": thread,
+            }
+            if kind == COMPLETE:
+                record["duration_ms"] = round(duration_ns / 1e6, 3)
+            if args:
+                record["args"] = args
+            yield json.dumps(record, default=str)
+
+    def to_chrome_trace(self):
+        """Return the events in Chrome trace format, for chrome://tracing or Perfetto."""
+        pid = os.getpid()
+        trace_events = []
+        for timestamp_ns, kind, name, turn, duration_ns, thread, args in list(self.events):
+            event = {
+                "name": name,
+                "ph": kind,
+                "ts": (timestamp_ns - self.origin_ns) / 1000.0,
+                "pid": pid,
+                "tid": thread,
+                "args": dict(args or {}, turn=turn),
+            }
+            if kind == COMPLETE:
+                event["dur"] = duration_ns / 1000.0
+            else:
+                event["s"] = "p"
+            trace_events.append(event)
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def write(self, path):
+        """Export to path: Chrome trace for .json, JSON lines otherwise."""
+        with open(path, "w", encoding="utf-8") as file:
+            if path.endswith(".json"):
+                json.dump(self.to_chrome_trace(), file, default=str)
+            else:
+                for line in self.to_jsonl():
+                    file.write(line + "\n")
+
+
+# Process-wide tracer used by local_chat and voice_bench
+TRACER = Tracer()
@@ -0,0 +1,260 @@
+"""
+Fixed-rate velocity streaming for PuppyPi locomotion.
+
+The gait node keeps walking at the last Velocity it received, so a single
+dropped message or a gait node restart leaves the dog stopped or running
+on. VelocityStreamer instead republishes the commanded velocity on a ROS
+timer, ramps between velocities at a bounded acceleration, and zeroes the
+target when commands stop being refreshed. Once at rest it publishes a
+single zero and then stays quiet, so teleop or an action group can drive
+the gait node until the next command:
+
+    settings, motions = load_velocity_settings()
+    streamer = VelocityStreamer(node, RobotPublishers(node).velocity, **settings)
+    finished = streamer.run_motion(distance=20.0, speed=5.0)
+    finished.wait()
+
+Velocities are in the units of puppy_control_msgs/Velocity: x and y as the
+gait node expects them, yaw_rate in rad/s. Motions are planned as
+trapezoidal profiles so the dog covers the requested distance or turns the
+requested yaw including the ramps.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+# ROS is imported where it is used, so the streamer runs off-robot against a fake node
+from motion_blend import integrate, load_velocity_settings, ramp_plan
+
+logger = logging.getLogger(__name__)
+
+
+class VelocityStreamer:
+    """Publishes a ramped velocity at rate_hz until the command goes stale.
+
+    publisher is a ros_publishers.ReusedPublisher, or anything with its
+    publish(**fields).
+    """
+
+    def __init__(self, node, publisher, rate_hz=20.0, max_accel=10.0, max_yaw_accel=2.0,
+                 command_timeout=0.5, blend=True, history=2048, callback_group=None):
+        self.node = node
+        self.publisher = publisher
+        self.period = 1.0 / rate_hz
+        self.max_accel = max_accel
+        self.max_yaw_accel = max_yaw_accel
+        self.command_timeout = command_timeout
+        self.blend = blend
+        self._lock = threading.Lock()
+        self._target = (0.0, 0.0, 0.0)
+        self._expires_at = 0.0
+        self._current = [0.0, 0.0, 0.0]
+        self._finished = None
+        self._profile = None
+        self._profile_start = 0.0
+        self._stale_logged = True
+        self._last_tick = None
+        # Set once the zero at rest has been published; cleared by any new command
+        self._resting = False
+        # (monotonic time, x, y, yaw_rate) of every published message
+        self.samples = deque(maxlen=history)
+        if callback_group is None:
+            from rclpy.callback_groups import MutuallyExclusiveCallbackGroup
+
+            callback_group = MutuallyExclusiveCallbackGroup()
+        self.callback_group = callback_group
+        self.timer = node.create_timer(self.period, self._tick, callback_group=self.callback_group)
+
+    def set_target(self, x=0.0, y=0.0, yaw_rate=0.0, hold=None):
+        """Command a velocity, fresh for hold seconds or command_timeout if omitted."""
+        with self._lock:
+            self._set_target_locked(x, y, yaw_rate, hold)
+
+    def _set_target_locked(self, x, y, yaw_rate, hold):
+        self._profile = None
+        self._resting = False
+        self._target = (float(x), float(y), float(yaw_rate))
+        self._expires_at = time.monotonic() + (self.command_timeout if hold is None else hold)
+        # A planned hold ending is normal; only a missed refresh is worth a warning
+        self._stale_logged = hold is not None
+
+    def run_motion(self, distance=0.0, speed=5.0, yaw=0.0, yaw_rate=0.5, lateral=False):
+        """Move distance (along y if lateral) and/or turn yaw radians.
+
+        Returns a threading.Event set once the dog has ramped back to zero.
+        A combined move and turn spreads the turn over the move's duration.
+        """
+        peak, hold = ramp_plan(distance, speed, self.max_accel)
+        ramp_down = peak / self.max_accel
+        yaw_peak = 0.0
+        if yaw:
+            if distance:
+                # Turn while moving: constant yaw rate over the whole move
+                yaw_peak = abs(yaw) / (hold + ramp_down) if hold else 0.0
+            else:
+                yaw_peak, hold = ramp_plan(yaw, yaw_rate, self.max_yaw_accel)
+                ramp_down = yaw_peak / self.max_yaw_accel
+        linear = math.copysign(peak, distance) if distance else 0.0
+        turn = math.copysign(yaw_peak, yaw) if yaw else 0.0
+
+        x, y = (0.0, linear) if lateral else (linear, 0.0)
+        finished = threading.Event()
+        with self._lock:
+            # A new motion supersedes the previous one
+            if self._finished is not None:
+                self._finished.set()
+            self._finished = finished
+            self._set_target_locked(x, y, turn, max(hold, 0.0))
+        logger.info("Motion distance=%.2f yaw=%.2f: peak %.2f, yaw rate %.2f, %.2fs",
+                    distance, yaw, linear, turn, hold + ramp_down)
+        return finished
+
+    def run_profile(self, profile):
+        """Play a motion_blend.VelocityProfile; returns an Event set once it has finished."""
+        finished = threading.Event()
+        with self._lock:
+            if self._finished is not None:
+                self._finished.set()
+            self._finished = finished
+            self._profile = profile
+            self._profile_start = time.monotonic()
+            self._stale_logged = True
+            self._resting = False
+        logger.info("Blended motion %s: %.2fs", ", ".join(profile.names), profile.duration)
+        return finished
+
+    def stop(self):
+        """Ramp to zero; run_motion's Event is set when the dog is at rest."""
+        with self._lock:
+            self._profile = None
+            self._target = (0.0, 0.0, 0.0)
+            self._expires_at = 0.0
+            self._stale_logged = True
+
+    def halt(self):
+        """Zero velocity immediately, without a ramp."""
+        with self._lock:
+            self._profile = None
+            self._target = (0.0, 0.0, 0.0)
+            self._expires_at = 0.0
+            self._current = [0.0, 0.0, 0.0]
+            self._stale_logged = True
+            self._resting = True
+        self._publish(time.monotonic())
+
+    def _tick(self):
+        now = time.monotonic()
+        dt = self.period if self._last_tick is None else min(now - self._last_tick, 4 * self.period)
+        self._last_tick = now
+        with self._lock:
+            if self._profile is not None:
+                elapsed = now - self._profile_start
+                if elapsed < self._profile.duration:
+                    # The profile is already acceleration-limited; follow it exactly
+                    self._target = self._profile.value_at(elapsed)
+                    self._current = list(self._target)
+                    self._expires_at = now + self.command_timeout
+                else:
+                    self._profile = None
+                    self._target = (0.0, 0.0, 0.0)
+                    self._expires_at = 0.0
+            if now > self._expires_at:
+                # Watchdog: a lapsed command decays to zero instead of running on
+                if not self._stale_logged and any(self._target):
+                    logger.warning("Velocity command went stale, stopping")
+                self._stale_logged = True
+                self._target = (0.0, 0.0, 0.0)
+            limits = (self.max_accel * dt, self.max_accel * dt, self.max_yaw_accel * dt)
+            for axis in range(3):
+                delta = self._target[axis] - self._current[axis]
+                self._current[axis] += max(-limits[axis], min(limits[axis], delta))
+            at_rest = self._profile is None and not any(self._target) and not any(self._current)
+            finished = self._finished if at_rest else None
+            if finished is not None:
+                self._finished = None
+            # Publish the first zero at rest, then leave the topic to other sources
+            silent = at_rest and self._resting
+            self._resting = at_rest
+        if not silent:
+            self._publish(now)
+        if finished is not None:
+            finished.set()
+
+    def _publish(self, now):
+        x, y, yaw_rate = self._current
+        # The publisher refills one reused message, so each tick only assigns three floats
+        self.publisher.publish(x=x, y=y, yaw_rate=yaw_rate)
+        self.samples.append((now, x, y, yaw_rate))
+
+    def destroy(self):
+        self.halt()
+        self.node.destroy_timer(self.timer)
+
+
+class VelocityRecorder:
+    """Subscribes to a Velocity topic and keeps (receive time, x, y, yaw_rate) samples."""
+
+    def __init__(self, node, topic, qos=None):
+        from puppy_control_msgs.msg import Velocity
+        from ros_publishers import VELOCITY_QOS
+
+        qos = VELOCITY_QOS if qos is None else qos
+        self.samples = []
+        self.subscription = node.create_subscription(Velocity, topic, self._on_velocity, qos)
+
+    def _on_velocity(self, msg):
+        self.samples.append((time.monotonic(), msg.x, msg.y, msg.yaw_rate))
+
+
+def main():
+    """Run a motion and compare the recorded topic with what was commanded."""
+    import argparse
+
+    import rclpy
+    from rclpy.executors import MultiThreadedExecutor
+    from rclpy.node import Node
+    from puppy_control_msgs.msg import Velocity
+    from ros_publishers import VELOCITY_QOS, ReusedPublisher
+
+    parser = argparse.ArgumentParser(description="Check the velocity streamer against the recorded topic")
+    parser.add_argument("--distance", type=float, default=20.0)
+    parser.add_argument("--speed", type=float, default=5.0)
+    parser.add_argument("--yaw", type=float, default=0.0, help="Radians to turn")
+    parser.add_argument("--topic", default="/puppy_control/velocity_check",
+                        help="Topic to stream on; use /puppy_control/velocity to drive the robot")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    settings, _ = load_velocity_settings()
+    rclpy.init()
+    node = Node("velocity_streamer_check")
+    streamer = VelocityStreamer(node, ReusedPublisher(node, Velocity, args.topic, VELOCITY_QOS), **settings)
+    recorder = VelocityRecorder(node, args.topic)
+    executor = MultiThreadedExecutor(num_threads=2)
+    executor.add_node(node)
+    spin_thread = threading.Thread(target=executor.spin, daemon=True)
+    spin_thread.start()
+    try:
+        time.sleep(0.5)  # let the subscription match
+        finished = streamer.run_motion(distance=args.distance, speed=args.speed, yaw=args.yaw)
+        finished.wait()
+        time.sleep(0.2)
+        published = integrate(streamer.samples)
+        received = integrate(recorder.samples)
+        print(f"Commanded   distance {args.distance:.2f} yaw {args.yaw:.3f}")
+        print(f"Published   distance {published[0] + published[1]:.2f} yaw {published[2]:.3f} "
+              f"({len(streamer.samples)} messages)")
+        print(f"Received    distance {received[0] + received[1]:.2f} yaw {received[2]:.3f} "
+              f"({len(recorder.samples)} messages)")
+    finally:
+        streamer.destroy()
+        executor.shutdown()
+        node.destroy_node()
+        rclpy.shutdown()
+
+
+if __name__ == "__main__":
+    main()
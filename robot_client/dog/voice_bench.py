@@ -0,0 +1,339 @@
+"""
+Benchmarks for the local_chat voice pipeline, run against the in-process fake
+Bedrock stream so no sound card or AWS credentials are needed.
+
+    python voice_bench.py handoff --mode error --fail-after 2 --handoffs 3
+    python voice_bench.py handoff --mode expiry --session-age 2 --handoffs 3
+    python voice_bench.py load --sessions 1,10,50,100 --seconds 10
+    python voice_bench.py resample --seconds 10 --arm-factor 6
+    python voice_bench.py trace --turns 3 --output trace.json
+"""
+
+import argparse
+import asyncio
+import math
+import statistics
+import sys
+import time
+
+import local_chat
+from audio_io import MemoryBackend, make_converter
+from fake_bedrock import FAKE_SDK, FakeBedrockClient
+from tracing import TRACER
+from local_chat import (
+    CHANNELS,
+    CHUNK_SIZE,
+    INPUT_SAMPLE_RATE,
+    OUTPUT_SAMPLE_RATE,
+    AudioStreamer,
+    BedrockStreamManager,
+    SessionSupervisor,
+)
+
+
+def _percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _summary(values, unit="ms", scale=1000.0):
+    if not values:
+        return "n/a"
+    return (
+        f"min {min(values) * scale:.1f}{unit}  "
+        f"median {statistics.median(values) * scale:.1f}{unit}  "
+        f"max {max(values) * scale:.1f}{unit}"
+    )
+
+
+async def bench_handoff(args):
+    """Feed real-time microphone frames through repeated session handoffs."""
+    client = FakeBedrockClient(
+        handshake_delay=args.handshake_delay,
+        fail_after=args.fail_after if args.mode == "error" else None,
+    )
+
+    def create_stream_manager(history=None):
+        return BedrockStreamManager(init_event_delay=0, history=history, client=client, sdk=FAKE_SDK)
+
+    manager = create_stream_manager()
+    await manager.initialize_stream()
+    streamer = AudioStreamer(manager, open_devices=False)
+    await manager.send_audio_content_start_event()
+    streamer.is_streaming = True
+
+    supervisor = SessionSupervisor(
+        create_stream_manager,
+        streamer,
+        renew=args.mode == "expiry",
+        max_session_age=args.session_age,
+        renew_margin=0.0,
+        check_interval=0.01,
+    )
+    supervisor_task = asyncio.create_task(supervisor.run())
+
+    # Pace frames like a microphone callback would
+    frame = bytes(CHUNK_SIZE * 2)
+    period = CHUNK_SIZE / INPUT_SAMPLE_RATE
+    frames_sent = 0
+    next_frame_at = time.monotonic()
+    while len(supervisor.handoffs) < args.handoffs:
+        await streamer.process_input_audio(frame)
+        frames_sent += 1
+        next_frame_at += period
+        await asyncio.sleep(max(0.0, next_frame_at - time.monotonic()))
+
+    # Let queued frames drain before counting what the endpoint received
+    await asyncio.sleep(0.2)
+    streamer.is_streaming = False
+    supervisor_task.cancel()
+    await asyncio.gather(supervisor_task, return_exceptions=True)
+    await streamer.stream_manager.close()
+
+    frames_received = client.audio_chunks_received()
+    print(f"Handoff benchmark ({args.mode}), {len(supervisor.handoffs)} handoffs")
+    for record in supervisor.handoffs:
+        print(
+            f"  prepare {record['prepare_seconds'] * 1000:7.1f}ms  "
+            f"stream gap {record['stream_gap_seconds'] * 1000:7.1f}ms  "
+            f"held {record['held_seconds'] * 1000:7.1f}ms  "
+            f"frames replayed {record['frames_flushed']}"
+        )
+    print(f"  audio gap at endpoint: {_summary(client.audio_gaps())}")
+    print(f"  frames sent {frames_sent}, received {frames_received}, "
+          f"dropped {streamer.frames_dropped}")
+
+
+async def _run_load_session(client, seconds):
+    """One headless voice session fed with silence at microphone pace."""
+    backend = MemoryBackend(input_audio=bytes(int(seconds * INPUT_SAMPLE_RATE) * CHANNELS * 2))
+    manager = BedrockStreamManager(init_event_delay=0, client=client, sdk=FAKE_SDK)
+    await manager.initialize_stream()
+    streamer = AudioStreamer(manager, backend=backend)
+
+    async def until():
+        # Poll rather than park an executor thread that playback writes need
+        while not backend.input_done.is_set():
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.5)
+
+    await streamer.start_streaming(until=until)
+    return manager.stream_response, backend
+
+
+async def _measure_loop_lag(lags, interval=0.01):
+    """Record how late the event loop wakes a periodic timer."""
+    while True:
+        expected = time.monotonic() + interval
+        await asyncio.sleep(interval)
+        lags.append(time.monotonic() - expected)
+
+
+async def bench_load_level(sessions, args):
+    client = FakeBedrockClient(
+        handshake_delay=args.handshake_delay,
+        reply_every=args.reply_every,
+        reply_bytes=args.reply_bytes,
+    )
+    lags = []
+    lag_task = asyncio.create_task(_measure_loop_lag(lags))
+    wall_start = time.monotonic()
+    cpu_start = time.process_time()
+    sessions_run = await asyncio.gather(*(_run_load_session(client, args.seconds) for _ in range(sessions)))
+    cpu = time.process_time() - cpu_start
+    wall = time.monotonic() - wall_start
+    lag_task.cancel()
+    await asyncio.gather(lag_task, return_exceptions=True)
+
+    # Each reply is written in CHUNK_SIZE slices; its latency is the first slice's write time
+    writes_per_reply = math.ceil(args.reply_bytes / CHUNK_SIZE)
+    reply_latencies = []
+    for stream, backend in sessions_run:
+        first_writes = [at for at, _ in backend.output_chunks][::writes_per_reply]
+        reply_latencies.extend(w - s for s, w in zip(stream.replies_sent_at, first_writes))
+
+    frames_expected = sessions * math.ceil(args.seconds * INPUT_SAMPLE_RATE / CHUNK_SIZE)
+    return {
+        "sessions": sessions,
+        "cpu_percent": 100.0 * cpu / wall,
+        "cpu_ms_per_session_second": 1000.0 * cpu / (sessions * args.seconds),
+        "loop_lag_p99": _percentile(lags, 99),
+        "reply_latency_p50": _percentile(reply_latencies, 50),
+        "reply_latency_p99": _percentile(reply_latencies, 99),
+        "frames_lost": frames_expected - client.audio_chunks_received(),
+    }
+
+
+async def bench_load(args):
+    """Run concurrent voice sessions against the fake endpoint at increasing counts."""
+    levels = [int(level) for level in args.sessions.split(",")]
+    frame_period = CHUNK_SIZE / INPUT_SAMPLE_RATE
+    print(f"Load test: {args.seconds:.0f}s of audio per session, reply every {args.reply_every} chunks")
+    print(f"{'sessions':>8} {'cpu%':>7} {'cpu ms/s':>9} {'lag p99':>9} {'reply p50':>10} {'reply p99':>10} {'lost':>6}")
+    for level in levels:
+        result = await bench_load_level(level, args)
+        print(
+            f"{result['sessions']:>8} {result['cpu_percent']:>7.1f} "
+            f"{result['cpu_ms_per_session_second']:>9.2f} "
+            f"{result['loop_lag_p99'] * 1000:>7.1f}ms "
+            f"{result['reply_latency_p50'] * 1000:>8.1f}ms "
+            f"{result['reply_latency_p99'] * 1000:>8.1f}ms "
+            f"{result['frames_lost']:>6}"
+        )
+        if result["loop_lag_p99"] > frame_period:
+            print(f"  event loop lag exceeds one {frame_period * 1000:.0f}ms frame; gateway is saturated")
+
+
+# (device rate, device channels, direction) pairs seen on robot boards
+RESAMPLE_CASES = [
+    (48000, 2, "input"),
+    (48000, 1, "input"),
+    (44100, 1, "input"),
+    (48000, 2, "output"),
+    (44100, 1, "output"),
+    (48000, 1, "output"),
+]
+
+
+def bench_resample(args):
+    """CPU time spent converting one second of audio, per device format."""
+    import numpy as np
+    print(f"Resample benchmark: {args.seconds:.0f}s of audio per case, converted in mic-sized blocks")
+    print(f"{'direction':>9} {'device':>14} {'cpu ms/s':>9} {'ARM est.':>9} {'latency':>8}")
+    for rate, channels, direction in RESAMPLE_CASES:
+        if direction == "input":
+            source_rate, source_channels = rate, channels
+            converter = make_converter(rate, channels, INPUT_SAMPLE_RATE, CHANNELS)
+            block_frames = CHUNK_SIZE * rate // INPUT_SAMPLE_RATE
+        else:
+            source_rate, source_channels = OUTPUT_SAMPLE_RATE, CHANNELS
+            converter = make_converter(OUTPUT_SAMPLE_RATE, CHANNELS, rate, channels)
+            block_frames = CHUNK_SIZE // 2
+        t = np.arange(int(args.seconds * source_rate)) / source_rate
+        tone = (8000 * np.sin(2 * np.pi * 440 * t)).astype("<i2")
+        pcm = np.repeat(tone[:, None], source_channels, axis=1).tobytes()
+        block_bytes = block_frames * source_channels * 2
+
+        cpu_start = time.process_time()
+        for offset in range(0, len(pcm), block_bytes):
+            converter.process(pcm[offset:offset + block_bytes])
+        cpu_ms = 1000.0 * (time.process_time() - cpu_start) / args.seconds
+
+        # Filter group delay: half the taps, counted at the source rate
+        latency_ms = 1000.0 * converter.resampler.taps / 2 / source_rate
+        arm_ms = cpu_ms * args.arm_factor
+        print(
+            f"{direction:>9} {rate:>8} Hz x{channels} {cpu_ms:>9.2f} {arm_ms:>9.2f} {latency_ms:>6.2f}ms"
+            + ("  over budget" if arm_ms > args.budget_ms else "")
+        )
+    print(f"ARM estimate = host cpu x {args.arm_factor:g}; budget {args.budget_ms:g} ms of CPU per second of audio")
+
+
+def _spoken_turns(turns, speech_chunks, pause_chunks):
+    """Microphone audio of turns loud bursts, each after a pause, in whole chunks."""
+    loud = (int(8000).to_bytes(2, "little", signed=True) + bytes(2)) * (speech_chunks * CHUNK_SIZE // 2)
+    pause = bytes(pause_chunks * CHUNK_SIZE * 2)
+    return (pause + loud) * turns + pause
+
+
+def bench_probe_cost(iterations=200000):
+    """Per-call cost of the old stack walk, and of tracing probes when off and on."""
+    def cost(function, iterations=iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        return (time.perf_counter() - start) / iterations * 1e9
+
+    import inspect
+    was_enabled = TRACER.enabled
+    TRACER.disable()
+    results = {"disabled mark": cost(lambda: TRACER.turn_mark("probe"))}
+    TRACER.enable()
+    results["enabled mark"] = cost(lambda: TRACER.mark("probe"))
+    TRACER.clear()
+    TRACER.enabled = was_enabled
+    # What debug_print paid per call before, twice over for time_it callers
+    results["inspect.stack()[1]"] = cost(lambda: inspect.stack()[1].function, iterations=200)
+    results["sys._getframe(1)"] = cost(lambda: sys._getframe(1).f_code.co_name)
+    return results
+
+
+async def bench_trace(args):
+    """Run scripted spoken turns with a tool call each and report the per-turn chain."""
+    # Reply as each burst ends, and call a tool with every reply
+    speech_chunks = math.ceil(args.speech_seconds * INPUT_SAMPLE_RATE / CHUNK_SIZE)
+    pause_chunks = math.ceil(args.pause_seconds * INPUT_SAMPLE_RATE / CHUNK_SIZE)
+    client = FakeBedrockClient(
+        handshake_delay=args.handshake_delay, reply_every=speech_chunks + pause_chunks, tool_name="wave",
+    )
+    backend = MemoryBackend(input_audio=_spoken_turns(args.turns, speech_chunks, pause_chunks))
+    TRACER.enable()
+    manager = BedrockStreamManager(init_event_delay=0, client=client, sdk=FAKE_SDK)
+    await manager.initialize_stream()
+    streamer = AudioStreamer(manager, backend=backend)
+
+    async def until():
+        while not backend.input_done.is_set():
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.5)
+
+    await streamer.start_streaming(until=until)
+    TRACER.print_summary()
+    if args.output:
+        TRACER.write(args.output)
+        print(f"Trace written to {args.output}")
+
+    print("Probe cost per call:")
+    for name, nanoseconds in bench_probe_cost().items():
+        print(f"  {name:<20} {nanoseconds:>10.0f}ns")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="local_chat voice pipeline benchmarks")
+    parser.add_argument("--debug", action="store_true", help="Enable local_chat debug output")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    handoff = subparsers.add_parser("handoff", help="Measure the audio gap of session handoffs")
+    handoff.add_argument("--mode", choices=["error", "expiry"], default="error")
+    handoff.add_argument("--handoffs", type=int, default=3)
+    handoff.add_argument("--fail-after", type=float, default=2.0, help="Seconds until each fake stream fails")
+    handoff.add_argument("--session-age", type=float, default=2.0, help="Session age that triggers renewal")
+    handoff.add_argument("--handshake-delay", type=float, default=0.2, help="Fake stream open latency")
+
+    load = subparsers.add_parser("load", help="Run concurrent sessions to size an edge gateway")
+    load.add_argument("--sessions", default="1,10,50,100", help="Comma-separated session counts")
+    load.add_argument("--seconds", type=float, default=10.0, help="Seconds of audio per session")
+    load.add_argument("--reply-every", type=int, default=5, help="Audio chunks per fake audio reply")
+    load.add_argument("--reply-bytes", type=int, default=3200, help="Bytes per fake audio reply")
+    load.add_argument("--handshake-delay", type=float, default=0.05, help="Fake stream open latency")
+
+    resample = subparsers.add_parser("resample", help="Measure the CPU cost of in-process audio conversion")
+    resample.add_argument("--seconds", type=float, default=10.0, help="Seconds of audio per case")
+    resample.add_argument("--arm-factor", type=float, default=6.0,
+                          help="Slowdown of the target ARM core relative to this host")
+    resample.add_argument("--budget-ms", type=float, default=50.0,
+                          help="CPU ms per second of audio allowed per direction (5%% of a core)")
+
+    trace = subparsers.add_parser("trace", help="Trace the speech-to-action chain of scripted turns")
+    trace.add_argument("--turns", type=int, default=3)
+    trace.add_argument("--speech-seconds", type=float, default=1.0, help="Length of each spoken burst")
+    trace.add_argument("--pause-seconds", type=float, default=1.5, help="Silence between bursts")
+    trace.add_argument("--handshake-delay", type=float, default=0.05, help="Fake stream open latency")
+    trace.add_argument("--output", help="Write the trace here (.json for Chrome trace, else JSON lines)")
+
+    args = parser.parse_args()
+    local_chat.DEBUG = args.debug
+    if args.command == "handoff":
+        asyncio.run(bench_handoff(args))
+    elif args.command == "load":
+        asyncio.run(bench_load(args))
+    elif args.command == "resample":
+        bench_resample(args)
+    elif args.command == "trace":
+        asyncio.run(bench_trace(args))
+
+
+if __name__ == "__main__":
+    main()
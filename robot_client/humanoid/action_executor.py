@@ -73,16 +73,46 @@ actions: Dict[str, Dict[str, Any]] = {
 # 空閒動作 (Idle action)
 idle_action: Dict[str, Any] = {"name": None, "sleep_time": 0}
 
+# Pause after each action and the average wait for the consumer's whole-second alignment
+ACTION_GAP = 0.5
+ALIGNMENT_WAIT = 0.5
+
+
+def sequence_seconds(names: list, blending: Optional[Dict[str, Any]] = None) -> float:
+    """Time the consumer takes to run names back to back, with or without blending."""
+    overlap = (blending or {}).get("overlap") or {}
+    enabled = bool((blending or {}).get("enabled"))
+    total = 0.0
+    for name, following in zip(names, names[1:] + [None]):
+        total += actions[name]["sleep_time"] + ALIGNMENT_WAIT + ACTION_GAP
+        if enabled and name in overlap and following in overlap:
+            # Chained: the tail overlaps the next action and the gap is skipped
+            total -= min(float(overlap[name]), actions[name]["sleep_time"]) + ALIGNMENT_WAIT + ACTION_GAP
+    return total
+
 
 class ActionExecutor:
 
     def __init__(
-        self, robot_name: str, simulator_endpoint: str, session_key: str
+        self,
+        robot_name: str,
+        simulator_endpoint: str,
+        session_key: str,
+        blending: Optional[Dict[str, Any]] = None,
     ) -> None:
-        """Initialize the ActionExecutor with a queue and a consumer thread."""
+        """Initialize the ActionExecutor with a queue and a consumer thread.
+
+        blending is the blending section of settings.yaml: when enabled, an
+        action listed under overlap that is followed by another listed action
+        returns overlap seconds early, so the next RunAction starts during its
+        tail instead of after a stop.
+        """
         self.robot_name = robot_name
         self.simulator_endpoint = simulator_endpoint
         self.session_key = session_key
+        self.blending = blending or {}
+        # Set while the previous action is still finishing its overlapped tail
+        self._chained = False
         self.logger = logging.getLogger(__name__)
         self.action_queue: queue.Queue = queue.Queue()
         self.current_action: Dict[str, Any] = idle_action.copy()
@@ -146,18 +176,33 @@ class ActionExecutor:
             self.logger.error("%s %s", log_error_msg, e)
             return None
 
-    def _execute_action(self, action_item: Dict[str, Any]) -> None:
-        """Execute a single action from the queue."""
+    def _overlap_with_next(self, action_name: str) -> float:
+        """Seconds of action_name's tail to overlap with the next queued action, if any."""
+        overlap = self.blending.get("overlap") or {}
+        if not self.blending.get("enabled") or action_name not in overlap:
+            return 0.0
+        with self.queue_lock:
+            pending = list(self.action_queue.queue)
+        if pending and pending[0]["name"] in overlap:
+            return min(float(overlap[action_name]), actions[action_name]["sleep_time"])
+        return 0.0
+
+    def _execute_action(self, action_item: Dict[str, Any]) -> bool:
+        """Execute a single action from the queue; True if the next action chains on."""
         action_name = action_item["name"]
         action = actions[action_name]
         self.current_action = {
             "name": action["name"],
             "sleep_time": action["sleep_time"],
         }
+        chained = False
         try:
-            self._run_action(action_name, action["action"][0], action["action"][1])
+            p1, p2 = action["action"][0], action["action"][1]
+            self._run_action(action_name, p1, p2)
+            overlap = self._overlap_with_next(action_name)
+            wait = action["sleep_time"] - overlap
             elapsed = 0.0
-            while elapsed < action["sleep_time"]:
+            while elapsed < wait:
                 if self._immediate_stop_event.is_set():
                     self.logger.info("Stopping action execution for %s", action_name)
                     self._immediate_stop_event.clear()
@@ -165,11 +210,14 @@ class ActionExecutor:
                     break
                 time.sleep(0.1)
                 elapsed += 0.1
+            else:
+                chained = overlap > 0
         except Exception as e:
             self.logger.error("Error executing action %s: %s", action_name, e)
         finally:
             self._remove_action_by_id(action_item["id"])
             self.current_action = idle_action.copy()
+        return chained
 
     def _remove_action_by_id(self, action_id: str) -> None:
         """Remove an action from the queue by its ID."""
@@ -196,15 +244,19 @@ class ActionExecutor:
                     self.clear_action_queue()
                     self.current_action = idle_action.copy()
                     self.is_running = False
+                    self._chained = False
                     self._immediate_stop_event.clear()
                     time.sleep(0.5)
                     continue
-                time.sleep(1 - time.time() % 1)
+                if not self._chained:
+                    time.sleep(1 - time.time() % 1)
                 action_item = self.action_queue.get(timeout=1)
                 self.is_running = True
-                self._execute_action(action_item)
-                time.sleep(0.5)
+                self._chained = self._execute_action(action_item)
+                if not self._chained:
+                    time.sleep(ACTION_GAP)
             except queue.Empty:
+                self._chained = False
                 self.is_running = False
                 time.sleep(0.5)
 
@@ -308,3 +360,26 @@ class ActionExecutor:
         except requests.exceptions.RequestException as e:
             self.logger.error("%s %s", log_error_msg, e)
             return None
+
+
+def main():
+    """Compare how long a sequence takes with and without blending."""
+    import argparse
+
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Sequence duration with and without blending")
+    parser.add_argument("actions", nargs="*", default=["go_forward", "turn_left", "go_forward"])
+    args = parser.parse_args()
+
+    with open("settings.yaml", "r", encoding="utf-8") as file:
+        blending = (yaml.safe_load(file) or {}).get("blending") or {}
+    before = sequence_seconds(args.actions)
+    after = sequence_seconds(args.actions, blending)
+    print(f"Sequence: {', '.join(args.actions)}")
+    print(f"  sequential  {before:6.2f}s")
+    print(f"  blended     {after:6.2f}s  ({100 * (1 - after / before):.0f}% shorter)")
+
+
+if __name__ == "__main__":
+    main()
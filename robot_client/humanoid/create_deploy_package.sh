@@ -6,4 +6,7 @@ ZIP_FILE="deploy_package.zip"
 # Create the zip file, excluding venv and __pycache__ directories
 zip -r $ZIP_FILE . -x "venv/*" -x "__pycache__/*"
 
+# Add the shared client core from ../common next to pubsub.py
+zip -j $ZIP_FILE ../common/*.py
+
 echo "Deployment package created: $ZIP_FILE"
\ No newline at end of file
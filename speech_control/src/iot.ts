@@ -3,6 +3,17 @@ import {
   PublishCommand,
 } from "@aws-sdk/client-iot-data-plane";
 
+// Every robot subscribes to fleet/all and to fleet/group/<name> for its groups
+export function robotTopic(target: string): string {
+  if (target === "all") {
+    return "fleet/all";
+  }
+  if (target.startsWith("group:")) {
+    return `fleet/group/${target.slice("group:".length)}`;
+  }
+  return `${target}/topic`;
+}
+
 export class IoTPublisher {
   private client: IoTDataPlaneClient;
 
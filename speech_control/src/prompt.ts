@@ -1,4 +1,4 @@
-import { IoTPublisher } from "./iot";
+import { IoTPublisher, robotTopic } from "./iot";
 import { Actions, toolList } from "./consts";
 import { ToolHandler } from "./services/tools";
 
@@ -57,14 +57,12 @@ export class ToolProcessor {
     console.log("Processing directionTool with toolName:", toolName);
     console.log("robots:", robots);
 
-    // If "all" is selected, send to all robots 1-9
-    let targetRobots = robots.includes("all")
-      ? Array.from({ length: 9 }, (_, i) => `robot_${i + 1}`)
-      : robots;
+    // If "all" is selected, one publish to the fleet topic reaches every robot
+    let targetRobots = robots.includes("all") ? ["all"] : robots;
     targetRobots.forEach((robotId) => {
       this.iotPublisher
         .publishToRobot(
-          `${robotId}/topic`,
+          robotTopic(robotId),
           JSON.stringify({ toolName: toolName })
         )
         .catch(console.error);
@@ -0,0 +1,69 @@
+"""
+Async AWS clients for the ASGI app (asgi.py), the aiobotocore counterpart
+of clients.py.
+
+    bedrock = await aio_clients.get("bedrock-runtime")
+    response = await bedrock.converse(...)
+
+Each client is created on first use and kept open until close(), which the
+ASGI app calls at shutdown. Clients belong to the event loop they were
+created on. Their connection pools hold ASYNC_MAX_CONNECTIONS connections,
+so that many requests can wait on the same service at once; botocore's
+default of 10 would queue the rest.
+"""
+
+import asyncio
+import contextlib
+
+import config
+import metrics
+
+_clients = {}
+_stack = None
+_lock = asyncio.Lock()
+
+
+def _client_kwargs(name):
+    from aiobotocore.config import AioConfig
+
+    options = {"region_name": config.AWS_BEDROCK_REGION} if name == "bedrock-runtime" else {}
+    return {
+        "config": AioConfig(
+            retries={"max_attempts": 3, "mode": "standard"},
+            max_pool_connections=config.ASYNC_MAX_CONNECTIONS,
+            **options,
+        )
+    }
+
+
+async def get(name):
+    """The shared async client for the service called name"""
+    global _stack
+    client = _clients.get(name)
+    if client is None:
+        async with _lock:
+            client = _clients.get(name)
+            if client is None:
+                from aiobotocore.session import get_session
+
+                if _stack is None:
+                    _stack = contextlib.AsyncExitStack()
+                client = await _stack.enter_async_context(
+                    get_session().create_client(name, **_client_kwargs(name))
+                )
+                _clients[name] = metrics.instrument(client)
+    return client
+
+
+async def warm(names):
+    await asyncio.gather(*(get(name) for name in names))
+
+
+async def close():
+    """Close every client; the next get() creates a new one"""
+    global _stack
+    async with _lock:
+        if _stack is not None:
+            await _stack.aclose()
+        _stack = None
+        _clients.clear()
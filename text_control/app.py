@@ -1,5 +1,6 @@
 try:
     import awsgi2
+    import config
     from config import DEBUG
     from flask import Flask
 
@@ -14,6 +15,7 @@ except ImportError as e:
 
     sys.exit(1)
 
+import metrics
 from errors import register_error_handlers
 
 # Import and register blueprints after app is created to avoid circular imports
@@ -27,6 +29,26 @@ app.register_blueprint(ui_bp)
 # Register error handlers
 register_error_handlers(app)
 
+# Time every request and the AWS calls it makes
+metrics.init_app(app)
+
+
+def warm_up(names):
+    """Build the named AWS clients, and what the routes build with them, before the first request"""
+    import clients
+    import database
+    from services.prompt_builder import system_prompt_template
+
+    names = None if "all" in names else names
+    clients.warm(names)
+    if names is None or "dynamodb" in names:
+        database.robot_table()
+    system_prompt_template()
+
+
+if config.WARM_CLIENTS:
+    warm_up(config.WARM_CLIENTS)
+
 
 def handler(event, context):
     """AWS Lambda handler for the Flask application"""
@@ -0,0 +1,106 @@
+"""
+ASGI entry point for running text_control under an async server:
+
+    pip install -r requirements-async.txt
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+POST /chat is served on the event loop (services/async_chat_service.py), so
+a chat waiting on Bedrock holds no worker and one process serves many chat
+sessions at once. Every other route is the Flask app from app.py, run on
+ASYNC_WSGI_WORKERS threads. Routes, request and response bodies are the
+same in both modes.
+
+The Lambda deployment keeps app.handler: a Lambda instance serves one
+request at a time, so it has no waiting requests to overlap.
+"""
+
+import json
+import uuid
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError as e:
+    print(f"Error importing required modules: {e}")
+    print(
+        "Please install the async dependencies with: pip install -r requirements-async.txt"
+    )
+    import sys
+
+    sys.exit(1)
+
+import aio_clients
+import config
+import metrics
+from app import app as flask_app
+from services import async_chat_service
+
+wsgi_app = WSGIMiddleware(flask_app, workers=config.ASYNC_WSGI_WORKERS)
+
+
+async def _read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+async def _send_json(send, data, status):
+    # As jsonify() writes it outside debug mode
+    body = flask_app.json.dumps(data, separators=(",", ":")).encode("utf-8") + b"\n"
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def chat(scope, receive, send):
+    """Handle chat requests with Nova Chatbot integration"""
+    try:
+        data = json.loads(await _read_body(receive))
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+    except ValueError as e:
+        await _send_json(send, {"error": f"Invalid JSON body: {e}"}, 400)
+        return
+    session_id = data.get("session_id", str(uuid.uuid4()))
+    started = metrics.start_request()
+    status = 500
+    try:
+        response_data, status = await async_chat_service.chat(
+            data.get("message"), data.get("robots"), session_id, data.get("mode")
+        )
+    except Exception as e:
+        metrics.count_error("exception", type(e).__name__)
+        raise
+    finally:
+        metrics.finish_request(started, "POST", "/chat", status)
+    await _send_json(send, response_data, status)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if config.WARM_CLIENTS:
+                names = ["bedrock-runtime", "iot-data"] if "all" in config.WARM_CLIENTS else config.WARM_CLIENTS
+                await aio_clients.warm([name for name in names if name != "dynamodb"])
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await aio_clients.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+    elif scope["type"] == "http" and scope["path"] == "/chat" and scope["method"] == "POST":
+        await chat(scope, receive, send)
+    else:
+        await wsgi_app(scope, receive, send)
@@ -0,0 +1,1095 @@
+"""
+Benchmarks for the text_control services, against moto's in-memory AWS.
+
+    python benchmark.py cache [--lookups 2000] [--latency-ms 8] [--unknown 0.1]
+
+    python benchmark.py list [--robots 100000] [--context-bytes 1000] [--segments 4 8]
+
+    python benchmark.py batch [--robots 500] [--latency-ms 10] [--unprocessed 0.2]
+
+    python benchmark.py conflicts [--operators 8] [--edits 25] [--latency-ms 5]
+
+    python benchmark.py coldstart [--runs 5]
+
+    python benchmark.py dispatch [--clients 4] [--actions 8] [--robots 3]
+
+    python benchmark.py metrics [--requests 5000]
+
+    python benchmark.py prompt [--turns 100] [--budget 4000] [--background-chars 4000]
+
+    python benchmark.py multichat [--robots 2 4 8] [--chats 5] [--bedrock-ms 800]
+
+    python benchmark.py chatload [--sessions 200] [--turns 5] [--bedrock-ms 800]
+
+cache replays the robot lookups /chat makes, cycling through robot_1..9
+with a share of IDs that have no record ("all" and groups are passed as
+the context robot too). Each DynamoDB request is delayed by --latency-ms
+to stand in for the network. It compares no cache, the TTL cache, and the
+TTL cache with version checks. It also writes a record behind the cache's
+back, as another Lambda instance would, and reports how soon each
+configuration serves the new version.
+
+list fills a table with --robots robots and lists them through GET
+/robots: the old single scan, the streamed full and summary views, the
+summary view with parallel segment scans, and paging with cursors. moto
+needs about two minutes per 100k-item scan, so list uses an in-memory
+stand-in for the table instead. It pages at 1 MB of item data like
+DynamoDB, applies projections after that limit, and splits segments by
+key hash. Every request costs --latency-ms plus the response size at
+--mbps, the part that projection and parallel segments save.
+
+batch provisions --robots robots through the API, once with one POST
+/robots each and then with POST /robots/batch, sequentially and with the
+configured number of concurrent chunk requests. It repeats the batch with
+--unprocessed of every write chunk handed back as UnprocessedItems, as a
+throttled table does, and reads the robots back with GET /robots/<id> and
+with POST /robots/batch/get. Each DynamoDB request costs --latency-ms.
+
+conflicts has --operators threads each make --edits read-modify-write
+edits to one robot: read it, add one to a counter, write it back. Before,
+PUT replaced the whole item, so concurrent edits were lost. Now PUT
+carries the version that was read, and an operator that gets a 409
+retries from the current robot in the response. The counter must end at
+operators x edits, and the run fails otherwise. DynamoDB applies each
+conditional write atomically, but moto's backend takes no lock, so the
+benchmark serializes moto's writes.
+
+coldstart starts a fresh interpreter per run and route, as a Lambda cold
+start does, and times importing app.py and serving the first request.
+AWS is a moto server in this process (pip install "moto[server]"), plus a
+canned Bedrock Converse reply, which moto lacks, so the interpreters under
+test never import moto themselves. With WARM_CLIENTS=all every client is
+built during import, which is what every cold start paid before clients
+were created lazily.
+
+dispatch has --clients threads each send --chats chat messages naming
+--actions actions for --robots robots, and times the /chat response and
+the point /jobs/<id> reports everything published. Before, /chat
+published to the robots one after another before responding. Bedrock
+answers after --bedrock-ms and each IoT publish costs --iot-ms.
+
+metrics times a cached GET /robots/<id> with and without the metrics
+middleware, which every request now goes through.
+
+prompt holds a --turns conversation with one robot through chat_service,
+against a Converse stand-in that models prompt caching. Cached prefixes
+cost --cached-ms-per-1k and the rest --ms-per-1k, on top of --base-ms.
+It compares sending the whole history, the token budget, and the budget
+with cachePoints. It reports the tokens sent and the tokens processed
+uncached at a few turns, and the latency.
+
+multichat sends /chat to 2, 4 and 8 robots with their own personas and
+waits until every robot's actions are published. Each persona plans
+different actions. It compares the shared mode, which makes one call with
+the first robot's persona, against per_robot mode. per_robot mode is run
+with one Bedrock call after another (each record read on its own), with
+CHAT_ROBOT_WORKERS, and with a worker per robot. Robot records are not
+cached between chats, so every chat reads them.
+
+chatload serves the app with uvicorn and runs --sessions chat sessions at
+once, each sending --turns messages to --robots robots. It compares the
+Flask app on --workers threads, as one process served it before, with
+asgi.py. Bedrock, IoT and DynamoDB are a stub that answers after
+--bedrock-ms and --iot-ms (5 ms for DynamoDB). It needs
+requirements-async.txt.
+
+Requires moto (pip install moto); it is not needed to run the app.
+"""
+
+import argparse
+import http.server
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import zlib
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("RobotTable", "robots-benchmark")
+
+try:
+    from moto import mock_aws
+except ImportError:
+    sys.exit("benchmark.py needs moto: pip install moto")
+
+ROBOT_IDS = [f"robot_{i}" for i in range(1, 10)]
+
+
+class _DynamoCalls:
+    """Counts DynamoDB requests and delays each one by the simulated latency."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.count = 0
+
+    def __call__(self, **kwargs):
+        self.count += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+def _setup(latency):
+    import boto3
+
+    boto3.resource("dynamodb").create_table(
+        TableName=os.environ["RobotTable"],
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    import database
+
+    calls = _DynamoCalls(latency)
+    database.robot_table().meta.client.meta.events.register("before-send.dynamodb", calls)
+    return database, calls
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _cache_case(label, cache, args, database, calls):
+    from services import database_service
+
+    database_service.robot_cache = cache
+    for robot_id in ROBOT_IDS:
+        database_service.upsert_robot(
+            robot_id, {"robot_name": robot_id, "context": "x" * args.context_bytes}
+        )
+    cache.invalidate()
+    every = max(1, round(1 / args.unknown)) if args.unknown else 0
+    lookups = [
+        "all" if every and n % every == 0 else ROBOT_IDS[n % len(ROBOT_IDS)]
+        for n in range(args.lookups)
+    ]
+    calls.count = 0
+    seconds = []
+    for robot_id in lookups:
+        started = time.perf_counter()
+        database_service.get_robot(robot_id)
+        seconds.append(time.perf_counter() - started)
+        time.sleep(args.interval)
+    requests = calls.count
+
+    # Another instance rewrites robot_1 directly in the table
+    changed = database.upsert_robot("robot_1", {"robot_name": "renamed", "context": ""})
+    started = time.monotonic()
+    while database_service.get_robot("robot_1")["version"] != changed["version"]:
+        if time.monotonic() - started > args.staleness_limit:
+            break
+        time.sleep(0.01)
+    stale_for = time.monotonic() - started
+    stale = (
+        f"{stale_for:5.2f}s" if stale_for <= args.staleness_limit else f">{args.staleness_limit:.0f}s (TTL)"
+    )
+    stats = cache.stats()
+    print(
+        f"  {label:<26} DynamoDB requests {requests:5d}  hit rate {stats['hit_rate']:6.1%}  "
+        f"p50 {1000 * statistics.median(seconds):6.3f} ms  p99 {1000 * _percentile(seconds, 0.99):6.3f} ms  "
+        f"other writer seen after {stale}"
+    )
+
+
+def bench_cache(args):
+    import config
+    from services.database_service import RobotCache
+
+    database, calls = _setup(args.latency_ms / 1000.0)
+    print(
+        f"{args.lookups} lookups, {args.unknown:.0%} unknown IDs, "
+        f"{args.latency_ms:.0f} ms per DynamoDB request"
+    )
+    cases = [
+        ("no cache", RobotCache(0, 0)),
+        ("TTL cache", RobotCache(config.ROBOT_CACHE_TTL, config.ROBOT_CACHE_NEGATIVE_TTL)),
+        (
+            f"TTL + version check {args.revalidate:g}s",
+            RobotCache(config.ROBOT_CACHE_TTL, config.ROBOT_CACHE_NEGATIVE_TTL, args.revalidate),
+        ),
+    ]
+    for label, cache in cases:
+        _cache_case(label, cache, args, database, calls)
+
+
+class _MemoryTable:
+    """Stand-in for the robot Table's scan, with DynamoDB's paging rules and a cost per request."""
+
+    PAGE_BYTES = 1024 * 1024
+
+    def __init__(self, items, latency, bytes_per_second):
+        self.items = sorted(items, key=lambda item: zlib.crc32(item["id"].encode()))
+        self.positions = {item["id"]: n for n, item in enumerate(self.items)}
+        self.latency = latency
+        self.bytes_per_second = bytes_per_second
+        self.requests = 0
+
+    @staticmethod
+    def _size(item):
+        return sum(len(name) + len(str(value)) for name, value in item.items())
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, ProjectionExpression=None,
+             ExpressionAttributeNames=None, Segment=None, TotalSegments=None):
+        self.requests += 1
+        start = self.positions[ExclusiveStartKey["id"]] + 1 if ExclusiveStartKey else 0
+        end = len(self.items)
+        if TotalSegments:
+            # Segments are contiguous hash ranges, as in DynamoDB
+            per_segment = -(-len(self.items) // TotalSegments)
+            start = max(start, Segment * per_segment)
+            end = min(end, (Segment + 1) * per_segment)
+        attributes = None
+        if ProjectionExpression:
+            names = ExpressionAttributeNames or {}
+            attributes = [names.get(name.strip(), name.strip()) for name in ProjectionExpression.split(",")]
+        page, read, position = [], 0, start
+        while position < end and read < self.PAGE_BYTES and (not Limit or len(page) < Limit):
+            item = self.items[position]
+            read += self._size(item)
+            page.append({k: item[k] for k in attributes if k in item} if attributes else dict(item))
+            position += 1
+        response = {"Items": page}
+        if position < end:
+            response["LastEvaluatedKey"] = {"id": self.items[position - 1]["id"]}
+        sent = len(json.dumps(page))
+        time.sleep(self.latency + sent / self.bytes_per_second)
+        return response
+
+
+def _legacy_list_robots(table):
+    """list_robots before pagination: one scan request, sorted"""
+    resp = table.scan()
+    items = resp.get("Items", [])
+    return sorted(items, key=lambda x: x.get("id", ""))
+
+
+def _timed_get(client, url):
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    chunks = iter(response.response)
+    body = [next(chunks, b"")]
+    first_byte = time.perf_counter() - started
+    body.extend(chunks)
+    response.close()
+    seconds = time.perf_counter() - started
+    body = b"".join(body)
+    return seconds, first_byte, len(body), len(json.loads(body)), response.status_code
+
+
+def bench_list(args):
+    import config
+    import database
+    from app import app
+
+    items = [
+        {
+            "id": f"robot_{n}",
+            "robot_name": f"Robot {n}",
+            "context": "x" * args.context_bytes,
+            "groups": [f"group_{n % 10}"],
+            "version": f"{n:032x}",
+        }
+        for n in range(args.robots)
+    ]
+    table = _MemoryTable(items, args.latency_ms / 1000.0, args.mbps * 1e6 / 8)
+    database.robot_table = lambda: table
+    client = app.test_client()
+    print(
+        f"{args.robots} robots with {args.context_bytes} B of context, "
+        f"{args.latency_ms:.0f} ms per request + {args.mbps:.0f} Mbit/s"
+    )
+
+    def report(label, seconds, first_byte, size, count):
+        print(
+            f"  {label:<34} robots {count:7d}  requests {table.requests:4d}  total {seconds:6.2f}s  "
+            f"first byte {first_byte:6.3f}s  response {size / 1e6:7.1f} MB"
+        )
+        table.requests = 0
+
+    started = time.perf_counter()
+    robots = _legacy_list_robots(table)
+    seconds = time.perf_counter() - started
+    report("single scan (before)", seconds, seconds, len(json.dumps(robots)), len(robots))
+
+    for label, view, segments in [("full, streamed", "full", 1), ("summary, streamed", "summary", 1)] + [
+        (f"summary, {n} segments", "summary", n) for n in args.segments
+    ]:
+        config.ROBOT_SCAN_SEGMENTS = segments
+        seconds, first_byte, size, count, status = _timed_get(client, f"/robots?view={view}")
+        assert status == 200, status
+        report(label, seconds, first_byte, size, count)
+    config.ROBOT_SCAN_SEGMENTS = 1
+
+    started = time.perf_counter()
+    count, size, cursor, first_byte = 0, 0, "", None
+    while True:
+        response = client.get(f"/robots?view=summary&limit={args.page}" + (f"&cursor={cursor}" if cursor else ""))
+        first_byte = first_byte or time.perf_counter() - started
+        page = response.get_json()
+        count += len(page["items"])
+        size += len(response.data)
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    report(f"summary, pages of {args.page}", time.perf_counter() - started, first_byte, size, count)
+
+
+class _Throttled:
+    """Wraps the DynamoDB resource and hands back a share of batch writes as unprocessed."""
+
+    def __init__(self, resource, fraction):
+        self.resource = resource
+        self.fraction = fraction
+        self.handed_back = 0
+
+    def batch_write_item(self, RequestItems):
+        ((table, requests),) = RequestItems.items()
+        kept, dropped = [], []
+        for request in requests:
+            (dropped if random.random() < self.fraction else kept).append(request)
+        response = self.resource.batch_write_item(RequestItems={table: kept}) if kept else {}
+        if dropped:
+            self.handed_back += len(dropped)
+            unprocessed = response.setdefault("UnprocessedItems", {}).setdefault(table, [])
+            unprocessed.extend(dropped)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.resource, name)
+
+
+def bench_batch(args):
+    import clients
+    import config
+    from app import app
+    from services import database_service
+
+    database, calls = _setup(args.latency_ms / 1000.0)
+    client = app.test_client()
+    robots = [
+        {"id": f"robot_{n}", "robot_name": f"Robot {n}", "context": "x" * 200, "groups": f"group_{n % 10}"}
+        for n in range(args.robots)
+    ]
+    ids = [robot["id"] for robot in robots]
+    print(f"{args.robots} robots, {args.latency_ms:.0f} ms per DynamoDB request")
+
+    def report(label, seconds, ok):
+        print(
+            f"  {label:<40} {args.robots / seconds:7.0f} robots/s  {seconds:6.2f}s  "
+            f"DynamoDB requests {calls.count:4d}  ok {ok}/{args.robots}"
+        )
+        calls.count = 0
+
+    def batch_put(label):
+        started = time.perf_counter()
+        body = client.post("/robots/batch", json={"put": robots}).get_json()
+        report(label, time.perf_counter() - started, body["succeeded"])
+
+    calls.count = 0
+    started = time.perf_counter()
+    ok = sum(client.post("/robots", json=robot).status_code == 201 for robot in robots)
+    report("POST /robots per robot (before)", time.perf_counter() - started, ok)
+
+    workers = config.ROBOT_BATCH_WORKERS
+    config.ROBOT_BATCH_WORKERS = 1
+    batch_put("POST /robots/batch, 1 chunk at a time")
+    config.ROBOT_BATCH_WORKERS = workers
+    batch_put(f"POST /robots/batch, {workers} chunks at a time")
+    throttled = _Throttled(clients.get("dynamodb"), args.unprocessed)
+    clients.override("dynamodb", throttled)
+    batch_put(f"  with {args.unprocessed:.0%} unprocessed")
+    print(f"    {throttled.handed_back} writes handed back and retried")
+    clients.override("dynamodb", throttled.resource)
+
+    database_service.robot_cache.invalidate()
+    started = time.perf_counter()
+    ok = sum(client.get(f"/robots/{robot_id}").status_code == 200 for robot_id in ids)
+    report("GET /robots/<id> per robot (before)", time.perf_counter() - started, ok)
+    database_service.robot_cache.invalidate()
+    started = time.perf_counter()
+    body = client.post("/robots/batch/get", json={"ids": ids}).get_json()
+    report("POST /robots/batch/get", time.perf_counter() - started, len(body["robots"]))
+
+
+def _serialize_moto_writes():
+    from moto.dynamodb.models import DynamoDBBackend
+
+    lock = threading.Lock()
+    for name in ("put_item", "update_item"):
+        write = getattr(DynamoDBBackend, name)
+
+        def locked(self, *args, _write=write, **kwargs):
+            with lock:
+                return _write(self, *args, **kwargs)
+
+        setattr(DynamoDBBackend, name, locked)
+
+
+def bench_conflicts(args):
+    from app import app
+    from services import database_service
+
+    _serialize_moto_writes()
+    database, calls = _setup(args.latency_ms / 1000.0)
+    client = app.test_client()
+    expected = args.operators * args.edits
+    print(
+        f"{args.operators} operators x {args.edits} edits of one robot, "
+        f"{args.latency_ms:.0f} ms per DynamoDB request"
+    )
+
+    def run(label, edit):
+        client.post("/robots", json={"id": "robot_1", "robot_name": "Robot 1", "context": "x" * 1000, "counter": 0})
+        conflicts = []
+        calls.count = 0
+
+        def operator():
+            conflicts.append(sum(edit() for _ in range(args.edits)))
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=operator) for _ in range(args.operators)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+        counter = int(database.get_robot("robot_1")["counter"])
+        print(
+            f"  {label:<32} counter {counter:4d}/{expected}  lost {expected - counter:4d}  "
+            f"409s {sum(conflicts):4d}  DynamoDB requests {calls.count:5d}  {seconds:5.2f}s"
+        )
+        return counter == expected
+
+    def full_rewrite():
+        # PUT before: the whole item, as read, with the change
+        robot = database_service.get_robot("robot_1")
+        robot["counter"] = int(robot["counter"]) + 1
+        database_service.upsert_robot("robot_1", robot)
+        database_service.robot_cache.invalidate("robot_1")
+        return 0
+
+    def conditional():
+        robot = client.get("/robots/robot_1").get_json()
+        retries = 0
+        while True:
+            response = client.put(
+                "/robots/robot_1", json={"counter": int(robot["counter"]) + 1, "version": robot["version"]}
+            )
+            if response.status_code != 409:
+                assert response.status_code == 200, response.status_code
+                return retries
+            retries += 1
+            robot = response.get_json()["current"]
+
+    run("full-item PUT (before)", full_rewrite)
+    ok = run("partial PUT with version", conditional)
+    raise SystemExit(0 if ok else 1)
+
+
+# Run in a fresh interpreter by coldstart: argv is method, path, JSON body
+_COLD_START = """
+import json, sys, time
+started = time.perf_counter()
+from app import app
+imported = time.perf_counter()
+method, path, body = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+client = app.test_client()
+response = client.open(path, method=method, json=body)
+done = time.perf_counter()
+print(json.dumps([imported - started, done - imported, response.status_code]))
+"""
+
+COLD_START_ROUTES = [
+    ("GET", "/", None),
+    ("GET", "/robots", None),
+    ("GET", "/robots/robot_1", None),
+    ("POST", "/run_action/robot_1", {"method": "StopAction", "action": "stop"}),
+    ("POST", "/chat", {"message": "dance", "robots": ["robot_1"]}),
+]
+
+
+class _StubAws(http.server.BaseHTTPRequestHandler):
+    """
+    Stand-in for the AWS calls the routes make, each answered after DELAYS
+    seconds: Bedrock Converse replies REPLY_TEXT, IoT publish succeeds and
+    DynamoDB GetItem finds a robot for any ID.
+    """
+
+    protocol_version = "HTTP/1.1"
+    DELAYS = {"bedrock": 0.0, "iot": 0.0, "dynamodb": 0.0}
+    REPLY_TEXT = "stop"
+
+    def _reply(self, body):
+        time.sleep(self.DELAYS[self.service])
+        body = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.startswith("/topics/"):
+            self.service = "iot"
+            self._reply({})
+        elif "DynamoDB" in self.headers.get("X-Amz-Target", ""):
+            self.service = "dynamodb"
+            robot_id = json.loads(request)["Key"]["id"]["S"]
+            item = {"id": robot_id, "robot_name": robot_id, "context": "", "version": "1"}
+            self._reply({"Item": {key: {"S": value} for key, value in item.items()}})
+        else:
+            self.service = "bedrock"
+            self._reply(
+                {
+                    "output": {"message": {"role": "assistant", "content": [{"text": self.REPLY_TEXT}]}},
+                    "stopReason": "end_turn",
+                    "usage": {"inputTokens": 1, "outputTokens": 1, "totalTokens": 2},
+                    "metrics": {"latencyMs": 1},
+                }
+            )
+
+    def log_message(self, *args):
+        pass
+
+
+def _stub_aws(**delays):
+    """Start a _StubAws server with the given delays in seconds; returns the server"""
+    handler = type("StubAws", (_StubAws,), {"DELAYS": {**_StubAws.DELAYS, **delays}})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler, bind_and_activate=False)
+    server.daemon_threads = True
+    # Every load test session connects at once
+    server.request_queue_size = 1024
+    server.server_bind()
+    server.server_activate()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_coldstart(args):
+    import boto3
+
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        sys.exit('coldstart needs the moto server: pip install "moto[server]"')
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    endpoint = f"http://{host}:{port}"
+    converse = _stub_aws()
+    boto3.client("dynamodb", endpoint_url=endpoint).create_table(
+        TableName=os.environ["RobotTable"],
+        KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    boto3.resource("dynamodb", endpoint_url=endpoint).Table(os.environ["RobotTable"]).put_item(
+        Item={"id": "robot_1", "robot_name": "Robot 1", "context": "", "version": "1"}
+    )
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(f"median of {args.runs} fresh interpreters per route")
+    print(f"  {'route':<26} {'clients':<8} {'import':>8} {'first request':>14} {'total':>8}")
+    try:
+        for method, path, body in COLD_START_ROUTES:
+            for warm in ("", "all"):
+                env = {
+                    **os.environ,
+                    "AWS_ENDPOINT_URL": endpoint,
+                    "AWS_ENDPOINT_URL_BEDROCK_RUNTIME": f"http://127.0.0.1:{converse.server_port}",
+                    "WARM_CLIENTS": warm,
+                }
+                runs = []
+                for _ in range(args.runs):
+                    out = subprocess.run(
+                        [sys.executable, "-c", _COLD_START, method, path, json.dumps(body)],
+                        cwd=here, env=env, capture_output=True, text=True, check=True,
+                    )
+                    runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+                imported = statistics.median(run[0] for run in runs) * 1000
+                first = statistics.median(run[1] for run in runs) * 1000
+                total = statistics.median(run[0] + run[1] for run in runs) * 1000
+                print(
+                    f"  {method + ' ' + path:<26} {'eager' if warm else 'lazy':<8} {imported:6.0f}ms "
+                    f"{first:12.0f}ms {total:6.0f}ms  ({runs[0][2]})"
+                )
+    finally:
+        converse.shutdown()
+        server.stop()
+
+
+def _stub_converse(client, reply, latency):
+    """Answer every Converse call on client with reply after latency seconds, without a request"""
+    from botocore.awsrequest import AWSResponse
+
+    def converse(model, **kwargs):
+        if model.name != "Converse":
+            return None
+        time.sleep(latency)
+        parsed = {"output": {"message": {"role": "assistant", "content": [{"text": reply}]}}}
+        return AWSResponse("", 200, {}, None), parsed
+
+    # On every call rather than Converse's own event, so it runs after the metrics hook
+    client.meta.events.register("before-call", converse)
+
+
+def _legacy_dispatch(actions, robots):
+    """The old /chat publishing: one robot after another, before the response"""
+    from services import dispatch_service
+
+    job = dispatch_service.create_job({robot: actions for robot in robots})
+    for robot in robots:
+        dispatch_service.run_robot(job, robot)
+    return job
+
+
+def bench_dispatch(args):
+    import clients
+    import config
+    from app import app
+    from routes import api
+
+    _setup(0.0)
+    _stub_converse(clients.get("bedrock-runtime"), "OK", args.bedrock_ms / 1000.0)
+    clients.get("iot-data").meta.events.register("before-send", _DynamoCalls(args.iot_ms / 1000.0))
+    client = app.test_client()
+    actions = ["wave", "sit", "stand", "bow", "stop", "look_down", "shake_hands", "lie_down"]
+    message = ", ".join(actions[n % len(actions)] for n in range(args.actions))
+    robots = [f"robot_{n}" for n in range(1, args.robots + 1)]
+    print(
+        f"{args.clients} clients x {args.chats} chats of {args.actions} actions to {args.robots} robots, "
+        f"Bedrock {args.bedrock_ms:.0f} ms, IoT publish {args.iot_ms:.0f} ms"
+    )
+
+    def run(label, mode, dispatcher):
+        config.DISPATCH_MODE = mode
+        api.dispatch = dispatcher
+        responses, completions = [], []
+
+        def chats():
+            for _ in range(args.chats):
+                started = time.perf_counter()
+                body = client.post("/chat", json={"message": message, "robots": robots}).get_json()
+                responses.append(time.perf_counter() - started)
+                job_id = body["job_id"]
+                while client.get(f"/jobs/{job_id}").get_json()["state"] not in ("done", "failed"):
+                    time.sleep(0.02)
+                completions.append(time.perf_counter() - started)
+
+        threads = [threading.Thread(target=chats) for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print(
+            f"  {label:<34} response p50 {_percentile(responses, 0.5) * 1000:6.0f} ms  "
+            f"p95 {_percentile(responses, 0.95) * 1000:6.0f} ms   "
+            f"all published p95 {_percentile(completions, 0.95) * 1000:6.0f} ms"
+        )
+
+    from services.dispatch_service import dispatch
+
+    run("robots in turn, inline (before)", "inline", _legacy_dispatch)
+    run("DISPATCH_MODE=inline", "inline", dispatch)
+    run("DISPATCH_MODE=thread", "thread", dispatch)
+
+
+def bench_metrics(args):
+    from app import app
+
+    database, _ = _setup(0.0)
+    database.upsert_robot("robot_1", {"robot_name": "Robot 1", "context": ""})
+    client = app.test_client()
+    hooks = (app.before_request_funcs[None], app.after_request_funcs[None])
+    saved = [list(funcs) for funcs in hooks]
+    print(f"{args.requests} cached GET /robots/robot_1 requests")
+
+    def run(label):
+        client.get("/robots/robot_1")
+        seconds = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            client.get("/robots/robot_1")
+            seconds.append(time.perf_counter() - started)
+        print(f"  {label:<24} p50 {_percentile(seconds, 0.5) * 1e6:7.0f} us  p99 {_percentile(seconds, 0.99) * 1e6:7.0f} us")
+        return _percentile(seconds, 0.5)
+
+    for funcs in hooks:
+        funcs.clear()
+    without = run("without metrics")
+    for funcs, original in zip(hooks, saved):
+        funcs.extend(original)
+    with_metrics = run("with metrics")
+    print(f"  metrics cost {(with_metrics - without) * 1e6:.0f} us per request")
+
+
+class _CachingConverse:
+    """
+    Converse stand-in that charges for input tokens the way prompt caching does. Tokens are
+    estimated like prompt_builder. A prefix up to a cachePoint is cached; a later request
+    reads the longest cached prefix it starts with, at --cached-ms-per-1k instead of
+    --ms-per-1k, and is charged in full for the rest.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.cached = set()
+        self.usage = []
+
+    def _blocks(self, params):
+        # (text, ends at a cachePoint) for every system and message block, in order
+        blocks = []
+        for block in params.get("system", []):
+            if "cachePoint" in block:
+                blocks[-1] = (blocks[-1][0], True)
+            else:
+                blocks.append((block["text"], False))
+        for msg in params["messages"]:
+            for block in msg["content"]:
+                if "cachePoint" in block:
+                    blocks[-1] = (blocks[-1][0], True)
+                else:
+                    blocks.append((msg["role"] + ":" + block["text"], False))
+        return blocks
+
+    def __call__(self, model, params, **kwargs):
+        from botocore.awsrequest import AWSResponse
+        from services.prompt_builder import estimate_tokens
+
+        if model.name != "Converse":
+            return None
+        total = read = write = 0
+        prefix = ""
+        for text, cache_point in self._blocks(json.loads(params["body"])):
+            prefix += "\x00" + text
+            total += estimate_tokens(text)
+            key = hash(prefix)
+            if key in self.cached:
+                read = total
+            elif cache_point:
+                self.cached.add(key)
+                write = total - read
+        uncached = total - read - write
+        seconds = (
+            self.args.base_ms + (uncached + write) * self.args.ms_per_1k / 1000 + read * self.args.cached_ms_per_1k / 1000
+        ) / 1000
+        time.sleep(seconds)
+        usage = {"inputTokens": uncached, "cacheReadInputTokens": read, "cacheWriteInputTokens": write}
+        self.usage.append(usage)
+        reply = "Sure! " + "I will do that for you right away. " * random.randint(3, 12) + "wave"
+        parsed = {"output": {"message": {"role": "assistant", "content": [{"text": reply}]}}, "usage": usage}
+        return AWSResponse("", 200, {}, None), parsed
+
+
+def bench_prompt(args):
+    import clients
+    import config
+    from services import chat_service, database_service, prompt_builder
+
+    _setup(0.0)
+    database_service.upsert_robot("robot_1", {"robot_name": "Robot 1", "context": "A patient guide dog. " * (args.background_chars // 21)})
+    requests = [
+        "wave", "sit, stand, bow", "What can you do?", "Please walk forward slowly and then stop",
+        "Tell me about yourself and your background in a few sentences.", "look_down, shake_hands",
+    ]
+    # Only report turns that were actually run
+    report = [turn for turn in args.report if 1 <= turn <= args.turns] or [args.turns]
+    print(f"{args.turns}-turn conversation, robot background {args.background_chars} chars")
+    print(f"  {'':<26} input tokens per request at turn " + "".join(f"{turn:>7}" for turn in report))
+    render = prompt_builder.system_prompt
+
+    def run(label, budget, cache_points, cache_prompts):
+        random.seed(1)
+        config.PROMPT_TOKEN_BUDGET = budget
+        config.PROMPT_CACHE_POINTS = cache_points
+        prompt_builder.system_prompt = render if cache_prompts else prompt_builder.render_system_prompt
+        converse = _CachingConverse(args)
+        bedrock = clients.get("bedrock-runtime")
+        bedrock.meta.events.register("before-call", converse, unique_id="bench-converse")
+        session = f"bench-{label}"
+        seconds = []
+        for turn in range(args.turns):
+            message = random.choice(requests)
+            started = time.perf_counter()
+            chat_service.get_chat_response(message, "robot_1", session)
+            seconds.append(time.perf_counter() - started)
+        bedrock.meta.events.unregister("before-call", unique_id="bench-converse")
+        sent = [sum(usage.values()) for usage in converse.usage]
+        charged = [usage["inputTokens"] + usage["cacheWriteInputTokens"] for usage in converse.usage]
+        print(f"  {label:<26} sent     " + "".join(f"{sent[turn - 1]:>7}" for turn in report))
+        print(f"  {'':<26} uncached " + "".join(f"{charged[turn - 1]:>7}" for turn in report))
+        print(
+            f"  {'':<26} total sent {sum(sent):7d}  uncached {sum(charged):7d}  "
+            f"latency p50 {_percentile(seconds, 0.5) * 1000:5.0f} ms  p95 {_percentile(seconds, 0.95) * 1000:5.0f} ms  "
+            f"turn {args.turns} {seconds[-1] * 1000:5.0f} ms"
+        )
+
+    run("whole history (before)", 0, "false", False)
+    run(f"budget {args.budget}", args.budget, "false", True)
+    run(f"budget {args.budget} + cachePoint", args.budget, "true", True)
+
+
+def _sequential_robot_chats(user_message, robot_ids, session_id):
+    """get_robot_chat_responses() one robot after another, each record read on its own"""
+    from services import chat_service, database_service
+
+    replies = [
+        chat_service.get_robot_chat_response(user_message, robot_id, database_service.get_robot(robot_id), session_id)
+        for robot_id in dict.fromkeys(robot_ids)
+    ]
+    return chat_service.combined_reply(replies, session_id)
+
+
+def bench_multichat(args):
+    import clients
+    import config
+    from app import app
+    from botocore.awsrequest import AWSResponse
+    from routes import api
+    from services import chat_service, database_service
+
+    _, calls = _setup(args.dynamodb_ms / 1000.0)
+    actions = ["wave", "sit", "stand", "bow", "look_down", "shake_hands"]
+    robots = [f"robot_{n}" for n in range(1, max(args.robots) + 1)]
+    for n, robot_id in enumerate(robots):
+        database_service.upsert_robot(robot_id, {"robot_name": f"Robot {n}", "context": f"Persona {n}. " * 50})
+    jitter = random.Random(1)
+
+    def converse(model, params, **kwargs):
+        # Each persona plans its own two actions; Bedrock takes --bedrock-ms, +-30%
+        if model.name != "Converse":
+            return None
+        system = json.loads(params["body"])["system"][0]["text"]
+        n = int(system.split("Your Name:Robot ")[1].split()[0]) if "Your Name:Robot " in system else 0
+        time.sleep(args.bedrock_ms / 1000.0 * jitter.uniform(0.7, 1.3))
+        reply = f"{actions[n % len(actions)]}, {actions[(n + 1) % len(actions)]}"
+        return AWSResponse("", 200, {}, None), {"output": {"message": {"role": "assistant", "content": [{"text": reply}]}}}
+
+    clients.get("bedrock-runtime").meta.events.register("before-call", converse)
+    clients.get("iot-data").meta.events.register("before-send", _DynamoCalls(args.iot_ms / 1000.0))
+    config.DISPATCH_MODE = "inline"
+    client = app.test_client()
+    print(
+        f"{args.chats} chats per robot count, records uncached, Bedrock {args.bedrock_ms:.0f} ms, "
+        f"DynamoDB {args.dynamodb_ms:.0f} ms, IoT publish {args.iot_ms:.0f} ms; "
+        f"/chat latency p50 / max until every robot's actions are published"
+    )
+    cases = [
+        ("shared (first robot's persona)", "shared", chat_service.get_robot_chat_responses, 1),
+        ("per_robot, sequential calls", "per_robot", _sequential_robot_chats, 1),
+        (f"per_robot, {config.CHAT_ROBOT_WORKERS} workers", "per_robot", chat_service.get_robot_chat_responses, None),
+        ("per_robot, a worker per robot", "per_robot", chat_service.get_robot_chat_responses, 0),
+    ]
+    print(f"  {'':<34}" + "".join(f"{f'{count} robots':>22}" for count in args.robots))
+    default_workers = config.CHAT_ROBOT_WORKERS
+    for label, mode, responder, workers in cases:
+        api.get_robot_chat_responses = responder
+        row = []
+        for count in args.robots:
+            config.CHAT_ROBOT_WORKERS = default_workers if workers is None else workers or count
+            seconds, requests = [], []
+            for chat in range(args.chats):
+                database_service.robot_cache.invalidate()
+                calls.count = 0
+                started = time.perf_counter()
+                body = client.post(
+                    "/chat", json={"message": "Say hello", "robots": robots[:count], "mode": mode, "session_id": f"{label}{chat}"}
+                ).get_json()
+                seconds.append(time.perf_counter() - started)
+                requests.append(calls.count)
+                assert "actions_executed" in body, body
+            row.append(f"{_percentile(seconds, 0.5) * 1000:6.0f} /{max(seconds) * 1000:6.0f} ms, {max(requests)} db")
+        print(f"  {label:<34}" + "".join(f"{cell:>22}" for cell in row))
+    config.CHAT_ROBOT_WORKERS = default_workers
+
+
+# Serves the app with uvicorn in a fresh interpreter: argv is sync|async, port
+_CHAT_SERVER = """
+import sys
+import uvicorn
+mode, port = sys.argv[1], int(sys.argv[2])
+if mode == "async":
+    from asgi import app
+else:
+    import config
+    from a2wsgi import WSGIMiddleware
+    from app import app as flask_app
+    app = WSGIMiddleware(flask_app, workers=config.ASYNC_WSGI_WORKERS)
+uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=2048)
+"""
+
+
+async def _chat_load(url, args):
+    import asyncio
+
+    import aiohttp
+
+    robots = [f"robot_{n}" for n in range(1, args.robots + 1)]
+    latencies, failures = [], []
+
+    async def session(client, n):
+        for _ in range(args.turns):
+            body = {"message": "wave", "robots": robots, "session_id": f"load-{n}"}
+            started = time.perf_counter()
+            async with client.post(f"{url}/chat", json=body) as response:
+                reply = await response.json() if response.status == 200 else {}
+            latencies.append(time.perf_counter() - started)
+            if len(reply.get("actions_executed", [])) != len(robots):
+                failures.append(response.status)
+
+    connector = aiohttp.TCPConnector(limit=args.sessions)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(session(client, n) for n in range(args.sessions)))
+        seconds = time.perf_counter() - started
+    return seconds, latencies, failures
+
+
+def bench_chatload(args):
+    import asyncio
+    import socket
+
+    try:
+        import a2wsgi  # noqa: F401
+        import aiohttp  # noqa: F401
+        import uvicorn  # noqa: F401
+    except ImportError:
+        sys.exit("chatload needs the async dependencies: pip install -r requirements-async.txt")
+
+    stub = _stub_aws(bedrock=args.bedrock_ms / 1000.0, iot=args.iot_ms / 1000.0, dynamodb=0.005)
+    stub.RequestHandlerClass.REPLY_TEXT = "wave"
+    here = os.path.dirname(os.path.abspath(__file__))
+    print(
+        f"{args.sessions} concurrent chat sessions x {args.turns} turns, {args.robots} robots per chat, "
+        f"Bedrock {args.bedrock_ms:.0f} ms, IoT publish {args.iot_ms:.0f} ms"
+    )
+    try:
+        for mode, label in (("sync", f"Flask, {args.workers} workers (before)"), ("async", "ASGI, async /chat")):
+            with socket.socket() as sock:
+                sock.bind(("127.0.0.1", 0))
+                port = sock.getsockname()[1]
+            env = {
+                **os.environ,
+                "AWS_ENDPOINT_URL": f"http://127.0.0.1:{stub.server_port}",
+                "ASYNC_WSGI_WORKERS": str(args.workers),
+                # Responses carry actions_executed, as before
+                "DISPATCH_MODE": "inline",
+            }
+            server = subprocess.Popen(
+                [sys.executable, "-c", _CHAT_SERVER, mode, str(port)],
+                cwd=here, env=env, stdout=subprocess.DEVNULL,
+            )
+            url = f"http://127.0.0.1:{port}"
+            try:
+                deadline = time.monotonic() + 30
+                while True:
+                    try:
+                        urllib.request.urlopen(f"{url}/cache/robots", timeout=1).close()
+                        break
+                    except OSError:
+                        if time.monotonic() > deadline or server.poll() is not None:
+                            raise SystemExit(f"{mode} server did not start")
+                        time.sleep(0.1)
+                seconds, latencies, failures = asyncio.run(_chat_load(url, args))
+            finally:
+                server.terminate()
+                server.wait()
+            print(
+                f"  {label:<28} {len(latencies) / seconds:7.1f} req/s  "
+                f"p50 {_percentile(latencies, 0.5) * 1000:6.0f} ms  p99 {_percentile(latencies, 0.99) * 1000:6.0f} ms  "
+                f"failed {len(failures)}/{len(latencies)}"
+            )
+    finally:
+        stub.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="text_control service benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    cache = subparsers.add_parser("cache", help="Robot record cache hit rate and latency")
+    cache.add_argument("--lookups", type=int, default=2000)
+    cache.add_argument("--latency-ms", type=float, default=8.0, help="Added to every DynamoDB request")
+    cache.add_argument("--unknown", type=float, default=0.1, help="Share of lookups for IDs with no record")
+    cache.add_argument("--interval", type=float, default=0.0, help="Seconds between lookups")
+    cache.add_argument("--context-bytes", type=int, default=4000)
+    cache.add_argument("--revalidate", type=float, default=1.0, help="Version check interval")
+    cache.add_argument("--staleness-limit", type=float, default=5.0)
+    cache.set_defaults(func=bench_cache)
+    listing = subparsers.add_parser("list", help="GET /robots over a large table")
+    listing.add_argument("--robots", type=int, default=100000)
+    listing.add_argument("--context-bytes", type=int, default=1000)
+    listing.add_argument("--latency-ms", type=float, default=10.0, help="Added to every scan request")
+    listing.add_argument("--mbps", type=float, default=400.0, help="Response transfer rate, Mbit/s")
+    listing.add_argument("--segments", type=int, nargs="+", default=[4, 8])
+    listing.add_argument("--page", type=int, default=1000, help="limit for the paged run")
+    listing.set_defaults(func=bench_list)
+    batch = subparsers.add_parser("batch", help="Provisioning throughput, per robot vs batch")
+    batch.add_argument("--robots", type=int, default=500)
+    batch.add_argument("--latency-ms", type=float, default=10.0, help="Added to every DynamoDB request")
+    batch.add_argument("--unprocessed", type=float, default=0.2, help="Share of batch writes handed back")
+    batch.set_defaults(func=bench_batch)
+    conflicts = subparsers.add_parser("conflicts", help="Concurrent edits of one robot, lost vs retried")
+    conflicts.add_argument("--operators", type=int, default=8)
+    conflicts.add_argument("--edits", type=int, default=25)
+    conflicts.add_argument("--latency-ms", type=float, default=5.0, help="Added to every DynamoDB request")
+    conflicts.set_defaults(func=bench_conflicts)
+    coldstart = subparsers.add_parser("coldstart", help="Import and first-request time per route")
+    coldstart.add_argument("--runs", type=int, default=5)
+    dispatching = subparsers.add_parser("dispatch", help="/chat response time, inline vs background publishing")
+    dispatching.add_argument("--clients", type=int, default=4)
+    dispatching.add_argument("--chats", type=int, default=10, help="Chats per client")
+    dispatching.add_argument("--actions", type=int, default=8, help="Actions per chat")
+    dispatching.add_argument("--robots", type=int, default=3)
+    dispatching.add_argument("--bedrock-ms", type=float, default=800.0)
+    dispatching.add_argument("--iot-ms", type=float, default=20.0)
+    dispatching.set_defaults(func=bench_dispatch)
+    metrics_bench = subparsers.add_parser("metrics", help="Per-request cost of the metrics middleware")
+    metrics_bench.add_argument("--requests", type=int, default=5000)
+    metrics_bench.set_defaults(func=bench_metrics)
+    prompt = subparsers.add_parser("prompt", help="Input tokens and latency over a long conversation")
+    prompt.add_argument("--turns", type=int, default=100)
+    prompt.add_argument("--budget", type=int, default=4000, help="PROMPT_TOKEN_BUDGET")
+    prompt.add_argument("--background-chars", type=int, default=4000)
+    prompt.add_argument("--report", type=int, nargs="+", default=[1, 10, 25, 50, 75, 100],
+                        help="Turns to show; turns beyond --turns are skipped")
+    prompt.add_argument("--base-ms", type=float, default=300.0, help="Model latency without input")
+    prompt.add_argument("--ms-per-1k", type=float, default=60.0, help="Per 1000 uncached input tokens")
+    prompt.add_argument("--cached-ms-per-1k", type=float, default=6.0, help="Per 1000 cached input tokens")
+    prompt.set_defaults(func=bench_prompt)
+    multichat = subparsers.add_parser("multichat", help="/chat with a conversation per robot")
+    multichat.add_argument("--robots", type=int, nargs="+", default=[2, 4, 8])
+    multichat.add_argument("--chats", type=int, default=5)
+    multichat.add_argument("--bedrock-ms", type=float, default=800.0)
+    multichat.add_argument("--dynamodb-ms", type=float, default=8.0)
+    multichat.add_argument("--iot-ms", type=float, default=20.0)
+    multichat.set_defaults(func=bench_multichat)
+    chatload = subparsers.add_parser("chatload", help="Concurrent chat sessions, Flask vs ASGI")
+    chatload.add_argument("--sessions", type=int, default=200)
+    chatload.add_argument("--turns", type=int, default=5)
+    chatload.add_argument("--robots", type=int, default=3, help="Robots each chat commands")
+    chatload.add_argument("--bedrock-ms", type=float, default=800.0)
+    chatload.add_argument("--iot-ms", type=float, default=20.0)
+    chatload.add_argument("--workers", type=int, default=16, help="Threads serving Flask in sync mode")
+    chatload.set_defaults(func=bench_chatload, in_process=False)
+    # Runs its own moto server, which in-process mocking would intercept
+    coldstart.set_defaults(func=bench_coldstart, in_process=False)
+    args = parser.parse_args()
+    if not getattr(args, "in_process", True):
+        args.func(args)
+        return
+    with mock_aws():
+        args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+AWS clients, created on first use and shared by the whole process.
+
+Building a boto3 client loads the service model and endpoint data, which
+takes tens of milliseconds each. Creating them at import time made every
+Lambda cold start pay for all of them, even on requests that need none.
+Callers ask the registry instead:
+
+    clients.get("dynamodb").Table(name)
+    clients.get("iot-data").publish(...)
+
+The first call builds the client and later calls return the same one.
+boto3 clients are thread-safe, and the registry builds each one once even
+when threads race for it.
+
+WARM_CLIENTS (config.py) names the clients to build while the Lambda
+initializes, before the first request. That helps where init is not on the
+request path: provisioned concurrency and SnapStart, which snapshots the
+initialized process.
+"""
+
+import threading
+
+import config
+import metrics
+
+_clients = {}
+_session = None
+_lock = threading.Lock()
+
+
+def _retry_config(**kwargs):
+    from botocore.config import Config
+
+    return Config(retries={"max_attempts": 3, "mode": "standard"}, **kwargs)
+
+
+def _boto3_session():
+    # Called with _lock held. One session, so the clients share its loaded data
+    global _session
+    if _session is None:
+        import boto3
+
+        _session = boto3.session.Session()
+    return _session
+
+
+def _bedrock_runtime():
+    return metrics.instrument(
+        _boto3_session().client("bedrock-runtime", config=_retry_config(region_name=config.AWS_BEDROCK_REGION))
+    )
+
+
+def _iot_data():
+    return metrics.instrument(_boto3_session().client("iot-data", config=_retry_config()))
+
+
+def _dynamodb():
+    resource = _boto3_session().resource("dynamodb")
+    metrics.instrument(resource.meta.client)
+    return resource
+
+
+FACTORIES = {
+    "bedrock-runtime": _bedrock_runtime,
+    "iot-data": _iot_data,
+    "dynamodb": _dynamodb,
+}
+
+
+def get(name):
+    """The shared client (or resource, for dynamodb) called name"""
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = FACTORIES[name]()
+    return client
+
+
+def override(name, client):
+    """Use client for name from now on, e.g. a stand-in for benchmarks"""
+    with _lock:
+        _clients[name] = client
+
+
+def reset():
+    """Forget every client; the next get() builds a new one"""
+    global _session
+    with _lock:
+        _clients.clear()
+        _session = None
+
+
+def warm(names=None):
+    """Build the named clients (all of them if names is None) ahead of the first request"""
+    for name in FACTORIES if names is None else names:
+        get(name)
@@ -8,5 +8,88 @@ import os
 AWS_BEDROCK_REGION = os.getenv("AWS_BEDROCK_REGION", "us-east-1")
 NOVA_MODEL_ID = "us.amazon.nova-pro-v1:0"
 
+# AWS IoT settings
+# QoS for action messages; robots drop redelivered duplicates by messageId
+IOT_PUBLISH_QOS = int(os.getenv("IOT_PUBLISH_QOS", "1"))
+# Every robot subscribes to FLEET_TOPIC and to GROUP_TOPIC_PREFIX + <group>
+# for each of its groups, so a broadcast or group command is one publish
+FLEET_TOPIC = os.getenv("FLEET_TOPIC", "fleet/all")
+GROUP_TOPIC_PREFIX = os.getenv("GROUP_TOPIC_PREFIX", "fleet/group/")
+
+# Robot record cache (services/database_service.py): seconds a record is
+# served from memory, seconds an unknown ID stays unknown, and seconds after
+# which a cached record's version is checked against the table (0 = never,
+# rely on the TTL)
+ROBOT_CACHE_TTL = float(os.getenv("ROBOT_CACHE_TTL", "300"))
+ROBOT_CACHE_NEGATIVE_TTL = float(os.getenv("ROBOT_CACHE_NEGATIVE_TTL", "30"))
+ROBOT_CACHE_REVALIDATE = float(os.getenv("ROBOT_CACHE_REVALIDATE", "0"))
+ROBOT_CACHE_MAX_ENTRIES = int(os.getenv("ROBOT_CACHE_MAX_ENTRIES", "1024"))
+
+# Parallel scan segments for listing every robot; raise for large fleets
+ROBOT_SCAN_SEGMENTS = int(os.getenv("ROBOT_SCAN_SEGMENTS", "1"))
+# Largest page /robots?limit= returns
+ROBOT_PAGE_LIMIT = int(os.getenv("ROBOT_PAGE_LIMIT", "1000"))
+
+# /robots/batch: most robots per request, and DynamoDB batch requests in flight
+ROBOT_BATCH_MAX = int(os.getenv("ROBOT_BATCH_MAX", "1000"))
+ROBOT_BATCH_WORKERS = int(os.getenv("ROBOT_BATCH_WORKERS", "4"))
+
+# AWS clients (clients.py) to build while the Lambda initializes rather than
+# on first use: a comma-separated list of dynamodb, iot-data and
+# bedrock-runtime, or "all". Worth it with provisioned concurrency or
+# SnapStart, where init is not on a request's path; empty builds none
+WARM_CLIENTS = [name.strip() for name in os.getenv("WARM_CLIENTS", "").split(",") if name.strip()]
+
+# Prompt assembly (services/prompt_builder.py). Tokens (estimated) a request
+# may use for the system prompt and history; 0 sends the whole history.
+# Over budget, the oldest turns are summarized down to PROMPT_TRIM_TO of it,
+# keeping at least PROMPT_MIN_MESSAGES messages
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+PROMPT_TRIM_TO = float(os.getenv("PROMPT_TRIM_TO", "0.6"))
+PROMPT_MIN_MESSAGES = int(os.getenv("PROMPT_MIN_MESSAGES", "4"))
+PROMPT_SUMMARY_TOKENS = int(os.getenv("PROMPT_SUMMARY_TOKENS", "300"))
+# Bedrock prompt caching checkpoints: "auto" uses them for models that
+# support caching, "true" or "false" forces; prefixes shorter than
+# PROMPT_CACHE_MIN_TOKENS get none
+PROMPT_CACHE_POINTS = os.getenv("PROMPT_CACHE_POINTS", "auto").lower()
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+# Rendered system prompts kept, one per robot record version
+PROMPT_CACHE_MAX_ENTRIES = int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "256"))
+
+# /chat with several robots (services/chat_service.py): "shared" answers
+# with the first robot's persona, "per_robot" gives every robot its own
+# conversation; a request's "mode" overrides. Robots' Bedrock calls in
+# flight at once for each per_robot chat
+CHAT_MODE = os.getenv("CHAT_MODE", "shared")
+CHAT_ROBOT_WORKERS = int(os.getenv("CHAT_ROBOT_WORKERS", "4"))
+
+# Action dispatch (services/dispatch_service.py). "thread" publishes in the
+# background: /chat and /run_action return a job ID to follow at /jobs/<id>.
+# "inline" publishes before responding. Lambda freezes an instance between
+# invocations, which would stall background publishing, so inline is the
+# default there
+DISPATCH_MODE = os.getenv(
+    "DISPATCH_MODE", "inline" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "thread"
+)
+# Robots published to at once, across all jobs
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "8"))
+# Finished jobs are kept this many seconds, and at most this many jobs
+DISPATCH_JOB_TTL = float(os.getenv("DISPATCH_JOB_TTL", "600"))
+DISPATCH_MAX_JOBS = int(os.getenv("DISPATCH_MAX_JOBS", "1000"))
+
+# ASGI mode (asgi.py): threads for the Flask routes, and connections each
+# async AWS client keeps open, roughly the chats in flight at once
+ASYNC_WSGI_WORKERS = int(os.getenv("ASYNC_WSGI_WORKERS", "16"))
+ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", "256"))
+
+# Metrics (metrics.py): a CloudWatch embedded metric format log line per
+# request, on by default in Lambda, and its namespace
+METRICS_EMF = os.getenv(
+    "METRICS_EMF", "true" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "false"
+).lower() == "true"
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "TextControl")
+# Profile requests that send an X-Profile header; never enable in production
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "False").lower() == "true"
+
 # Application settings
 DEBUG = os.getenv("DEBUG", "False").lower() == "true"
@@ -1,50 +1,296 @@
 import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
 
-import boto3
+import clients
+import metrics
 
 ROBOT_TABLE = os.getenv("RobotTable", "")
-dynamodb = boto3.resource("dynamodb")
-robot_table = dynamodb.Table(ROBOT_TABLE)
+# (resource, Table) of the last lookup; Table() takes about a millisecond
+_table = (None, None)
+
+# DynamoDB's per-request limits for batch_write_item and batch_get_item
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+BATCH_ATTEMPTS = 6
+BATCH_BACKOFF = 0.05
+
+
+def robot_table():
+    """The robot table, on the shared DynamoDB resource (created on first use)"""
+    global _table
+    dynamodb = clients.get("dynamodb")
+    resource, table = _table
+    if resource is not dynamodb:
+        table = dynamodb.Table(ROBOT_TABLE)
+        _table = (dynamodb, table)
+    return table
 
 
 def create_robot(robot_id, data):
-    item = {"id": robot_id, **data}
-    robot_table.put_item(Item=item)
+    item = {**data, "id": robot_id, "version": uuid4().hex}
+    robot_table().put_item(Item=item)
     return item
 
 
 def get_robot(robot_id):
-    resp = robot_table.get_item(Key={"id": robot_id})
+    resp = robot_table().get_item(Key={"id": robot_id})
     return resp["Item"] if "Item" in resp else None
 
 
+def get_robot_version(robot_id):
+    """Only the version attribute of a robot; None if the robot does not exist"""
+    resp = robot_table().get_item(
+        Key={"id": robot_id},
+        ProjectionExpression="#v",
+        ExpressionAttributeNames={"#v": "version"},
+    )
+    return resp["Item"].get("version", "") if "Item" in resp else None
+
+
 def upsert_robot(robot_id, data):
     """
     Create or update a robot with the given ID and data.
     Uses put_item which will automatically overwrite an existing item with the same key.
+    Every write gets a new version, so cached copies elsewhere can tell they are stale.
     """
-    item = {"id": robot_id, **data}
-    robot_table.put_item(Item=item)
+    item = {**data, "id": robot_id, "version": uuid4().hex}
+    robot_table().put_item(Item=item)
     return item
 
 
-def update_robot(robot_id, data):
-    update_expr = "SET " + ", ".join(f"{k}=:{k}" for k in data)
-    expr_attr_vals = {f":{k}": v for k, v in data.items()}
-    robot_table.update_item(
-        Key={"id": robot_id},
-        UpdateExpression=update_expr,
-        ExpressionAttributeValues=expr_attr_vals,
-    )
-    return get_robot(robot_id)
+class VersionConflict(Exception):
+    """The robot's version no longer matches; current is the stored item, or None if it is gone"""
+
+    def __init__(self, robot_id, current):
+        super().__init__(f"Robot {robot_id} was changed by someone else")
+        self.current = current
+
+
+def update_robot(robot_id, data, expected_version=None, defaults=None):
+    """
+    Set only the attributes in data (None removes one) and return the whole updated item.
+    With expected_version, the update only applies if the stored version still matches,
+    otherwise VersionConflict is raised. Without it the robot is created if missing;
+    defaults are set only where the attribute does not exist yet.
+    """
+    names = {"#version": "version"}
+    values = {":version": uuid4().hex}
+    sets = ["#version = :version"]
+    removes = []
+    for n, (key, value) in enumerate(data.items()):
+        names[f"#a{n}"] = key
+        if value is None:
+            removes.append(f"#a{n}")
+        else:
+            values[f":a{n}"] = value
+            sets.append(f"#a{n} = :a{n}")
+    for n, (key, value) in enumerate((defaults or {}).items()):
+        if key in data:
+            continue
+        names[f"#d{n}"] = key
+        values[f":d{n}"] = value
+        sets.append(f"#d{n} = if_not_exists(#d{n}, :d{n})")
+    kwargs = {}
+    if expected_version is not None:
+        kwargs["ConditionExpression"] = "#version = :expected"
+        values[":expected"] = expected_version
+    update_expr = "SET " + ", ".join(sets) + (" REMOVE " + ", ".join(removes) if removes else "")
+    try:
+        resp = robot_table().update_item(
+            Key={"id": robot_id},
+            UpdateExpression=update_expr,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues="ALL_NEW",
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+            **kwargs,
+        )
+    except robot_table().meta.client.exceptions.ConditionalCheckFailedException as e:
+        # The stored item comes back with the failure, in DynamoDB's wire format
+        item = e.response.get("Item")
+        if item is None:
+            raise VersionConflict(robot_id, get_robot(robot_id)) from e
+        from boto3.dynamodb.types import TypeDeserializer
+
+        deserializer = TypeDeserializer()
+        current = {key: deserializer.deserialize(value) for key, value in item.items()}
+        raise VersionConflict(robot_id, current) from e
+    return resp["Attributes"]
 
 
 def delete_robot(robot_id):
-    robot_table.delete_item(Key={"id": robot_id})
+    robot_table().delete_item(Key={"id": robot_id})
     return True
 
 
-def list_robots():
-    resp = robot_table.scan()
-    items = resp.get("Items", [])
+def scan_robots(limit=None, start_key=None, attributes=None, segment=None, total_segments=None):
+    """
+    One scan request: (items, LastEvaluatedKey or None).
+    A page stops at limit items or 1 MB; attributes projects each item to those attributes.
+    """
+    kwargs = {}
+    if limit:
+        kwargs["Limit"] = limit
+    if start_key:
+        kwargs["ExclusiveStartKey"] = start_key
+    if attributes:
+        names = {f"#a{i}": name for i, name in enumerate(attributes)}
+        kwargs["ProjectionExpression"] = ", ".join(names)
+        kwargs["ExpressionAttributeNames"] = names
+    if total_segments and total_segments > 1:
+        kwargs["Segment"] = segment
+        kwargs["TotalSegments"] = total_segments
+    resp = robot_table().scan(**kwargs)
+    return resp.get("Items", []), resp.get("LastEvaluatedKey")
+
+
+def iter_robot_pages(attributes=None, segments=1):
+    """
+    Every page of the table, following LastEvaluatedKey.
+    With segments > 1 the segments are scanned in parallel threads and pages
+    are yielded as they arrive, so the order is not the table order.
+    """
+    if segments <= 1:
+        start_key = None
+        while True:
+            items, start_key = scan_robots(start_key=start_key, attributes=attributes)
+            yield items
+            if not start_key:
+                return
+
+    pages = queue.Queue(maxsize=segments * 2)
+    stopping = threading.Event()
+    done = object()
+
+    def put(page):
+        # Give up once the consumer has gone away, or the worker would block forever
+        while not stopping.is_set():
+            try:
+                pages.put(page, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def scan_segment(segment):
+        try:
+            start_key = None
+            while not stopping.is_set():
+                items, start_key = scan_robots(
+                    start_key=start_key,
+                    attributes=attributes,
+                    segment=segment,
+                    total_segments=segments,
+                )
+                put(items)
+                if not start_key:
+                    break
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    executor = ThreadPoolExecutor(max_workers=segments)
+    try:
+        for segment in range(segments):
+            metrics.submit(executor, scan_segment, segment)
+        remaining = segments
+        while remaining:
+            page = pages.get()
+            if page is done:
+                remaining -= 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield page
+    finally:
+        stopping.set()
+        executor.shutdown(wait=True)
+
+
+def list_robots(attributes=None, segments=1):
+    items = [item for page in iter_robot_pages(attributes, segments) for item in page]
     return sorted(items, key=lambda x: x.get("id", ""))
+
+
+def _chunks(values, size):
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def _backoff(attempt):
+    # Full jitter: unprocessed items mean the table is throttling
+    time.sleep(random.uniform(0, BATCH_BACKOFF * 2**attempt))
+
+
+def _write_chunk(requests):
+    """batch_write_item one chunk, retrying unprocessed items; returns the ones still unprocessed"""
+    for attempt in range(BATCH_ATTEMPTS):
+        resp = clients.get("dynamodb").batch_write_item(RequestItems={ROBOT_TABLE: requests})
+        requests = resp.get("UnprocessedItems", {}).get(ROBOT_TABLE, [])
+        if not requests:
+            return []
+        if attempt < BATCH_ATTEMPTS - 1:
+            _backoff(attempt)
+    return requests
+
+
+def _get_chunk(keys):
+    """batch_get_item one chunk, retrying unprocessed keys; returns (items, keys still unprocessed)"""
+    items = []
+    for attempt in range(BATCH_ATTEMPTS):
+        resp = clients.get("dynamodb").batch_get_item(RequestItems={ROBOT_TABLE: {"Keys": keys}})
+        items.extend(resp.get("Responses", {}).get(ROBOT_TABLE, []))
+        keys = resp.get("UnprocessedKeys", {}).get(ROBOT_TABLE, {}).get("Keys", [])
+        if not keys:
+            break
+        if attempt < BATCH_ATTEMPTS - 1:
+            _backoff(attempt)
+    return items, keys
+
+
+def batch_write_robots(items=(), robot_ids=(), workers=4):
+    """
+    Put items and delete robot_ids in chunks of 25, workers chunks at a time.
+    IDs must be unique across both. Returns (put items, IDs not written); a chunk that
+    fails outright reports all of its IDs as not written.
+    """
+    stamped = [{**item, "version": uuid4().hex} for item in items]
+    requests = [{"PutRequest": {"Item": item}} for item in stamped]
+    requests += [{"DeleteRequest": {"Key": {"id": robot_id}}} for robot_id in robot_ids]
+
+    def request_id(request):
+        return request["PutRequest"]["Item"]["id"] if "PutRequest" in request else request["DeleteRequest"]["Key"]["id"]
+
+    def write(chunk):
+        try:
+            return [request_id(r) for r in _write_chunk(chunk)]
+        except Exception as e:
+            print(f"Error in batch write: {str(e)}")
+            return [request_id(r) for r in chunk]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        chunks = metrics.pool_map(executor, write, _chunks(requests, BATCH_WRITE_SIZE))
+        failed = [robot_id for ids in chunks for robot_id in ids]
+    return stamped, failed
+
+
+def batch_get_robots(robot_ids, workers=4):
+    """Robots by ID in chunks of 100, workers chunks at a time: (items, IDs not read)"""
+    def get(chunk):
+        try:
+            items, keys = _get_chunk([{"id": robot_id} for robot_id in chunk])
+            return items, [key["id"] for key in keys]
+        except Exception as e:
+            print(f"Error in batch get: {str(e)}")
+            return [], chunk
+
+    found, failed = [], []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for items, ids in metrics.pool_map(executor, get, _chunks(list(robot_ids), BATCH_GET_SIZE)):
+            found.extend(items)
+            failed.extend(ids)
+    return found, failed
@@ -0,0 +1,277 @@
+"""
+Request metrics and an opt-in profiler for text_control.
+
+init_app(app) times every Flask request by route and status. instrument()
+hooks an AWS client's botocore events, so each Bedrock, DynamoDB and IoT
+call is timed by service and operation and its time is added to the
+request that made it. clients.py and aio_clients.py instrument every
+client they create. Work handed to a thread pool goes through submit() or
+pool_map(), which run it in a copy of the request's context, so its AWS
+time still counts toward the request. Errors are counted by kind and type: unhandled
+exceptions by class, AWS errors by error code, and 5xx responses.
+
+render() is the Prometheus text format served at /metrics. In Lambda,
+where each instance keeps its own counters, every request also prints one
+CloudWatch embedded metric format (EMF) line to the log.
+
+With PROFILE_REQUESTS=true, a request with an X-Profile: 1 header is
+profiled, and the report replaces the response body. pyinstrument's
+sampling profiler is used when it is installed, cProfile otherwise.
+"""
+
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+
+import config
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Service IDs as botocore names them in event names, and the label used here
+SERVICES = {"bedrock-runtime": "bedrock", "dynamodb": "dynamodb", "iot-data-plane": "iot"}
+
+_lock = threading.Lock()
+# (method, route, status) -> histogram of request seconds
+_requests = {}
+# (route, service) -> histogram of AWS seconds per request
+_request_aws = {}
+# (service, operation) -> histogram of AWS call seconds
+_aws_calls = {}
+# (kind, type) -> count
+_errors = defaultdict(int)
+
+# Seconds per service spent by the current request's AWS calls; None outside a request
+_aws_time = contextvars.ContextVar("aws_time", default=None)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+
+
+def _observe(histograms, key, seconds):
+    # Called with _lock held
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = Histogram()
+    histogram.observe(seconds)
+
+
+def count_error(kind, error_type):
+    with _lock:
+        _errors[(kind, error_type)] += 1
+
+
+def _before_call(model, context, **kwargs):
+    service = SERVICES.get(model.service_model.service_id.hyphenize(), model.service_model.service_name)
+    context["metrics_call"] = (service, model.name, time.perf_counter())
+
+
+def _after_call(context, http_response=None, parsed=None, exception=None, **kwargs):
+    call = context.pop("metrics_call", None)
+    if call is None:
+        return
+    service, operation, started = call
+    seconds = time.perf_counter() - started
+    with _lock:
+        _observe(_aws_calls, (service, operation), seconds)
+    spent = _aws_time.get()
+    if spent is not None:
+        # Pool threads working for the same request share spent
+        with _lock:
+            spent[service] = spent.get(service, 0.0) + seconds
+    if exception is not None:
+        count_error("aws", type(exception).__name__)
+    elif http_response is not None and http_response.status_code >= 300:
+        count_error("aws", (parsed or {}).get("Error", {}).get("Code") or str(http_response.status_code))
+
+
+def instrument(client):
+    """Time every call client makes; returns client"""
+    events = client.meta.events
+    events.register("before-call", _before_call, unique_id="metrics-before-call")
+    events.register("after-call", _after_call, unique_id="metrics-after-call")
+    events.register("after-call-error", _after_call, unique_id="metrics-after-call-error")
+    return client
+
+
+def submit(executor, fn, *args):
+    """executor.submit() running fn in a copy of the current context, so its AWS time counts"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def pool_map(executor, fn, *iterables):
+    """List of executor.map() results, each call run as submit() runs it"""
+    futures = [submit(executor, fn, *args) for args in zip(*iterables)]
+    return [future.result() for future in futures]
+
+
+def start_request():
+    """Begin collecting the current request's AWS time; pass the result to finish_request()"""
+    return time.perf_counter(), _aws_time.set({})
+
+
+def finish_request(started, method, route, status):
+    """Record the request; returns its seconds and AWS seconds per service"""
+    started_at, token = started
+    seconds = time.perf_counter() - started_at
+    spent = dict(_aws_time.get() or {})
+    _aws_time.reset(token)
+    with _lock:
+        _observe(_requests, (method, route, str(status)), seconds)
+        for service, service_seconds in spent.items():
+            _observe(_request_aws, (route, service), service_seconds)
+    if status >= 500:
+        count_error("http", str(status))
+    if config.METRICS_EMF:
+        emit_emf(method, route, status, seconds, spent)
+    return seconds, spent
+
+
+def emit_emf(method, route, status, seconds, spent):
+    """Print the request as a CloudWatch embedded metric format log line"""
+    metrics = [{"Name": "Latency", "Unit": "Milliseconds"}]
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [
+                {"Namespace": config.METRICS_NAMESPACE, "Dimensions": [["Route"]], "Metrics": metrics}
+            ],
+        },
+        "Route": f"{method} {route}",
+        "Status": status,
+        "Latency": round(seconds * 1000, 3),
+    }
+    for service, service_seconds in sorted(spent.items()):
+        name = f"{service.capitalize()}Time"
+        metrics.append({"Name": name, "Unit": "Milliseconds"})
+        record[name] = round(service_seconds * 1000, 3)
+    if status >= 500:
+        metrics.append({"Name": "Errors", "Unit": "Count"})
+        record["Errors"] = 1
+    print(json.dumps(record))
+
+
+def _labels(**labels):
+    return ",".join(f'{name}="{str(value)}"'.replace("\n", " ") for name, value in labels.items())
+
+
+def _render_histograms(lines, name, help_text, histograms, label_names):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(histograms.items()):
+        labels = _labels(**dict(zip(label_names, key)))
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        _render_histograms(
+            lines, "text_control_request_seconds", "Request latency by route",
+            _requests, ("method", "route", "status"),
+        )
+        _render_histograms(
+            lines, "text_control_request_aws_seconds", "AWS time per request by route and service",
+            _request_aws, ("route", "service"),
+        )
+        _render_histograms(
+            lines, "text_control_aws_call_seconds", "AWS call latency by service and operation",
+            _aws_calls, ("service", "operation"),
+        )
+        lines.append("# HELP text_control_errors_total Errors by kind and type")
+        lines.append("# TYPE text_control_errors_total counter")
+        for (kind, error_type), count in sorted(_errors.items()):
+            lines.append(f"text_control_errors_total{{{_labels(kind=kind, type=error_type)}}} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _requests.clear()
+        _request_aws.clear()
+        _aws_calls.clear()
+        _errors.clear()
+
+
+def _start_profiler():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+    profiler = Profiler()
+    profiler.start()
+    return profiler
+
+
+def _profile_report(profiler):
+    """(body, mimetype) of a finished profile"""
+    if hasattr(profiler, "output_html"):
+        profiler.stop()
+        return profiler.output_html(), "text/html"
+    import io
+    import pstats
+
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+    return out.getvalue(), "text/plain"
+
+
+def init_app(app):
+    """Time every request of a Flask app, and profile those that ask for it"""
+    from flask import g, got_request_exception, request
+
+    @app.before_request
+    def _start():
+        g.metrics_started = start_request()
+        if config.PROFILE_REQUESTS and request.headers.get("X-Profile"):
+            g.profiler = _start_profiler()
+
+    @app.after_request
+    def _finish(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        seconds, spent = finish_request(started, request.method, route, response.status_code)
+        timings = [f"app;dur={seconds * 1000:.1f}"]
+        timings += [f"{service};dur={value * 1000:.1f}" for service, value in sorted(spent.items())]
+        response.headers["Server-Timing"] = ", ".join(timings)
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            body, mimetype = _profile_report(profiler)
+            response.headers["X-Profiled-Status"] = str(response.status_code)
+            response.set_data(body)
+            response.mimetype = mimetype
+            response.status_code = 200
+        return response
+
+    def _exception(sender, exception, **extra):
+        count_error("exception", type(exception).__name__)
+
+    got_request_exception.connect(_exception, app, weak=False)
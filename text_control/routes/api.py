@@ -2,12 +2,35 @@
 API routes - Handles all API endpoints
 """
 
+import itertools
+import json
 import uuid
 
-from flask import Blueprint, jsonify, request
-from services.chat_service import extract_actions_from_response, get_chat_response
-from services.database_service import delete_robot, get_robot, list_robots, upsert_robot
-from services.robot_service import process_actions
+import config
+import metrics
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
+from services.chat_service import (
+    action_plans,
+    chat_mode,
+    extract_actions_from_response,
+    get_chat_response,
+    get_robot_chat_responses,
+)
+from services.database_service import (
+    VIEWS,
+    VersionConflict,
+    batch_get_robots,
+    batch_write_robots,
+    cache_stats,
+    delete_robot,
+    get_robot,
+    iter_robot_pages,
+    list_robots_page,
+    update_robot,
+    upsert_robot,
+)
+from services.dispatch_service import WAIT_TIMEOUT, dispatch, dispatch_plans, get_job
+from services.robot_service import publish_groups, publish_groups_batch
 
 # Create a blueprint for the API routes
 api_bp = Blueprint("api", __name__)
@@ -15,7 +38,10 @@ api_bp = Blueprint("api", __name__)
 
 @api_bp.route("/chat", methods=["POST"])
 def chat():
-    """Handle chat requests with Nova Chatbot integration"""
+    """
+    Handle chat requests with Nova Chatbot integration. With "mode": "per_robot", each
+    robot answers from its own conversation and persona, and gets the actions it planned.
+    """
     user_message = request.json.get("message")
     selected_robots = request.json.get("robots")
     session_id = request.json.get("session_id", str(uuid.uuid4()))
@@ -24,6 +50,22 @@ def chat():
     if not isinstance(selected_robots, list):
         selected_robots = [selected_robots] if selected_robots else []
 
+    mode, error = chat_mode(request.json.get("mode"), selected_robots)
+    if error:
+        return jsonify({"error": error}), 400
+    if mode == "per_robot":
+        response_data = get_robot_chat_responses(user_message, selected_robots, session_id)
+        if "error" in response_data:
+            return jsonify(response_data), 500
+        plans = action_plans(response_data)
+        print(f"Actions to execute: {plans}")
+        if plans:
+            job = dispatch_plans(plans)
+            response_data["job_id"] = job.id
+            if job.finished:
+                response_data["actions_executed"] = job.actions_executed()
+        return jsonify(response_data)
+
     # Get response from Nova chatbot (use first robot for context, or None)
     context_robot = selected_robots[0] if selected_robots else None
     response_data = get_chat_response(user_message, context_robot, session_id)
@@ -38,34 +80,76 @@ def chat():
     print(f"Actions to execute: {actions_to_execute}")
 
     # Handle 'all' as mutually exclusive in backend as well
-    actions_executed = []
     robots_to_use = selected_robots
     if "all" in selected_robots:
-        # If 'all' is selected, ignore other selections and send to all robots 1-7
+        # If 'all' is selected, ignore other selections: one publish to the fleet topic
         robots_to_use = ["all"]
 
-    for robot in robots_to_use:
-        if actions_to_execute:
-            execution_results = process_actions(actions_to_execute, robot)
-            actions_executed.append({"robot": robot, "results": execution_results})
-
-    if actions_executed:
-        response_data["actions_executed"] = actions_executed
+    if actions_to_execute and robots_to_use:
+        job = dispatch(actions_to_execute, robots_to_use)
+        response_data["job_id"] = job.id
+        if job.finished:
+            # Inline dispatch: the results are already in
+            response_data["actions_executed"] = job.actions_executed()
 
     return jsonify(response_data)
 
 
 @api_bp.route("/robots", methods=["GET"])
 def robots_list():
-    robots = list_robots()
-    return jsonify(robots)
+    """
+    Robots in table order. ?view=summary leaves out context and other large attributes.
+    With ?limit= (and ?cursor= from the previous page's next_cursor) returns one page as
+    {"items": [...], "next_cursor": ...}; otherwise streams every robot as a JSON array.
+    """
+    view = request.args.get("view", "full")
+    if view not in VIEWS:
+        return jsonify({"error": f"Unknown view, expected one of {sorted(VIEWS)}"}), 400
+    if "limit" in request.args or "cursor" in request.args:
+        try:
+            limit = int(request.args.get("limit", 100))
+            if not 1 <= limit <= config.ROBOT_PAGE_LIMIT:
+                raise ValueError(f"limit must be 1 to {config.ROBOT_PAGE_LIMIT}")
+            return jsonify(list_robots_page(limit, request.args.get("cursor"), view))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+    pages = iter_robot_pages(view)
+    # Read the first page before responding, so a failing scan is still a 500
+    first = next(pages, [])
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield "["
+        separator = ""
+        for page in itertools.chain([first], pages):
+            if page:
+                yield separator + ",".join(dumps(item) for item in page)
+                separator = ","
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+@api_bp.route("/cache/robots", methods=["GET"])
+def robot_cache_stats():
+    return jsonify(cache_stats())
+
+
+@api_bp.route("/metrics", methods=["GET"])
+def metrics_text():
+    """Request, AWS call and error metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 
 @api_bp.route("/robots/<robot_id>", methods=["GET"])
 def robot_get(robot_id):
     robot = get_robot(robot_id)
     if robot:
-        return jsonify(robot)
+        response = jsonify(robot)
+        if robot.get("version"):
+            response.set_etag(robot["version"])
+        return response
     return jsonify({"error": "Not found"}), 404
 
 
@@ -75,26 +159,86 @@ def robot_create():
     robot_id = data.get("id")
     if not robot_id:
         return jsonify({"error": "Missing id"}), 400
-    robot = upsert_robot(robot_id, data)
+    try:
+        robot = upsert_robot(robot_id, data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    publish_groups(robot_id, robot["groups"])
     return jsonify(robot), 201
 
 
+@api_bp.route("/robots/batch", methods=["POST"])
+def robots_batch_write():
+    """
+    Create/replace and delete many robots: {"put": [robot, ...], "delete": [id, ...]}.
+    Returns a result per robot; a robot whose status is "unprocessed" can be sent again.
+    """
+    data = request.json or {}
+    puts = data.get("put", [])
+    deletes = data.get("delete", [])
+    if not isinstance(puts, list) or not isinstance(deletes, list):
+        return jsonify({"error": "put and delete must be lists"}), 400
+    if len(puts) + len(deletes) > config.ROBOT_BATCH_MAX:
+        return jsonify({"error": f"At most {config.ROBOT_BATCH_MAX} robots per batch"}), 400
+    results = batch_write_robots(puts, deletes)
+    groups = {}
+    for result in results:
+        if result["status"] == "ok":
+            groups[result["id"]] = result["item"]["groups"] if result["operation"] == "put" else None
+    publish_groups_batch(groups)
+    failed = sum(1 for result in results if result["status"] != "ok")
+    return jsonify({"results": results, "succeeded": len(results) - failed, "failed": failed})
+
+
+@api_bp.route("/robots/batch/get", methods=["POST"])
+def robots_batch_get():
+    """Many robots by ID: {"ids": [...]}"""
+    robot_ids = (request.json or {}).get("ids", [])
+    if not isinstance(robot_ids, list) or not all(isinstance(i, str) for i in robot_ids):
+        return jsonify({"error": "ids must be a list of robot IDs"}), 400
+    if len(robot_ids) > config.ROBOT_BATCH_MAX:
+        return jsonify({"error": f"At most {config.ROBOT_BATCH_MAX} robots per batch"}), 400
+    return jsonify(batch_get_robots(robot_ids))
+
+
 @api_bp.route("/robots/<robot_id>", methods=["PUT"])
 def robot_update(robot_id):
-    data = request.json
-    robot = upsert_robot(robot_id, data)
+    """
+    Change the given fields only; null removes a field, except robot_name and groups (400).
+    Send the version the edit started from, as "version" or in If-Match, to get a 409 with the current robot instead of overwriting someone's change.
+    """
+    data = request.json or {}
+    expected_version = request.headers.get("If-Match", "").strip('"') or data.get("version")
+    try:
+        robot = update_robot(robot_id, data, expected_version)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except VersionConflict as e:
+        if e.current is None:
+            return jsonify({"error": "Not found"}), 404
+        return jsonify({"error": str(e), "current": e.current}), 409
+    if "groups" in data:
+        publish_groups(robot_id, robot["groups"])
     return jsonify(robot)
 
 
 @api_bp.route("/robots/<robot_id>", methods=["DELETE"])
 def robot_delete(robot_id):
-    delete_robot(robot_id)
+    if not delete_robot(robot_id):
+        # The robot may still exist, so keep its group list
+        return jsonify({"error": "Failed to delete robot", "deleted": False}), 500
+    publish_groups(robot_id, None)
     return jsonify({"deleted": True})
 
 
 @api_bp.route("/run_action/<robot_id>", methods=["GET", "POST"])
 def run_action(robot_id):
-    """Run process_actions with provided action and robot"""
+    """
+    Publish one action (RunAction) or a stop (StopAction) to the robot as a dispatch job.
+    Returns 202 with job_id and job_url to follow, or, when the job has finished, 200 with
+    job_id and results. It has finished with DISPATCH_MODE=inline, or with "wait": true
+    unless publishing takes longer than WAIT_TIMEOUT seconds.
+    """
     data = request.json
     robot = robot_id or data.get("robot")
     method = data.get("method")
@@ -106,10 +250,50 @@ def run_action(robot_id):
     if not method or not action or not robot:
         return jsonify({"error": "Missing robot or method or params."}), 400
 
-    if method == "RunAction":
-        results = process_actions([action], robot)
-        return jsonify({"results": results})
-    if method == "StopAction":
-        results = process_actions(["stop"], robot)
-        return jsonify({"results": results})
-    return jsonify({"error": "Invalid method"}), 400
+    if method not in ("RunAction", "StopAction"):
+        return jsonify({"error": "Invalid method"}), 400
+    job = dispatch([action] if method == "RunAction" else ["stop"], [robot])
+    if data.get("wait"):
+        job.wait_finished(WAIT_TIMEOUT)
+    elif config.DISPATCH_MODE != "inline":
+        # 202 even if publishing was quick, so the reply never depends on timing
+        return jsonify({"job_id": job.id, "job_url": url_for("api.job_get", job_id=job.id)}), 202
+    if not job.finished:
+        return jsonify({"job_id": job.id, "job_url": url_for("api.job_get", job_id=job.id)}), 202
+    return jsonify({"job_id": job.id, "results": job.results(robot)})
+
+
+@api_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_get(job_id):
+    """Progress of a dispatch job, per robot and action"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.snapshot())
+
+
+@api_bp.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """Server-sent events: the job's progress on every change, until it finishes"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        revision = None
+        while True:
+            snapshot = job.snapshot()
+            if snapshot["revision"] != revision:
+                revision = snapshot["revision"]
+                yield f"event: progress\ndata: {json.dumps(snapshot)}\n\n"
+            if job.finished:
+                return
+            if job.wait(revision, timeout=15) == revision:
+                # Nothing happened: a comment keeps proxies from closing the stream
+                yield ": keep-alive\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,163 @@
+"""
+Async chat service - /chat for the ASGI app (asgi.py)
+
+Same replies and results as POST /chat in routes/api.py, but a request
+waiting on Bedrock or IoT holds no thread. The robot record comes from
+database_service's cache, on a worker thread when it has to go to
+DynamoDB. It is fetched while the Bedrock client is set up. Actions are a
+dispatch job (services/dispatch_service.py) run as a task on the event
+loop: all selected robots at once, each robot's actions in order, 0.1 s
+apart. In per_robot mode the robots' Bedrock calls are tasks too, at most
+CHAT_ROBOT_WORKERS at a time.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+import aio_clients
+import config
+from services.chat_service import (
+    action_plans,
+    chat_error,
+    chat_mode,
+    chat_reply,
+    combined_reply,
+    converse_request,
+    extract_actions_from_response,
+    robot_contexts,
+    robot_reply,
+    robot_session,
+)
+from services.database_service import get_robot
+from services.dispatch_service import ACTION_INTERVAL, DispatchJob, create_job
+from services.robot_service import action_payload, topic_for
+
+# Dispatch tasks still running; the event loop only keeps weak references
+_running = set()
+
+
+async def get_chat_response(
+    user_message: str, selected_robot: Optional[str], session_id: str
+) -> Dict[str, Any]:
+    """Get a response from the Nova chatbot"""
+    context, bedrock = await asyncio.gather(
+        asyncio.to_thread(get_robot, selected_robot), aio_clients.get("bedrock-runtime")
+    )
+    request = converse_request(user_message, context, session_id)
+    try:
+        response = await bedrock.converse(**request)
+        return chat_reply(response, session_id)
+    except Exception as e:
+        return chat_error(e, session_id)
+
+
+async def get_robot_chat_response(
+    user_message: str, robot_id: str, context: Optional[Dict[str, Any]], session_id: str, slots: asyncio.Semaphore
+) -> Dict[str, Any]:
+    """One robot's reply from its own conversation"""
+    robot_session_id = robot_session(session_id, robot_id)
+    async with slots:
+        bedrock = await aio_clients.get("bedrock-runtime")
+        request = converse_request(user_message, context, robot_session_id)
+        try:
+            reply = chat_reply(await bedrock.converse(**request), robot_session_id)
+        except Exception as e:
+            reply = chat_error(e, robot_session_id)
+    return robot_reply(reply, robot_id, session_id, user_message)
+
+
+async def get_robot_chat_responses(user_message: str, robot_ids: List[str], session_id: str) -> Dict[str, Any]:
+    """Every robot's reply, each from its own conversation and persona"""
+    robot_ids = list(dict.fromkeys(robot_ids))
+    contexts = await asyncio.to_thread(robot_contexts, robot_ids)
+    slots = asyncio.Semaphore(max(1, config.CHAT_ROBOT_WORKERS))
+    replies = await asyncio.gather(
+        *(get_robot_chat_response(user_message, robot_id, contexts[robot_id], session_id, slots) for robot_id in robot_ids)
+    )
+    return combined_reply(list(replies), session_id)
+
+
+async def execute_robot_action(message: str, selected_robot: str) -> bool:
+    """Publish one action to the robot's topic, or the fleet or group topic"""
+    topic = topic_for(selected_robot)
+    try:
+        iot = await aio_clients.get("iot-data")
+        await iot.publish(topic=topic, qos=config.IOT_PUBLISH_QOS, payload=action_payload(message))
+    except Exception as e:
+        print(f"Error publishing to {topic}: {e}")
+        return False
+    print(f"Published to {topic}: {message}")
+    return True
+
+
+async def run_robot(job: DispatchJob, robot: str):
+    """Publish one robot's actions in order"""
+    try:
+        job.started()
+        for index, step in enumerate(job.steps[robot]):
+            if index:
+                await asyncio.sleep(ACTION_INTERVAL)
+            job.step_done(robot, index, await execute_robot_action(step["action"], robot))
+    except Exception as e:
+        print(f"Error dispatching to {robot}: {e}")
+    finally:
+        job.robot_done()
+
+
+async def dispatch(actions: List[str], robots: List[str]) -> DispatchJob:
+    """dispatch_service.dispatch() on the event loop"""
+    return await dispatch_plans({robot: actions for robot in robots})
+
+
+async def dispatch_plans(plans: Dict[str, List[str]]) -> DispatchJob:
+    """dispatch_service.dispatch_plans() on the event loop"""
+    job = create_job(plans)
+    task = asyncio.ensure_future(asyncio.gather(*(run_robot(job, robot) for robot in plans)))
+    if config.DISPATCH_MODE == "inline":
+        await task
+    else:
+        _running.add(task)
+        task.add_done_callback(_running.discard)
+    return job
+
+
+async def chat(
+    user_message: str, selected_robots: Any, session_id: str, mode: Optional[str] = None
+) -> Tuple[Dict[str, Any], int]:
+    """The /chat reply and status code"""
+    # For backward compatibility, if robots is not a list, make it a list
+    if not isinstance(selected_robots, list):
+        selected_robots = [selected_robots] if selected_robots else []
+
+    mode, error = chat_mode(mode, selected_robots)
+    if error:
+        return {"error": error}, 400
+    if mode == "per_robot":
+        response_data = await get_robot_chat_responses(user_message, selected_robots, session_id)
+        if "error" in response_data:
+            return response_data, 500
+        plans = action_plans(response_data)
+        print(f"Actions to execute: {plans}")
+        if plans:
+            job = await dispatch_plans(plans)
+            response_data["job_id"] = job.id
+            if job.finished:
+                response_data["actions_executed"] = job.actions_executed()
+        return response_data, 200
+
+    context_robot = selected_robots[0] if selected_robots else None
+    response_data = await get_chat_response(user_message, context_robot, session_id)
+    if "error" in response_data:
+        return response_data, 500
+
+    actions_to_execute = extract_actions_from_response(response_data["response"], user_message)
+    print(f"Actions to execute: {actions_to_execute}")
+
+    # 'all' is one publish to the fleet topic and excludes the other selections
+    robots_to_use = ["all"] if "all" in selected_robots else selected_robots
+    if actions_to_execute and robots_to_use:
+        job = await dispatch(actions_to_execute, robots_to_use)
+        response_data["job_id"] = job.id
+        if job.finished:
+            response_data["actions_executed"] = job.actions_executed()
+    return response_data, 200
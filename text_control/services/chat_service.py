@@ -1,104 +1,182 @@
 """
 Chat service - Handles Nova chatbot integration
+
+By default a chat has one conversation, with the first selected robot's
+persona. In "per_robot" mode each selected robot has its own conversation
+with its own persona and plans its own actions. The robot records are read
+in one batch and the robots' Bedrock calls run at once, CHAT_ROBOT_WORKERS
+at a time, so the chat takes about as long as the slowest robot rather
+than the sum of them.
 """
 
-from typing import Any, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 
-import boto3
+import clients
 import config
-from botocore.config import Config
+import metrics
 from models.actions import get_available_actions
-from services.database_service import get_robot
+from services import prompt_builder
+from services.database_service import batch_get_robots, get_robot
+from services.robot_service import GROUP_PREFIX
 
 # Session storage for Nova conversation tracking
 active_sessions = {}
+# Summary of the turns trimmed from each session's history
+session_summaries = {}
+
+# "shared": one conversation, with the first robot's persona, and its actions
+# sent to every robot. "per_robot": a conversation and action plan per robot
+CHAT_MODES = {"shared", "per_robot"}
 
-# Initialize the Bedrock runtime client
-bedrock_runtime = boto3.client(
-    "bedrock-runtime",
-    config=Config(
-        region_name=config.AWS_BEDROCK_REGION,
-        retries={"max_attempts": 3, "mode": "standard"},
-    ),
-)
 
-# Nova Chatbot system prompt
-SYSTEM_PROMPT = f"""
-You are a helpful robot assistant. You control various robots that can perform physical actions.
+def converse_request(user_message: str, context: Optional[Dict[str, Any]], session_id: str) -> Dict[str, Any]:
+    """Add the user message to the session and return the converse() arguments"""
+    # Create or retrieve session history
+    if session_id not in active_sessions:
+        active_sessions[session_id] = []
 
-<background></background>
+    # Add user message to history
+    active_sessions[session_id].append({"role": "user", "content": user_message})
 
-Available commands are: {', '.join(get_available_actions())}.
+    # System prompt, and the history within the token budget
+    system, messages, session_summaries[session_id] = prompt_builder.build(
+        context, active_sessions[session_id], session_summaries.get(session_id, ""), config.NOVA_MODEL_ID
+    )
 
-When a user asks you to perform an action, respond in a friendly way and execute the command in order.
-If you need to execute multiple actions, separate them by commas, and don't said anything else.
-If you receive a simple command or list of commands, don't say anything else and return the commands.
-If a user asks for something that's not a valid action, politely inform them which actions are available.
-"""
+    return {
+        "modelId": config.NOVA_MODEL_ID,
+        "messages": messages,
+        "system": system,
+        "inferenceConfig": {"maxTokens": 1024, "temperature": 0.7, "topP": 0.9},
+        "additionalModelRequestFields": {"inferenceConfig": {"topK": 20}},
+    }
+
+
+def chat_reply(response: Dict[str, Any], session_id: str) -> Dict[str, Any]:
+    """Record Nova's converse() response in the session and return the chat reply"""
+    bot_response = response["output"]["message"]["content"][0]["text"]
+
+    # Add assistant response to history
+    active_sessions[session_id].append({"role": "assistant", "content": bot_response})
+
+    reply = {
+        "response": bot_response,
+        "session_id": session_id,
+    }
+    if "usage" in response:
+        # Input tokens, and how many of them came from the prompt cache
+        reply["usage"] = response["usage"]
+    return reply
+
+
+def chat_error(e: Exception, session_id: str) -> Dict[str, Any]:
+    print(f"Error calling Nova: {str(e)}")
+    return {
+        "response": f"I'm sorry, I encountered an error: {str(e)}",
+        "session_id": session_id,
+        "error": str(e),
+    }
 
 
 def get_chat_response(
     user_message: str, selected_robot: str, session_id: str
 ) -> Dict[str, Any]:
     """Get a response from the Nova chatbot"""
-    context = get_robot(selected_robot)
-    if context:
-        name = context.get("robot_name")
-        background = context.get("context")
-        system_prompt = SYSTEM_PROMPT.replace(
-            "<background></background>",
-            f"""
-<background>Your Name:{name} 
-background: {background}
-</background>
-            """,
-        )
-    else:
-        system_prompt = SYSTEM_PROMPT.replace("<background></background>", "")
+    request = converse_request(user_message, get_robot(selected_robot), session_id)
 
-    # Create or retrieve session history
-    if session_id not in active_sessions:
-        active_sessions[session_id] = []
+    # Call Nova via Bedrock API using converse method
+    try:
+        response = clients.get("bedrock-runtime").converse(**request)
+        return chat_reply(response, session_id)
+    except Exception as e:
+        return chat_error(e, session_id)
 
-    # Add user message to history
-    active_sessions[session_id].append({"role": "user", "content": user_message})
 
-    # Convert message history to the format expected by converse API
-    messages = []
-    for msg in active_sessions[session_id]:
-        messages.append({"role": msg["role"], "content": [{"text": msg["content"]}]})
+def robot_session(session_id: str, robot_id: str) -> str:
+    """Key of one robot's conversation within a per_robot chat session"""
+    return f"{session_id}:{robot_id}"
 
-    system = [{"text": system_prompt}]
 
-    # Call Nova via Bedrock API using converse method
+def robot_contexts(robot_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Each robot's record (None for groups and unknown IDs), read in one batch"""
+    ids = [robot_id for robot_id in robot_ids if not robot_id.startswith(GROUP_PREFIX)]
+    contexts = dict.fromkeys(robot_ids)
+    if ids:
+        found = batch_get_robots(ids)
+        for robot in found["robots"]:
+            contexts[robot["id"]] = robot
+        for robot_id in found["unprocessed"]:
+            contexts[robot_id] = get_robot(robot_id)
+    return contexts
+
+
+def robot_reply(reply: Dict[str, Any], robot_id: str, session_id: str, user_message: str) -> Dict[str, Any]:
+    """One robot's reply in a per_robot chat, with the actions it planned"""
+    reply["robot"] = robot_id
+    reply["session_id"] = session_id
+    reply["actions"] = [] if "error" in reply else extract_actions_from_response(reply["response"], user_message)
+    return reply
+
+
+def get_robot_chat_response(
+    user_message: str, robot_id: str, context: Optional[Dict[str, Any]], session_id: str
+) -> Dict[str, Any]:
+    """One robot's reply from its own conversation"""
+    robot_session_id = robot_session(session_id, robot_id)
+    request = converse_request(user_message, context, robot_session_id)
     try:
-        response = bedrock_runtime.converse(
-            modelId=config.NOVA_MODEL_ID,
-            messages=messages,
-            system=system,
-            inferenceConfig={"maxTokens": 1024, "temperature": 0.7, "topP": 0.9},
-            additionalModelRequestFields={"inferenceConfig": {"topK": 20}},
+        response = clients.get("bedrock-runtime").converse(**request)
+        reply = chat_reply(response, robot_session_id)
+    except Exception as e:
+        reply = chat_error(e, robot_session_id)
+    return robot_reply(reply, robot_id, session_id, user_message)
+
+
+def combined_reply(replies: List[Dict[str, Any]], session_id: str) -> Dict[str, Any]:
+    """
+    The per_robot chat reply: each robot's reply under "responses", and a "response"
+    with one line per robot. An "error" only when every robot failed.
+    """
+    response_data = {
+        "response": "\n".join(f"{reply['robot']}: {reply['response']}" for reply in replies),
+        "session_id": session_id,
+        "responses": replies,
+    }
+    if replies and all("error" in reply for reply in replies):
+        response_data["error"] = replies[0]["error"]
+    return response_data
+
+
+def get_robot_chat_responses(user_message: str, robot_ids: List[str], session_id: str) -> Dict[str, Any]:
+    """Every robot's reply, each from its own conversation and persona"""
+    robot_ids = list(dict.fromkeys(robot_ids))
+    contexts = robot_contexts(robot_ids)
+    with ThreadPoolExecutor(max_workers=max(1, min(len(robot_ids), config.CHAT_ROBOT_WORKERS))) as executor:
+        replies = metrics.pool_map(
+            executor,
+            lambda robot_id: get_robot_chat_response(user_message, robot_id, contexts[robot_id], session_id),
+            robot_ids,
         )
+    return combined_reply(replies, session_id)
 
-        bot_response = response["output"]["message"]["content"][0]["text"]
 
-        # Add assistant response to history
-        active_sessions[session_id].append(
-            {"role": "assistant", "content": bot_response}
-        )
+def action_plans(response_data: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Robot -> actions planned, from a per_robot chat reply"""
+    return {reply["robot"]: reply["actions"] for reply in response_data["responses"] if reply["actions"]}
 
-        return {
-            "response": bot_response,
-            "session_id": session_id,
-        }
 
-    except Exception as e:
-        print(f"Error calling Nova: {str(e)}")
-        return {
-            "response": f"I'm sorry, I encountered an error: {str(e)}",
-            "session_id": session_id,
-            "error": str(e),
-        }
+def chat_mode(mode: Optional[str], selected_robots: List[str]) -> Tuple[str, Optional[str]]:
+    """
+    (mode, error) for a /chat request: its "mode", or CHAT_MODE. "all" is one
+    publish to the fleet, so a chat that selects it is always "shared".
+    """
+    mode = mode or config.CHAT_MODE
+    if mode not in CHAT_MODES:
+        return mode, f"Unknown mode, expected one of {sorted(CHAT_MODES)}"
+    if "all" in selected_robots or not selected_robots:
+        return "shared", None
+    return mode, None
 
 
 def extract_actions_from_response(bot_response: str, user_message: str) -> List[str]:
@@ -1,50 +1,404 @@
 """
 Database service layer - Provides higher-level database operations
+
+Robot records are read on every /chat call but almost never change, so
+get_robot reads through an in-process cache. Records are kept for
+ROBOT_CACHE_TTL seconds and unknown IDs for ROBOT_CACHE_NEGATIVE_TTL.
+upsert_robot and delete_robot update the cache of the instance that wrote.
+Other instances (other Lambda containers) see the change when their entry
+expires or, with ROBOT_CACHE_REVALIDATE set, when a check of the record's
+version attribute no longer matches. That check reads only the version,
+not the whole record.
 """
 
-from typing import Any, Dict, List, Optional
+import base64
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
 
+import config
+from database import batch_get_robots as db_batch_get_robots
+from database import batch_write_robots as db_batch_write_robots
 from database import delete_robot as db_delete_robot
 from database import get_robot as db_get_robot
+from database import get_robot_version as db_get_robot_version
+from database import iter_robot_pages as db_iter_robot_pages
 from database import list_robots as db_list_robots
+from database import scan_robots as db_scan_robots
+from database import update_robot as db_update_robot
 from database import upsert_robot as db_upsert_robot
+from database import VersionConflict  # noqa: F401  (re-exported for the routes)
+
+# Attributes returned by each listing view; None returns whole items
+VIEWS = {
+    "full": None,
+    "summary": ["id", "robot_name", "groups", "version"],
+}
+
+# Attributes every robot has, and their values when a write leaves them out
+REQUIRED_FIELDS = {"robot_name": "Unknown", "groups": []}
+
+# Group names become MQTT topic levels: no "/", "+" or "#"
+GROUP_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+def normalize_groups(groups: Any) -> List[str]:
+    """Group list from a list or a comma-separated string; raises ValueError on a bad name"""
+    if isinstance(groups, str):
+        groups = groups.split(",")
+    if not isinstance(groups, list):
+        raise ValueError("groups must be a list of names")
+    names = [str(g).strip() for g in groups if str(g).strip()]
+    for name in names:
+        if not GROUP_NAME.match(name):
+            raise ValueError(f"Invalid group name: {name}")
+    return sorted(set(names))
+
+
+class RobotCache:
+    """
+    TTL cache of robot records by ID, least recently used evicted first.
+
+    Writes go through store() and invalidate(), which bump a generation. A read
+    that missed takes generation() before reading the table and fills with
+    fill(), which drops the item if a write happened meanwhile: it may be
+    older than what the write stored.
+    """
+
+    def __init__(self, ttl, negative_ttl, revalidate=0.0, max_entries=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.revalidate = revalidate
+        self.max_entries = max_entries
+        self._clock = clock
+        # robot ID -> [item or None, loaded at, version checked at]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.stale = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._hit_seconds = 0.0
+        self._miss_seconds = 0.0
+
+    def lookup(self, robot_id):
+        """(found, item, needs version check); item None is a cached unknown ID"""
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(robot_id)
+            if entry is None:
+                return False, None, False
+            item, loaded_at, checked_at = entry
+            if now - loaded_at >= (self.ttl if item is not None else self.negative_ttl):
+                del self._entries[robot_id]
+                return False, None, False
+            self._entries.move_to_end(robot_id)
+            check = item is not None and self.revalidate > 0 and now - checked_at >= self.revalidate
+            return True, item, check
+
+    def _put(self, robot_id, item):
+        # Called with _lock held
+        now = self._clock()
+        self._entries[robot_id] = [item, now, now]
+        self._entries.move_to_end(robot_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def generation(self):
+        """Take before reading the table for fill()"""
+        with self._lock:
+            return self._generation
+
+    def store(self, robot_id, item):
+        """Cache what a write just stored"""
+        with self._lock:
+            self._generation += 1
+            self._put(robot_id, item)
+
+    def fill(self, robot_id, item, generation):
+        """Cache what a read found, unless a write happened since generation()"""
+        with self._lock:
+            if generation == self._generation:
+                self._put(robot_id, item)
+
+    def checked(self, robot_id, current):
+        """Record a version check; a current entry is trusted for another revalidate seconds"""
+        with self._lock:
+            self.revalidations += 1
+            if not current:
+                self.stale += 1
+                return
+            entry = self._entries.get(robot_id)
+            if entry is not None:
+                entry[2] = self._clock()
+
+    def invalidate(self, robot_id=None):
+        """Forget one robot, or every robot"""
+        with self._lock:
+            self._generation += 1
+            if robot_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(robot_id, None)
+            self.invalidations += 1
+
+    def record(self, hit, negative, seconds):
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self.negative_hits += negative
+                self._hit_seconds += seconds
+            else:
+                self.misses += 1
+                self._miss_seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "revalidations": self.revalidations,
+                "stale": self.stale,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "hit_ms_avg": 1000.0 * self._hit_seconds / self.hits if self.hits else 0.0,
+                "miss_ms_avg": 1000.0 * self._miss_seconds / self.misses if self.misses else 0.0,
+            }
+
+
+robot_cache = RobotCache(
+    config.ROBOT_CACHE_TTL,
+    config.ROBOT_CACHE_NEGATIVE_TTL,
+    config.ROBOT_CACHE_REVALIDATE,
+    config.ROBOT_CACHE_MAX_ENTRIES,
+)
 
 
 def get_robot(robot_id: str) -> Optional[Dict[str, Any]]:
     """Get a robot by ID with enhanced error handling"""
+    started = time.perf_counter()
+    found, item, check = robot_cache.lookup(robot_id)
+    if check:
+        try:
+            version = db_get_robot_version(robot_id)
+        except Exception as e:
+            # Serve the cached copy rather than fail the chat
+            print(f"Error checking robot {robot_id} version: {str(e)}")
+            version = item.get("version", "")
+        current = version == item.get("version", "")
+        robot_cache.checked(robot_id, current)
+        found = current
+    if found:
+        robot_cache.record(True, item is None, time.perf_counter() - started)
+        return dict(item) if item is not None else None
+    generation = robot_cache.generation()
     try:
-        return db_get_robot(robot_id)
+        item = db_get_robot(robot_id)
     except Exception as e:
+        # Errors are not cached: the next call tries the table again
         print(f"Error getting robot {robot_id}: {str(e)}")
         return None
+    robot_cache.fill(robot_id, item, generation)
+    robot_cache.record(False, False, time.perf_counter() - started)
+    return dict(item) if item is not None else None
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Hit rate and latency of the robot record cache"""
+    return robot_cache.stats()
+
+
+def _check_required(data: Dict[str, Any]) -> None:
+    """Raise ValueError if data sets a required field to null"""
+    for field in REQUIRED_FIELDS:
+        if field in data and data[field] is None:
+            raise ValueError(f"{field} cannot be null")
+
+
+def _prepare_robot(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill defaults and normalize groups; raises ValueError on invalid data"""
+    _check_required(data)
+    for field, default in REQUIRED_FIELDS.items():
+        if field not in data:
+            data[field] = default
+    data["groups"] = normalize_groups(data["groups"])
+    return data
 
 
 def upsert_robot(robot_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
     """Create or update a robot with validation"""
-    required_fields = ["robot_name"]
+    data = _prepare_robot(data)
+    item = db_upsert_robot(robot_id, data)
+    # Write-through: this instance serves the new record without a read
+    robot_cache.store(robot_id, item)
+    return item
 
-    # Ensure required fields are present
-    for field in required_fields:
-        if field not in data:
-            data[field] = "Unknown"  # Set default value
 
-    return db_upsert_robot(robot_id, data)
+def update_robot(
+    robot_id: str, data: Dict[str, Any], expected_version: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Change only the given fields of a robot, creating it if needed, and return the new record.
+    A null removes an optional field; a null robot_name or groups raises ValueError.
+    With expected_version, raises VersionConflict if someone else changed the robot since.
+    """
+    data = {key: value for key, value in data.items() if key not in ("id", "version")}
+    _check_required(data)
+    if "groups" in data:
+        data["groups"] = normalize_groups(data["groups"])
+    try:
+        item = db_update_robot(robot_id, data, expected_version, defaults=REQUIRED_FIELDS)
+    except VersionConflict as e:
+        # Whatever the caller re-reads next should be the current record
+        robot_cache.store(robot_id, e.current)
+        raise
+    robot_cache.store(robot_id, item)
+    return item
 
 
 def delete_robot(robot_id: str) -> bool:
     """Delete a robot by ID with confirmation"""
     try:
         db_delete_robot(robot_id)
+        robot_cache.invalidate(robot_id)
         return True
     except Exception as e:
         print(f"Error deleting robot {robot_id}: {str(e)}")
         return False
 
 
-def list_robots() -> List[Dict[str, Any]]:
+def list_robots(view: str = "full") -> List[Dict[str, Any]]:
     """List all robots with enhanced error handling"""
     try:
-        return db_list_robots()
+        return db_list_robots(VIEWS[view], config.ROBOT_SCAN_SEGMENTS)
     except Exception as e:
         print(f"Error listing robots: {str(e)}")
         return []
+
+
+def encode_cursor(start_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    if not start_key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(start_key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The scan position a cursor stands for; raises ValueError on a cursor we did not issue"""
+    if not cursor:
+        return None
+    try:
+        start_key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(start_key, dict) or set(start_key) != {"id"} or not isinstance(start_key["id"], str):
+        raise ValueError("Invalid cursor")
+    return start_key
+
+
+def list_robots_page(limit: int, cursor: Optional[str] = None, view: str = "full") -> Dict[str, Any]:
+    """
+    Up to limit robots in table order, from the position cursor names.
+    Returns {"items": [...], "next_cursor": str or None}; None means the listing is complete.
+    """
+    items, start_key = db_scan_robots(limit=limit, start_key=decode_cursor(cursor), attributes=VIEWS[view])
+    return {"items": items, "next_cursor": encode_cursor(start_key)}
+
+
+def iter_robot_pages(view: str = "full") -> Iterator[List[Dict[str, Any]]]:
+    """Every robot, a scan page at a time, for streaming; errors propagate"""
+    return db_iter_robot_pages(VIEWS[view], config.ROBOT_SCAN_SEGMENTS)
+
+
+def batch_write_robots(puts: List[Any], deletes: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Create/replace and delete many robots with batch writes.
+    Returns one result per input: {"id", "operation", "status": "ok" | "error" | "unprocessed"},
+    with "error" for invalid input and "item" for written robots.
+    """
+    results = []
+    seen = set()
+    items = []
+    robot_ids = []
+    for operation, values in (("put", puts), ("delete", deletes)):
+        for value in values:
+            robot_id = value.get("id") if operation == "put" and isinstance(value, dict) else value
+            result = {"id": robot_id, "operation": operation}
+            results.append(result)
+            if not isinstance(robot_id, str) or not robot_id:
+                result.update(status="error", error="Missing id")
+            elif robot_id in seen:
+                # One batch may not touch the same key twice
+                result.update(status="error", error="Duplicate id in batch")
+            else:
+                try:
+                    if operation == "put":
+                        items.append(_prepare_robot(dict(value)))
+                    else:
+                        robot_ids.append(robot_id)
+                    seen.add(robot_id)
+                except ValueError as e:
+                    result.update(status="error", error=str(e))
+
+    written, failed = db_batch_write_robots(items, robot_ids, config.ROBOT_BATCH_WORKERS)
+    failed = set(failed)
+    written = {item["id"]: item for item in written}
+    for result in results:
+        robot_id = result["id"]
+        if "status" in result:
+            continue
+        if robot_id in failed:
+            result["status"] = "unprocessed"
+            robot_cache.invalidate(robot_id)
+        elif result["operation"] == "put":
+            result.update(status="ok", item=written[robot_id])
+            robot_cache.store(robot_id, written[robot_id])
+        else:
+            result["status"] = "ok"
+            robot_cache.invalidate(robot_id)
+    return results
+
+
+def batch_get_robots(robot_ids: List[str]) -> Dict[str, Any]:
+    """
+    Many robots by ID, from the cache where possible and batch reads otherwise.
+    Returns {"robots": [...], "missing": [IDs with no robot], "unprocessed": [IDs not read]}.
+    """
+    robot_ids = list(dict.fromkeys(robot_ids))
+    robots = []
+    missing = []
+    to_read = []
+    for robot_id in robot_ids:
+        found, item, check = robot_cache.lookup(robot_id)
+        if found and not check:
+            if item is None:
+                missing.append(robot_id)
+            else:
+                robots.append(dict(item))
+        else:
+            to_read.append(robot_id)
+    if to_read:
+        generation = robot_cache.generation()
+        items, unprocessed = db_batch_get_robots(to_read, config.ROBOT_BATCH_WORKERS)
+        for item in items:
+            robot_cache.fill(item["id"], item, generation)
+            robots.append(dict(item))
+        read = {item["id"] for item in items} | set(unprocessed)
+        for robot_id in to_read:
+            if robot_id not in read:
+                robot_cache.fill(robot_id, None, generation)
+                missing.append(robot_id)
+    else:
+        unprocessed = []
+    return {"robots": robots, "missing": missing, "unprocessed": unprocessed}
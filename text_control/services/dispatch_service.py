@@ -0,0 +1,174 @@
+"""
+Dispatch service - Publishes actions to robots as jobs that can be followed
+
+A job holds the actions for each robot (the same for every robot, or a
+plan per robot) and the state of every step (pending, sent or failed). Each robot gets its actions in order, 0.1 s
+apart; robots are served in parallel.
+
+With DISPATCH_MODE "thread" a job is published in the background and the
+caller returns at once with the job ID, to follow at /jobs/<id>. With
+"inline" dispatch() returns when the job is done. Jobs live in this
+process only and are forgotten DISPATCH_JOB_TTL seconds after they finish.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+import config
+import metrics
+from models.actions import ACTIONS
+from services.robot_service import execute_robot_action
+
+# Seconds between two actions for the same robot
+ACTION_INTERVAL = 0.1
+# Longest a caller that asked to wait for a job is kept waiting
+WAIT_TIMEOUT = 30.0
+
+
+class DispatchJob:
+    """Actions for a set of robots and how far publishing them has got"""
+
+    def __init__(self, plans: Dict[str, List[str]]):
+        self.id = uuid4().hex
+        self.created_at = time.time()
+        self.finished_at = None
+        self.state = "queued"
+        self.steps = {
+            robot: [
+                {"action": action, "name": ACTIONS[action]["name"], "state": "pending"}
+                for action in actions
+                if action in ACTIONS
+            ]
+            for robot, actions in plans.items()
+        }
+        self.revision = 0
+        self._remaining = len(plans)
+        self._changed = threading.Condition()
+        if not plans:
+            self.state = "done"
+            self.finished_at = self.created_at
+
+    def _update(self):
+        # Called with _changed held
+        self.revision += 1
+        self._changed.notify_all()
+
+    def started(self):
+        with self._changed:
+            if self.state == "queued":
+                self.state = "running"
+                self._update()
+
+    def step_done(self, robot: str, index: int, success: bool):
+        with self._changed:
+            self.steps[robot][index]["state"] = "sent" if success else "failed"
+            self._update()
+
+    def robot_done(self):
+        with self._changed:
+            self._remaining -= 1
+            if self._remaining <= 0:
+                failed = any(step["state"] == "failed" for steps in self.steps.values() for step in steps)
+                self.state = "failed" if failed else "done"
+                self.finished_at = time.time()
+            self._update()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "failed")
+
+    def wait(self, revision: int, timeout: float) -> int:
+        """Block until the job changes after revision, or timeout; returns the current revision"""
+        with self._changed:
+            self._changed.wait_for(lambda: self.revision != revision, timeout)
+            return self.revision
+
+    def wait_finished(self, timeout: float) -> bool:
+        """Block until the job finishes, or timeout; returns whether it finished"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.finished, timeout)
+
+    def results(self, robot: str) -> List[Dict[str, Any]]:
+        """One robot's results: action, success and name per action"""
+        with self._changed:
+            return [
+                {"action": step["action"], "success": step["state"] == "sent", "name": step["name"]}
+                for step in self.steps[robot]
+            ]
+
+    def actions_executed(self) -> List[Dict[str, Any]]:
+        """Results per robot, as /chat has always returned them"""
+        return [{"robot": robot, "results": self.results(robot)} for robot in self.steps]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._changed:
+            return {
+                "job_id": self.id,
+                "state": self.state,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+                "revision": self.revision,
+                "robots": [
+                    {"robot": robot, "actions": [dict(step) for step in steps]}
+                    for robot, steps in self.steps.items()
+                ],
+            }
+
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=config.DISPATCH_WORKERS, thread_name_prefix="dispatch")
+
+
+def create_job(plans: Dict[str, List[str]]) -> DispatchJob:
+    """A new job for each robot's actions, findable by get_job() until it expires"""
+    job = DispatchJob(plans)
+    now = time.time()
+    with _jobs_lock:
+        _jobs[job.id] = job
+        # Oldest first: drop finished jobs past their TTL, then anything over the cap
+        for job_id, old in list(_jobs.items()):
+            if len(_jobs) <= config.DISPATCH_MAX_JOBS and not (
+                old.finished and now - old.finished_at > config.DISPATCH_JOB_TTL
+            ):
+                break
+            del _jobs[job_id]
+    return job
+
+
+def get_job(job_id: str) -> Optional[DispatchJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def run_robot(job: DispatchJob, robot: str):
+    """Publish one robot's actions in order"""
+    try:
+        job.started()
+        for index, step in enumerate(job.steps[robot]):
+            if index:
+                time.sleep(ACTION_INTERVAL)
+            job.step_done(robot, index, execute_robot_action(step["action"], robot))
+    except Exception as e:
+        print(f"Error dispatching to {robot}: {e}")
+    finally:
+        job.robot_done()
+
+
+def dispatch(actions: List[str], robots: List[str]) -> DispatchJob:
+    """Publish actions to every robot; returns at once in thread mode, when done in inline mode"""
+    return dispatch_plans({robot: actions for robot in robots})
+
+
+def dispatch_plans(plans: Dict[str, List[str]]) -> DispatchJob:
+    """dispatch() with each robot's own actions"""
+    job = create_job(plans)
+    futures = [metrics.submit(_executor, run_robot, job, robot) for robot in plans]
+    if config.DISPATCH_MODE == "inline":
+        for future in futures:
+            future.result()
+    return job
@@ -0,0 +1,175 @@
+"""
+Prompt builder - Assembles the system prompt and history sent to Nova
+
+The system prompt for a robot only changes with its record, so it is
+rendered once per (robot ID, record version) and reused.
+
+A session's history is kept within PROMPT_TOKEN_BUDGET tokens, estimated
+at four characters a token. Once a request would pass the budget, the
+oldest turns are folded into a short summary, down to PROMPT_TRIM_TO of
+the budget. The summary goes into the system prompt, and the next trim
+only happens after the history has grown again. That way the prefix of the
+request stays the same across many turns, which is what prompt caching
+needs.
+
+When the model supports prompt caching, a cachePoint marks the end of the
+system prompt and another marks the end of the previous turn. Bedrock
+then only processes the new turn in full. A checkpoint is only placed
+after PROMPT_CACHE_MIN_TOKENS tokens, since shorter prefixes are not
+cached.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from models.actions import get_available_actions
+
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+# Characters kept from each trimmed message in the summary
+SUMMARY_EXCERPT = 120
+
+_prompts = OrderedDict()
+_prompts_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def system_prompt_template() -> str:
+    """Nova Chatbot system prompt, built from the action catalog on first use"""
+    return f"""
+You are a helpful robot assistant. You control various robots that can perform physical actions.
+
+<background></background>
+
+Available commands are: {', '.join(get_available_actions())}.
+
+When a user asks you to perform an action, respond in a friendly way and execute the command in order.
+If you need to execute multiple actions, separate them by commas, and don't said anything else.
+If you receive a simple command or list of commands, don't say anything else and return the commands.
+If a user asks for something that's not a valid action, politely inform them which actions are available.
+"""
+
+
+def render_system_prompt(context: Optional[Dict[str, Any]]) -> str:
+    """System prompt with the robot's name and background, if it has a record"""
+    if context:
+        name = context.get("robot_name")
+        background = context.get("context")
+        return system_prompt_template().replace(
+            "<background></background>",
+            f"""
+<background>Your Name:{name}
+background: {background}
+</background>
+            """,
+        )
+    return system_prompt_template().replace("<background></background>", "")
+
+
+def system_prompt(context: Optional[Dict[str, Any]]) -> str:
+    """render_system_prompt(), cached per robot ID and record version"""
+    if not context or not context.get("version"):
+        return render_system_prompt(context)
+    key = (context.get("id"), context["version"])
+    with _prompts_lock:
+        prompt = _prompts.get(key)
+        if prompt is not None:
+            _prompts.move_to_end(key)
+            return prompt
+    prompt = render_system_prompt(context)
+    with _prompts_lock:
+        _prompts[key] = prompt
+        while len(_prompts) > config.PROMPT_CACHE_MAX_ENTRIES:
+            _prompts.popitem(last=False)
+    return prompt
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def supports_cache_points(model_id: str) -> bool:
+    if config.PROMPT_CACHE_POINTS != "auto":
+        return config.PROMPT_CACHE_POINTS == "true"
+    return "amazon.nova" in model_id or "anthropic.claude" in model_id
+
+
+def _summarize(summary: str, trimmed: List[Dict[str, str]]) -> str:
+    """summary extended with an excerpt of each trimmed message, cut to PROMPT_SUMMARY_TOKENS"""
+    lines = [summary] if summary else []
+    for msg in trimmed:
+        speaker = "User" if msg["role"] == "user" else "You"
+        text = " ".join(msg["content"].split())
+        if len(text) > SUMMARY_EXCERPT:
+            text = text[:SUMMARY_EXCERPT] + "..."
+        lines.append(f"{speaker}: {text}")
+    text = "\n".join(lines)
+    # Keep the most recent part
+    return text[-config.PROMPT_SUMMARY_TOKENS * 4:]
+
+
+def trim_history(history: List[Dict[str, str]], summary: str, fixed_tokens: int) -> str:
+    """
+    Fold the oldest turns of history (in place) into summary once history, summary and
+    fixed_tokens pass the token budget; returns the summary. Budget 0 keeps everything.
+    """
+    budget = config.PROMPT_TOKEN_BUDGET
+    if not budget:
+        return summary
+    sizes = [estimate_tokens(msg["content"]) for msg in history]
+    total = fixed_tokens + estimate_tokens(summary) + sum(sizes)
+    if total <= budget:
+        return summary
+    target = budget * config.PROMPT_TRIM_TO
+    keep_from = 0
+    # Keep at least the last PROMPT_MIN_MESSAGES
+    while keep_from < len(history) - config.PROMPT_MIN_MESSAGES and total > target:
+        total -= sizes[keep_from]
+        keep_from += 1
+    # Converse rejects a conversation that opens with the assistant, so that wins over
+    # the minimum; the last message is the new user turn
+    while keep_from < len(history) - 1 and history[keep_from]["role"] != "user":
+        keep_from += 1
+    if keep_from:
+        summary = _summarize(summary, history[:keep_from])
+        del history[:keep_from]
+    return summary
+
+
+def _merged(history: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Converse messages, with consecutive messages from the same role joined into one"""
+    messages = []
+    for msg in history:
+        if messages and messages[-1]["role"] == msg["role"]:
+            messages[-1]["content"][0]["text"] += "\n" + msg["content"]
+        else:
+            messages.append({"role": msg["role"], "content": [{"text": msg["content"]}]})
+    return messages
+
+
+def build(
+    context: Optional[Dict[str, Any]], history: List[Dict[str, str]], summary: str, model_id: str
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], str]:
+    """(system, messages, summary) for converse(); trims history in place to the token budget"""
+    prompt = system_prompt(context)
+    prompt_tokens = estimate_tokens(prompt)
+    summary = trim_history(history, summary, prompt_tokens)
+    messages = _merged(history)
+
+    system = [{"text": prompt}]
+    cache = supports_cache_points(model_id)
+    cached_tokens = prompt_tokens
+    if cache and cached_tokens >= config.PROMPT_CACHE_MIN_TOKENS:
+        system.append(dict(CACHE_POINT))
+    if summary:
+        system.append({"text": f"Summary of the earlier conversation:\n{summary}"})
+        cached_tokens += estimate_tokens(summary)
+    if cache and len(messages) > 1:
+        # End of the previous turn: everything before the new user message
+        cached_tokens += sum(estimate_tokens(m["content"][0]["text"]) for m in messages[:-1])
+        if cached_tokens >= config.PROMPT_CACHE_MIN_TOKENS:
+            messages[-2]["content"].append(dict(CACHE_POINT))
+    return system, messages, summary
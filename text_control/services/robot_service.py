@@ -2,75 +2,70 @@
 Robot service - Handles robot action execution
 """
 
+import json
+import time
 from concurrent.futures import ThreadPoolExecutor
-from time import sleep
-from typing import Any, Dict, List
+from typing import Dict, List, Optional
+from uuid import uuid4
 
-import boto3
-from botocore.config import Config
-from models.actions import ACTIONS
+import clients
+import config
+import metrics
 
-# Initialize AWS clients with retry configuration
-iot_client = boto3.client(
-    "iot-data",
-    config=Config(retries={"max_attempts": 3, "mode": "standard"}),
-)
+# Selecting "group:<name>" sends to every robot in that group
+GROUP_PREFIX = "group:"
+
+
+def action_payload(message: str) -> bytes:
+    """Action message with a unique messageId, so robots can drop redeliveries"""
+    return json.dumps(
+        {"toolName": message, "messageId": uuid4().hex, "sentAt": round(time.time(), 3)}
+    ).encode("utf-8")
+
+
+def topic_for(target: str) -> str:
+    """IoT topic for a robot ID, 'all' or 'group:<name>'"""
+    if target == "all":
+        return config.FLEET_TOPIC
+    if target.startswith(GROUP_PREFIX):
+        return config.GROUP_TOPIC_PREFIX + target[len(GROUP_PREFIX):]
+    return f"{target}/topic"
+
+
+def publish(topic: str, payload: bytes, retain: bool = False) -> bool:
+    try:
+        clients.get("iot-data").publish(
+            topic=topic,
+            qos=config.IOT_PUBLISH_QOS,
+            retain=retain,
+            payload=payload,
+        )
+        return True
+    except Exception as e:
+        print(f"Error publishing to {topic}: {e}")
+        return False
 
 
 def execute_robot_action(message: str, selected_robot: str) -> bool:
     """Execute a robot action by publishing to the appropriate IoT topic"""
-    if selected_robot == "all":
-        # If 'all' is selected, publish to all robots 1-7
-        def publish_to_robot(robot_id):
-            topic = f"robot_{robot_id}/topic"
-            try:
-                iot_client.publish(
-                    topic=topic,
-                    qos=0,
-                    retain=False,
-                    payload=bytes(f'{{ "toolName": "{message}" }}', "utf-8"),
-                )
-                print(f"Published to {topic}: {message}")
-                return True
-            except Exception as e:
-                print(f"Error publishing to {topic}: {e}")
-                return False
-
-        with ThreadPoolExecutor() as executor:
-            futures = list(executor.map(publish_to_robot, range(1, 10)))
-            return all(futures)
-    else:
-        topic = f"{selected_robot}/topic"
-        try:
-            iot_client.publish(
-                topic=topic,
-                qos=0,
-                retain=False,
-                payload=bytes(f'{{ "toolName": "{message}" }}', "utf-8"),
-            )
-            print(f"Published to {topic}: {message}")
-            return True
-        except Exception as e:
-            print(f"Error publishing to {topic}: {e}")
-            return False
-
-
-def process_actions(
-    actions_to_execute: List[str], selected_robot: str
-) -> List[Dict[str, Any]]:
-    """Process a list of actions sequentially"""
-    results = []
-
-    for action in actions_to_execute:
-        if action in ACTIONS:
-            success = execute_robot_action(action, selected_robot)
-            results.append(
-                {"action": action, "success": success, "name": ACTIONS[action]["name"]}
-            )
-            sleep(0.1)
-        # else:
-        #     results.append(
-        #         {"action": action, "success": False, "error": "Invalid action"}
-        #     )
-    print(f"results: {results}")
-    return results
+    # "all" and groups are fleet topics: one publish reaches every member
+    topic = topic_for(selected_robot)
+    if not publish(topic, action_payload(message)):
+        return False
+    print(f"Published to {topic}: {message}")
+    return True
+
+
+def publish_groups(robot_id: str, groups: Optional[List[str]]) -> bool:
+    """Retain a robot's group list on {robot_id}/groups; the robot subscribes to those groups"""
+    if groups is None:
+        # Robot deleted: an empty retained payload clears the topic
+        return publish(f"{robot_id}/groups", b"", retain=True)
+    return publish(f"{robot_id}/groups", json.dumps({"groups": groups}).encode("utf-8"), retain=True)
+
+
+def publish_groups_batch(groups_by_robot: Dict[str, Optional[List[str]]]) -> None:
+    """publish_groups for many robots, a few publishes at a time"""
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        metrics.pool_map(executor, publish_groups, groups_by_robot.keys(), groups_by_robot.values())
+
@@ -34,6 +34,7 @@ document.addEventListener("DOMContentLoaded", function () {
   }
 
   updateSummary();
+  loadGroups(robotSelect);
 
   // Add event listener for Enter key
   document.getElementById("user-input").addEventListener("keydown", function (event) {
@@ -49,6 +50,24 @@ document.addEventListener("DOMContentLoaded", function () {
   });
 });
 
+// Add a "group:<name>" option per robot group, before "All"
+async function loadGroups(robotSelect) {
+  try {
+    const endPoint = window.location.href.includes("prod") ? "/prod/robots?view=summary" : "/robots?view=summary";
+    const robots = await (await fetch(endPoint)).json();
+    const groups = [...new Set(robots.flatMap((robot) => robot.groups || []))].sort();
+    const allOption = robotSelect.querySelector('option[value="all"]');
+    for (const group of groups) {
+      const option = document.createElement("option");
+      option.value = `group:${group}`;
+      option.textContent = `Group ${group}`;
+      robotSelect.insertBefore(option, allOption);
+    }
+  } catch (error) {
+    console.error("Could not load robot groups:", error);
+  }
+}
+
 async function sendMessage() {
   const userInput = document.getElementById("user-input");
   if (isRequestInProgress || !userInput.value.trim()) {
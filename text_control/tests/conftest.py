@@ -0,0 +1,9 @@
+"""
+Tests run from text_control/ with python -m pytest; the modules import each
+other by their top-level names, as app.py does.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
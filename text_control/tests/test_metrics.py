@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+
+import metrics
+
+
+class _Raw:
+    def stream(self, **kwargs):
+        yield b"{}"
+
+
+@pytest.fixture
+def dynamodb():
+    """An instrumented client whose requests are answered with {} instead of being sent"""
+    client = boto3.client(
+        "dynamodb", region_name="us-east-1", aws_access_key_id="testing", aws_secret_access_key="testing"
+    )
+    metrics.instrument(client)
+    client.meta.events.register("before-send", lambda **kwargs: AWSResponse("", 200, {}, _Raw()))
+    yield client
+    metrics.reset()
+
+
+def test_pooled_calls_count_toward_the_request(dynamodb):
+    client = dynamodb
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        started = metrics.start_request()
+        metrics.submit(executor, client.describe_limits).result()
+        metrics.pool_map(executor, lambda _: client.describe_limits(), range(2))
+        _, spent = metrics.finish_request(started, "GET", "/test", 200)
+    assert set(spent) == {"dynamodb"}
+    assert metrics._request_aws[("/test", "dynamodb")].count == 1
+    assert metrics._aws_calls[("dynamodb", "DescribeLimits")].count == 3
+
+
+def test_calls_outside_a_request_are_not_attributed(dynamodb):
+    client = dynamodb
+    started = metrics.start_request()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # A plain submit() does not carry the request's context
+        executor.submit(client.describe_limits).result()
+    _, spent = metrics.finish_request(started, "GET", "/test", 200)
+    assert spent == {}
@@ -0,0 +1,34 @@
+import config
+from services import prompt_builder
+
+
+def _conversation(count, size=400):
+    roles = ["user", "assistant"]
+    return [{"role": roles[n % 2], "content": f"message {n} " + "x" * size} for n in range(count)]
+
+
+def test_trim_keeps_a_user_turn_first_when_the_minimum_cuts_at_an_assistant(monkeypatch):
+    monkeypatch.setattr(config, "PROMPT_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(config, "PROMPT_MIN_MESSAGES", 4)
+    # user, assistant, ... user: the minimum bound lands on an assistant message
+    history = _conversation(7)
+    summary = prompt_builder.trim_history(history, "", 0)
+    assert [msg["role"] for msg in history] == ["user", "assistant", "user"]
+    assert history[-1]["content"].startswith("message 6")
+    assert "message 3" in summary
+
+
+def test_trim_within_budget_keeps_everything(monkeypatch):
+    monkeypatch.setattr(config, "PROMPT_TOKEN_BUDGET", 100000)
+    history = _conversation(7)
+    assert prompt_builder.trim_history(history, "earlier", 0) == "earlier"
+    assert len(history) == 7
+
+
+def test_build_opens_with_a_user_turn(monkeypatch):
+    monkeypatch.setattr(config, "PROMPT_TOKEN_BUDGET", 1000)
+    monkeypatch.setattr(config, "PROMPT_MIN_MESSAGES", 2)
+    history = _conversation(9, size=800)
+    _, messages, summary = prompt_builder.build(None, history, "", config.NOVA_MODEL_ID)
+    assert messages[0]["role"] == "user"
+    assert summary
@@ -0,0 +1,32 @@
+from services.database_service import RobotCache
+
+
+def _cache():
+    return RobotCache(ttl=300, negative_ttl=30)
+
+
+def test_fill_after_a_write_keeps_the_written_item():
+    cache = _cache()
+    # A read misses and starts reading the table...
+    generation = cache.generation()
+    # ...a write stores the new version meanwhile...
+    cache.store("robot_1", {"id": "robot_1", "version": "new"})
+    # ...and the read comes back with the old one
+    cache.fill("robot_1", {"id": "robot_1", "version": "old"}, generation)
+    assert cache.lookup("robot_1")[1]["version"] == "new"
+
+
+def test_fill_after_a_delete_does_not_bring_the_robot_back():
+    cache = _cache()
+    generation = cache.generation()
+    cache.invalidate("robot_1")
+    cache.fill("robot_1", {"id": "robot_1", "version": "old"}, generation)
+    assert cache.lookup("robot_1") == (False, None, False)
+
+
+def test_fill_without_a_write_is_cached():
+    cache = _cache()
+    cache.fill("robot_1", {"id": "robot_1", "version": "v1"}, cache.generation())
+    cache.fill("robot_2", None, cache.generation())
+    assert cache.lookup("robot_1")[1]["version"] == "v1"
+    assert cache.lookup("robot_2") == (True, None, False)